@@ -1,18 +1,58 @@
 from src.utils import check_index_elasticSearch
 from src.app.MySearchEngine import MySearchEngine
-from src.config import MAIN_INDEX_NAME, ELASTIC_SEARCH_ADDRESS, BEST_QUERY_CONFIG # to initialize env vars
-from flask import Flask, request, jsonify
+from src.app.pagination import CursorError, CursorExpiredError
+from src.insertDocs.indexBuildStatus import IndexBuildStatus
+from src.config import MAIN_INDEX_NAME, ELASTIC_SEARCH_ADDRESS, BEST_QUERY_CONFIG, SERVING_MODE, MAX_BATCH_QUERIES, MAX_BATCH_SIZE, TEXT_TOOLS_WARMUP, INDEX_BUILD_STATUS_PATH, METRICS_ENABLED # to initialize env vars
+from src.textTools import Tools
+from src.telemetry import REGISTRY, HTTP_REQUEST_SECONDS, CONTENT_TYPE, render_metrics
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
+import time
 
 if __name__ == '__main__':
 
+    REGISTRY.enabled = METRICS_ENABLED
+
     print("\n--- INICIANDO VERIFICAÇÃO DE PRÉ-REQUISITOS ---")
+    # Se uma nova geração do índice precisar ser construída, ela roda em segundo
+    # plano e o progresso fica disponível em /api/ready.
     check_index_elasticSearch()
     print("--- VERIFICAÇÃO CONCLUÍDA. APP PRONTO PARA INICIAR. ---\n")
 
+    if TEXT_TOOLS_WARMUP:
+        print("Carregando as ferramentas de texto da configuração de busca...")
+        Tools.warmup(BEST_QUERY_CONFIG.text_techniques, llm=BEST_QUERY_CONFIG.ai_global_expansion)
+
+    if SERVING_MODE == 'async':
+        # Modo de produção: aiohttp + cliente assíncrono do Elasticsearch.
+        from src.app.asyncServer import run_async_server
+        run_async_server(host='0.0.0.0', port=5000)
+        raise SystemExit(0)
+
     app = Flask(__name__)
 
-    CORS(app)
+    # X-Next-Cursor leva o cursor da próxima página nas buscas paginadas.
+    CORS(app, expose_headers=["X-Next-Cursor"])
+
+    if METRICS_ENABLED:
+        @app.before_request
+        def iniciar_cronometro():
+            g.inicio_requisicao = time.perf_counter()
+
+        @app.after_request
+        def registrar_latencia(resposta):
+            inicio = g.pop('inicio_requisicao', None)
+            if inicio is not None:
+                # A rota é o padrão registrado (ex: /api/document/<doc_id>), não a URL.
+                rota = request.url_rule.rule if request.url_rule else 'unmatched'
+                HTTP_REQUEST_SECONDS.observe(
+                    time.perf_counter() - inicio, route=rota, method=request.method, status=resposta.status_code
+                )
+            return resposta
+
+        @app.route('/metrics', methods=['GET'])
+        def rota_metricas():
+            return Response(render_metrics(), headers={'Content-Type': CONTENT_TYPE})
 
     try:
         es = MySearchEngine(hosts=ELASTIC_SEARCH_ADDRESS, config=BEST_QUERY_CONFIG)
@@ -26,16 +66,137 @@ if __name__ == '__main__':
             return jsonify({"erro": "Não foi possível conectar ao servidor Elasticsearch."}), 500
 
         termo_de_busca = request.args.get('q')
-        if not termo_de_busca:
+        cursor = request.args.get('cursor')
+        if not termo_de_busca and not cursor:
             return jsonify({"erro": "O parâmetro de busca 'q' é obrigatório."}), 400
 
         try:
-            resultados = es.search_documents(MAIN_INDEX_NAME, termo_de_busca, size=20)
+            # Com paginate=1 (ou um cursor), a resposta é uma página e o cursor da
+            # próxima vem no cabeçalho X-Next-Cursor (ausente na última página).
+            # Com slim=1, cada resultado traz só id, título, data, tribunal e um
+            # trecho; o documento completo fica em /api/document/<id>.
+            slim = request.args.get('slim') in ('1', 'true')
+
+            if cursor or request.args.get('paginate') in ('1', 'true'):
+                resultados, proximo_cursor = es.search_documents_page(
+                    MAIN_INDEX_NAME, termo_de_busca, size=20, cursor=cursor, slim=slim
+                )
+                resposta = jsonify(resultados)
+                if proximo_cursor:
+                    resposta.headers['X-Next-Cursor'] = proximo_cursor
+                return resposta
+
+            # Com profile=1 e o perfilador ativo (QUERY_PROFILING_ENABLED), a busca usa
+            # a profile API e a resposta traz também o tempo de cada campo e cláusula.
+            if request.args.get('profile') in ('1', 'true') and es.profiler is not None:
+                medicoes = {}
+                resultados = es.search_documents(
+                    MAIN_INDEX_NAME, termo_de_busca, size=20, slim=slim, timings=medicoes, profile=True
+                )
+                return jsonify({"results": resultados, "profile": medicoes.get("profile")})
+
+            resultados = es.search_documents(MAIN_INDEX_NAME, termo_de_busca, size=20, slim=slim)
             return jsonify(resultados)
+        except CursorExpiredError as e:
+            return jsonify({"erro": str(e)}), 410
+        except CursorError as e:
+            return jsonify({"erro": str(e)}), 400
         except Exception as e:
             print(f"Erro durante a busca: {e}")
             return jsonify({"erro": f"Ocorreu um erro durante a busca: {e}"}), 500
 
+    @app.route('/api/search/cursor', methods=['DELETE'])
+    def rota_fechar_cursor():
+        if es is None:
+            return jsonify({"erro": "Não foi possível conectar ao servidor Elasticsearch."}), 500
+
+        cursor = request.args.get('cursor')
+        if not cursor:
+            return jsonify({"erro": "O parâmetro 'cursor' é obrigatório."}), 400
+
+        try:
+            es.close_cursor(cursor)
+            return '', 204
+        except CursorError as e:
+            return jsonify({"erro": str(e)}), 400
+
+    @app.route('/api/search/batch', methods=['POST'])
+    def rota_de_busca_em_lote():
+        if es is None:
+            return jsonify({"erro": "Não foi possível conectar ao servidor Elasticsearch."}), 500
+
+        corpo = request.get_json(silent=True) or {}
+        consultas = corpo.get('queries')
+        if not isinstance(consultas, list) or not consultas or not all(isinstance(c, str) and c for c in consultas):
+            return jsonify({"erro": "O campo 'queries' deve ser uma lista não vazia de strings."}), 400
+        if len(consultas) > MAX_BATCH_QUERIES:
+            return jsonify({"erro": f"No máximo {MAX_BATCH_QUERIES} consultas por requisição."}), 400
+
+        tamanho = corpo.get('size', 20)
+        if isinstance(tamanho, bool) or not isinstance(tamanho, int) or not 1 <= tamanho <= MAX_BATCH_SIZE:
+            return jsonify({"erro": f"O campo 'size' deve ser um inteiro entre 1 e {MAX_BATCH_SIZE}."}), 400
+
+        try:
+            resultados = es.search_documents_batch(
+                MAIN_INDEX_NAME, consultas, size=tamanho, slim=bool(corpo.get('slim', False))
+            )
+            return jsonify(resultados)
+        except Exception as e:
+            print(f"Erro durante a busca em lote: {e}")
+            return jsonify({"erro": f"Ocorreu um erro durante a busca em lote: {e}"}), 500
+
+    @app.route('/api/document/<doc_id>', methods=['GET'])
+    def rota_documento(doc_id):
+        if es is None:
+            return jsonify({"erro": "Não foi possível conectar ao servidor Elasticsearch."}), 500
+
+        try:
+            documento = es.get_document(MAIN_INDEX_NAME, doc_id)
+        except Exception as e:
+            print(f"Erro ao buscar o documento: {e}")
+            return jsonify({"erro": f"Ocorreu um erro ao buscar o documento: {e}"}), 500
+
+        if documento is None:
+            return jsonify({"erro": f"Documento '{doc_id}' não encontrado."}), 404
+        return jsonify(documento)
+
+    @app.route('/api/ready', methods=['GET'])
+    def rota_prontidao():
+        documentos = -1
+        if es is not None:
+            try:
+                documentos = es.count_documents(MAIN_INDEX_NAME)
+            except Exception as e:
+                print(f"Erro ao verificar o índice: {e}")
+
+        pronto = documentos > 0
+        return jsonify({
+            "ready": pronto,
+            "documents": documentos,
+            "build": IndexBuildStatus.read(INDEX_BUILD_STATUS_PATH)
+        }), 200 if pronto else 503
+
+    @app.route('/api/search/profile', methods=['GET', 'DELETE'])
+    def rota_relatorio_perfil():
+        if es is None:
+            return jsonify({"erro": "Não foi possível conectar ao servidor Elasticsearch."}), 500
+        if es.profiler is None:
+            return jsonify({"enabled": False})
+
+        if request.method == 'DELETE':
+            es.profiler.reset()
+            return '', 204
+
+        top = request.args.get('top', type=int)
+        return jsonify(es.profile_report(top))
+
+    @app.route('/api/search/cache', methods=['GET'])
+    def rota_cache_stats():
+        if es is None:
+            return jsonify({"erro": "Não foi possível conectar ao servidor Elasticsearch."}), 500
+
+        return jsonify(es.cache_stats() or {"enabled": False})
+
     print("🚀 Iniciando o servidor de desenvolvimento Flask...")
     
     app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
@@ -0,0 +1,383 @@
+from elasticsearch import AsyncElasticsearch, exceptions
+from concurrent.futures import ThreadPoolExecutor
+from src.app.QueryConfig import QueryConfig
+from src.app.queryCache import QueryResultCache
+from src.app.queryProfiler import QueryProfiler
+from src.app.hybridSearch import prepare_query, hybrid_searches, fuse_responses
+from src.app.pagination import CursorExpiredError, build_page_body, decode_cursor, next_page_cursor
+from src.telemetry import SEARCH_REQUESTS, SEARCH_ERRORS, error_type, observe_elasticsearch
+from src.lsaEmbedder import embedder_for_mapping
+from src.config import (
+    QUERY_CACHE_ENABLED, QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL, QUERY_CACHE_GENERATION_CHECK,
+    ASYNC_MAX_CONCURRENT_SEARCHES, ASYNC_PREPROCESS_WORKERS, PAGINATION_KEEP_ALIVE,
+    SLIM_SNIPPET_CHARS, DOCUMENT_CACHE_MAX_ENTRIES, DOCUMENT_CACHE_TTL,
+    QUERY_PROFILING_ENABLED, QUERY_PROFILE_SAMPLE_RATE
+)
+import asyncio
+import time
+
+class AsyncSearchEngine(AsyncElasticsearch):
+    """
+    Versão assíncrona do MySearchEngine, para o modo de produção do servidor.
+
+    Todas as buscas compartilham o pool de conexões do cliente. O pré-processamento
+    da consulta (técnicas de texto e expansão por IA) roda em um pool de threads,
+    fora do event loop. No máximo max_concurrent_searches buscas ficam em andamento
+    ao mesmo tempo.
+
+    ATENÇÃO: USE hosts={url do elastic} !!!!!!!
+    """
+    def __init__(
+        self,
+        config: QueryConfig = None,
+        *args,
+        max_concurrent_searches: int = ASYNC_MAX_CONCURRENT_SEARCHES,
+        preprocess_workers: int = ASYNC_PREPROCESS_WORKERS,
+        **kwargs
+    ):
+        if 'hosts' not in kwargs:
+            raise ValueError(
+                "O argumento 'hosts' é obrigatório para a inicialização. "
+                "Forneça o endereço do Elasticsearch. Exemplo: hosts=['http://localhost:9200'] ou hosts='http://localhost:9200'"
+            )
+
+        super().__init__(*args, **kwargs)
+
+        self.config = config if config else QueryConfig()
+        self.result_cache = QueryResultCache(QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL) if QUERY_CACHE_ENABLED else None
+        self._generations = {}
+        self._embedders = {}
+        self.document_cache = QueryResultCache(DOCUMENT_CACHE_MAX_ENTRIES, DOCUMENT_CACHE_TTL, name="documents")
+        self.profiler = QueryProfiler(QUERY_PROFILE_SAMPLE_RATE) if QUERY_PROFILING_ENABLED else None
+
+        self._search_slots = asyncio.Semaphore(max_concurrent_searches)
+        self._preprocess_executor = ThreadPoolExecutor(max_workers=preprocess_workers, thread_name_prefix="preprocess")
+
+    async def wait_until_ready(self, max_tentativas=20, intervalo_segundos=10):
+        """
+        Aguarda o Elasticsearch responder, com as mesmas tentativas do MySearchEngine.
+        Retorna True se a conexão foi estabelecida.
+        """
+        for tentativa in range(max_tentativas):
+            try:
+                print(f"\n[Tentativa {tentativa + 1}/{max_tentativas}] Conectando ao Elasticsearch...")
+                await self.info()
+                print("\nConexão estabelecida com sucesso.\n")
+                return True
+            except exceptions.ConnectionError as e:
+                print(f"Erro de conexão na tentativa {tentativa + 1}: {e}")
+            except Exception as e:
+                print(f"Ocorreu um erro inesperado na tentativa {tentativa + 1}: {e}")
+
+            if tentativa < max_tentativas - 1:
+                print(f"Aguardando {intervalo_segundos} segundos para a próxima tentativa...")
+                await asyncio.sleep(intervalo_segundos)
+
+        print(f"\nFalha ao conectar ao Elasticsearch após {max_tentativas} tentativas.")
+        return False
+
+    async def close(self):
+        await super().close()
+        self._preprocess_executor.shutdown(wait=False)
+
+    async def search_documents(self, index_name, query, size=20, slim=False, timings: dict = None, profile: bool = False):
+        """
+        Mesmo contrato de MySearchEngine.search_documents: retorna a lista dos
+        '_source' encontrados, ou uma lista vazia em caso de erro. timings recebe
+        apenas 'cache_hit' e, em uma busca perfilada, 'profile'. Com
+        config.hybrid, a busca é híbrida como na versão síncrona.
+        """
+        SEARCH_REQUESTS.inc(operation="search")
+        profile = self.profiler is not None and self.profiler.should_profile(profile)
+
+        async with self._search_slots:
+            cache_key = None
+            if self.result_cache is not None:
+                cache_key = (
+                    index_name,
+                    await self._index_generation(index_name),
+                    " ".join(query.split()),
+                    self.config.signature(),
+                    size,
+                    slim
+                )
+                cached = None if profile else self.result_cache.get(cache_key)
+                if cached is not None:
+                    if timings is not None:
+                        timings["cache_hit"] = True
+                    return cached
+
+            embedder = await self._embedder(index_name) if self.config.hybrid else None
+            loop = asyncio.get_running_loop()
+            query, vector = await loop.run_in_executor(self._preprocess_executor, prepare_query, self.config, embedder, query)
+
+            try:
+                if vector is None:
+                    request_body = self.config.build_request_body(query, size, slim)
+                    if profile:
+                        request_body["profile"] = True
+
+                    start = time.perf_counter()
+                    response = await self.search(index=index_name, body=request_body)
+                    responses = [response]
+                else:
+                    searches = hybrid_searches(self.config, index_name, query, vector, size, slim)
+                    if profile:
+                        searches[1]["profile"] = True
+
+                    start = time.perf_counter()
+                    response = await self.msearch(searches=searches)
+                    responses = response["responses"]
+                    for part in responses:
+                        if "error" in part:
+                            raise RuntimeError(f"Erro na busca híbrida: {part['error']}")
+                observe_elasticsearch("search" if vector is None else "hybrid", time.perf_counter() - start, response)
+
+                if profile and "profile" in responses[0]:
+                    report = self.profiler.record(responses[0]["profile"])
+                    if timings is not None:
+                        timings["profile"] = report
+
+                hits = responses[0]["hits"]["hits"] if vector is None else fuse_responses(responses, size)
+                documents = self._documents_from_hits(hits, slim)
+
+                if cache_key is not None:
+                    self.result_cache.set(cache_key, documents)
+
+                return documents
+
+            except Exception as e:
+                print(f"Erro ao buscar documentos: {e}")
+                SEARCH_ERRORS.inc(operation="search", error=error_type(e))
+                return []
+
+    async def search_documents_page(self, index_name, query=None, size=20, cursor=None, slim=False):
+        """
+        Mesmo contrato de MySearchEngine.search_documents_page: retorna a página e o
+        cursor da próxima (ou None na última).
+        """
+        SEARCH_REQUESTS.inc(operation="page")
+
+        async with self._search_slots:
+            if cursor is None:
+                loop = asyncio.get_running_loop()
+                query = await loop.run_in_executor(self._preprocess_executor, self.config.preprocess, query)
+                pit_id = (await self.open_point_in_time(index=index_name, keep_alive=PAGINATION_KEEP_ALIVE))["id"]
+                search_after = None
+            else:
+                state = decode_cursor(cursor, max_size=size)
+                pit_id, search_after, query, size = state["pit"], state["after"], state["q"], state["size"]
+                slim = state.get("slim", False)
+
+            try:
+                request_body = build_page_body(self.config, query, size, pit_id, PAGINATION_KEEP_ALIVE, search_after, slim)
+                start = time.perf_counter()
+                response = await self.search(body=request_body)
+                observe_elasticsearch("page", time.perf_counter() - start, response)
+            except exceptions.NotFoundError as e:
+                SEARCH_ERRORS.inc(operation="page", error="CursorExpiredError")
+                raise CursorExpiredError("O cursor de paginação expirou. Refaça a busca.") from e
+            except Exception as e:
+                SEARCH_ERRORS.inc(operation="page", error=error_type(e))
+                if cursor is None:
+                    await self._close_point_in_time(pit_id)
+                raise
+
+            documents = self._documents_from_hits(response["hits"]["hits"], slim)
+            next_cursor = next_page_cursor(response, pit_id, query, size, slim)
+
+            if next_cursor is None:
+                await self._close_point_in_time(response.get("pit_id", pit_id))
+
+            return documents, next_cursor
+
+    async def close_cursor(self, cursor):
+        """Fecha o point-in-time de um cursor que não será mais usado."""
+        await self._close_point_in_time(decode_cursor(cursor)["pit"])
+
+    async def _close_point_in_time(self, pit_id):
+        try:
+            await self.close_point_in_time(id=pit_id)
+        except Exception as e:
+            print(f"Erro ao fechar o point-in-time: {e}")
+
+    async def search_documents_batch(self, index_name, queries, size=20, slim=False):
+        """
+        Mesmo contrato de MySearchEngine.search_documents_batch: várias consultas em
+        uma única requisição _msearch, com erros isolados por consulta.
+        """
+        sizes = size if isinstance(size, (list, tuple)) else [size] * len(queries)
+        outcomes = [{"query": query} for query in queries]
+        SEARCH_REQUESTS.inc(len(queries), operation="batch")
+
+        async with self._search_slots:
+            generation = await self._index_generation(index_name) if self.result_cache is not None else None
+            embedder = await self._embedder(index_name) if self.config.hybrid else None
+            loop = asyncio.get_running_loop()
+
+            to_process = []
+
+            for i, (query, query_size) in enumerate(zip(queries, sizes)):
+                cache_key = None
+                if self.result_cache is not None:
+                    cache_key = (index_name, generation, " ".join(query.split()), self.config.signature(), query_size, slim)
+                    cached = self.result_cache.get(cache_key)
+                    if cached is not None:
+                        outcomes[i]["results"] = cached
+                        continue
+
+                to_process.append((i, query_size, cache_key))
+
+            processed_queries = await asyncio.gather(
+                *(
+                    loop.run_in_executor(self._preprocess_executor, prepare_query, self.config, embedder, queries[i])
+                    for i, _, _ in to_process
+                ),
+                return_exceptions=True
+            )
+
+            searches = []
+            pending = []
+
+            for (i, query_size, cache_key), processed in zip(to_process, processed_queries):
+                if isinstance(processed, Exception):
+                    outcomes[i]["error"] = f"Erro ao pré-processar a consulta: {processed}"
+                    SEARCH_ERRORS.inc(operation="batch", error=error_type(processed))
+                    continue
+
+                processed, vector = processed
+                if vector is None:
+                    searches.append({"index": index_name})
+                    searches.append(self.config.build_request_body(processed, query_size, slim))
+                else:
+                    searches.extend(hybrid_searches(self.config, index_name, processed, vector, query_size, slim))
+                pending.append((i, cache_key, query_size, vector is not None))
+
+            if not pending:
+                return outcomes
+
+            try:
+                start = time.perf_counter()
+                response = await self.msearch(searches=searches)
+                observe_elasticsearch("msearch", time.perf_counter() - start, response)
+                responses = response["responses"]
+            except Exception as e:
+                print(f"Erro ao buscar documentos em lote: {e}")
+                SEARCH_ERRORS.inc(len(pending), operation="batch", error=error_type(e))
+                for i, *_ in pending:
+                    outcomes[i]["error"] = f"Erro ao buscar documentos: {e}"
+                return outcomes
+
+            responses = iter(responses)
+            for i, cache_key, query_size, hybrid in pending:
+                parts = [next(responses) for _ in range(2 if hybrid else 1)]
+                error = next((part["error"] for part in parts if "error" in part), None)
+                if error is not None:
+                    outcomes[i]["error"] = f"Erro ao buscar documentos: {error}"
+                    SEARCH_ERRORS.inc(operation="batch", error=error_type(error))
+                    continue
+
+                hits = fuse_responses(parts, query_size) if hybrid else parts[0]["hits"]["hits"]
+                documents = self._documents_from_hits(hits, slim)
+                outcomes[i]["results"] = documents
+
+                if cache_key is not None:
+                    self.result_cache.set(cache_key, documents)
+
+            return outcomes
+
+    async def get_document(self, index_name, doc_id):
+        """Mesmo contrato de MySearchEngine.get_document."""
+        cache_key = (index_name, await self._index_generation(index_name), str(doc_id))
+        document = self.document_cache.get(cache_key)
+        if document is not None:
+            return document
+
+        try:
+            start = time.perf_counter()
+            response = await self.get(index=index_name, id=str(doc_id), source_excludes=["search_fields", "embedding"])
+            observe_elasticsearch("get", time.perf_counter() - start)
+        except exceptions.NotFoundError:
+            return None
+
+        document = response["_source"]
+        self.document_cache.set(cache_key, document)
+        return document
+
+    @staticmethod
+    def _documents_from_hits(hits, slim=False):
+        if slim:
+            return [QueryConfig.slim_result(hit["_source"], SLIM_SNIPPET_CHARS) for hit in hits]
+        return [hit["_source"] for hit in hits]
+
+    async def _index_generation(self, index_name):
+        """Equivalente assíncrono de MySearchEngine._index_generation."""
+        now = time.monotonic()
+
+        generation, checked_at = self._generations.get(index_name, (None, None))
+        if checked_at is not None and now - checked_at < QUERY_CACHE_GENERATION_CHECK:
+            return generation
+
+        # Marca a verificação antes do await para que requisições simultâneas não
+        # consultem o Elasticsearch todas ao mesmo tempo.
+        self._generations[index_name] = (generation, now)
+
+        try:
+            response = await self.indices.get_settings(index=index_name, name="index.uuid")
+            new_generation = tuple(sorted(
+                settings["settings"]["index"]["uuid"] for settings in response.values()
+            ))
+        except Exception:
+            new_generation = None
+
+        self._generations[index_name] = (new_generation, now)
+
+        if checked_at is not None and new_generation != generation:
+            self.document_cache.invalidate(lambda key: key[0] == index_name)
+            if self.result_cache is not None:
+                self.result_cache.invalidate(lambda key: key[0] == index_name)
+
+        return new_generation
+
+    async def _embedder(self, index_name):
+        """Equivalente assíncrono de MySearchEngine._embedder."""
+        generation = await self._index_generation(index_name)
+
+        cached = self._embedders.get(index_name)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+
+        try:
+            mapping = await self.indices.get_mapping(index=index_name)
+        except Exception as e:
+            print(f"Erro ao ler o modelo de embeddings de '{index_name}': {e}")
+            return None
+
+        # O modelo é lido do disco fora do event loop.
+        loop = asyncio.get_running_loop()
+        embedder = await loop.run_in_executor(self._preprocess_executor, embedder_for_mapping, mapping)
+
+        self._embedders[index_name] = (generation, embedder)
+        return embedder
+
+    def profile_report(self, top=None):
+        """Retorna o relatório agregado do perfilador (ou None se desativado)."""
+        if self.profiler is None:
+            return None
+        return self.profiler.report(top)
+
+    def cache_stats(self):
+        """Retorna os contadores do cache de resultados (ou None se desativado)."""
+        if self.result_cache is None:
+            return None
+        return self.result_cache.stats()
+
+    async def count_documents(self, index_name):
+        """
+        Return the total number of documents indexed in the specified index.
+        """
+        try:
+            response = await self.count(index=index_name)
+            return response['count']
+        except exceptions.NotFoundError:
+            return -1
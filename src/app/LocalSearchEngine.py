@@ -0,0 +1,302 @@
+import json
+import os
+import re
+from collections import Counter
+from typing import Iterable
+import numpy as np
+from src.app.QueryConfig import QueryConfig
+from src.config import SLIM_SNIPPET_CHARS
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+def _analyze(text) -> list[str]:
+    """
+    Aproximação do analisador 'standard' do Elasticsearch (usado pelos campos de
+    texto do índice): separa as palavras e converte para minúsculas.
+    """
+    if not text:
+        return []
+    return _TOKEN_PATTERN.findall(str(text).lower())
+
+def _get_path(doc: dict, path: str):
+    for key in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(key)
+    return doc
+
+
+class _FieldIndex:
+    """
+    Índice invertido de um campo em formato CSR: as postings do termo t são
+    doc_ids[indptr[t]:indptr[t + 1]], com as frequências em tfs.
+    """
+    def __init__(self, vocabulary: dict, indptr, doc_ids, tfs, lengths, docs_with_field: int):
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.lengths = lengths
+        self.docs_with_field = docs_with_field
+        self.avgdl = float(lengths.sum()) / docs_with_field if docs_with_field else 0.0
+
+    @classmethod
+    def build(cls, token_lists: list[list[str]]) -> "_FieldIndex":
+        vocabulary = {}
+        terms, docs, tfs = [], [], []
+        lengths = np.zeros(len(token_lists), dtype=np.float32)
+
+        for doc_id, tokens in enumerate(token_lists):
+            if not tokens:
+                continue
+            lengths[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                terms.append(vocabulary.setdefault(term, len(vocabulary)))
+                docs.append(doc_id)
+                tfs.append(tf)
+
+        terms = np.asarray(terms, dtype=np.int64)
+        # Ordenação estável: dentro de cada termo, os documentos continuam em ordem crescente.
+        order = np.argsort(terms, kind="stable")
+
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocabulary)), out=indptr[1:])
+
+        return cls(
+            vocabulary,
+            indptr,
+            np.asarray(docs, dtype=np.int32)[order],
+            np.asarray(tfs, dtype=np.float32)[order],
+            lengths,
+            int(np.count_nonzero(lengths))
+        )
+
+    def score(self, query_terms: list[str], num_docs: int, k1: float, b: float):
+        """Scores BM25 (mesma fórmula do Elasticsearch) de todos os documentos para os termos."""
+        scores = np.zeros(num_docs, dtype=np.float32)
+
+        for term in query_terms:
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tfs = self.tfs[start:end]
+
+            df = end - start
+            idf = np.log1p((self.docs_with_field - df + 0.5) / (df + 0.5))
+            norm = k1 * (1 - b + b * self.lengths[docs] / self.avgdl)
+
+            # Cada documento aparece uma única vez nas postings de um termo.
+            scores[docs] += idf * tfs / (tfs + norm)
+
+        return scores
+
+
+class LocalSearchEngine:
+    """
+    Mecanismo de busca em memória, com a mesma interface de busca do MySearchEngine
+    (search_documents, search_documents_batch e count_documents), para avaliações
+    offline e uso embutido com corpora pequenos, sem um Elasticsearch.
+
+    Indexa os mesmos documentos gerados pelo PipelineReader (document.* e todas as
+    variantes em search_fields.*) e reproduz a consulta multi_match (best_fields)
+    do QueryConfig: BM25 por campo (k1=1.2, b=0.75, como no Elasticsearch) e o
+    maior score entre os campos. Os índices podem ser salvos em disco e carregados
+    com memory-map.
+
+    Exemplo:
+        engine = LocalSearchEngine.build(MAIN_INDEX_NAME, reader.iter_documents())
+        engine.save(LOCAL_INDEX_PATH)
+        ...
+        engine = LocalSearchEngine.load(LOCAL_INDEX_PATH, config=BEST_QUERY_CONFIG)
+        engine.search_documents(MAIN_INDEX_NAME, "recurso especial", size=20)
+    """
+    BASE_FIELDS = ["document.title", "document.body", "document.highlight"]
+
+    def __init__(self, index_name: str, fields: dict, sources, source_offsets, config: QueryConfig = None, k1: float = 1.2, b: float = 0.75):
+        self.index_name = index_name
+        self.fields = fields
+        self.config = config if config else QueryConfig()
+        self.k1 = k1
+        self.b = b
+
+        self._sources = sources
+        self._source_offsets = source_offsets
+        self.num_docs = len(source_offsets) - 1
+
+    @classmethod
+    def build(cls, index_name: str, documents: Iterable[dict], config: QueryConfig = None, fields: list[str] = None) -> "LocalSearchEngine":
+        """
+        Constrói o índice a partir dos documentos no formato de indexação do
+        PipelineReader. Sem fields, indexa document.title, document.body,
+        document.highlight e todos os campos de search_fields do primeiro documento.
+        """
+        sources = bytearray()
+        offsets = [0]
+        tokens = None
+
+        for doc in documents:
+            if tokens is None:
+                if fields is None:
+                    fields = cls.BASE_FIELDS + [f"search_fields.{name}" for name in sorted(doc.get("search_fields") or {})]
+                tokens = {field: [] for field in fields}
+
+            for field in fields:
+                tokens[field].append(_analyze(_get_path(doc, field)))
+
+            # Os documentos são devolvidos sem search_fields (nem embedding), como na busca do Elasticsearch.
+            source = {key: value for key, value in doc.items() if key not in ("search_fields", "embedding")}
+            sources += json.dumps(source, ensure_ascii=False, default=str).encode("utf-8")
+            offsets.append(len(sources))
+
+        if tokens is None:
+            tokens = {field: [] for field in (fields or cls.BASE_FIELDS)}
+
+        field_indices = {field: _FieldIndex.build(token_lists) for field, token_lists in tokens.items()}
+
+        return cls(
+            index_name,
+            field_indices,
+            np.frombuffer(bytes(sources), dtype=np.uint8),
+            np.asarray(offsets, dtype=np.int64),
+            config
+        )
+
+    def save(self, path: str) -> None:
+        """Salva o índice em um diretório (arquivos .npy e JSON)."""
+        os.makedirs(path, exist_ok=True)
+
+        meta = {"index_name": self.index_name, "k1": self.k1, "b": self.b, "fields": {}}
+
+        for number, (field, index) in enumerate(self.fields.items()):
+            prefix = f"field{number}"
+            meta["fields"][field] = {"prefix": prefix, "docs_with_field": index.docs_with_field}
+
+            np.save(os.path.join(path, f"{prefix}.indptr.npy"), index.indptr)
+            np.save(os.path.join(path, f"{prefix}.doc_ids.npy"), index.doc_ids)
+            np.save(os.path.join(path, f"{prefix}.tfs.npy"), index.tfs)
+            np.save(os.path.join(path, f"{prefix}.lengths.npy"), index.lengths)
+
+            # Lista de termos na ordem dos ids.
+            with open(os.path.join(path, f"{prefix}.vocabulary.json"), "w", encoding="utf-8") as f:
+                json.dump(list(index.vocabulary), f, ensure_ascii=False)
+
+        np.save(os.path.join(path, "sources.npy"), self._sources)
+        np.save(os.path.join(path, "source_offsets.npy"), self._source_offsets)
+
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        print(f"Índice local '{self.index_name}' salvo em '{path}' ({self.num_docs} documentos).")
+
+    @classmethod
+    def load(cls, path: str, config: QueryConfig = None, mmap: bool = True) -> "LocalSearchEngine":
+        """
+        Carrega um índice salvo com save. Com mmap, as postings e os documentos são
+        lidos do disco sob demanda em vez de carregados inteiros na memória.
+        """
+        mmap_mode = "r" if mmap else None
+
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        fields = {}
+        for field, info in meta["fields"].items():
+            prefix = info["prefix"]
+            with open(os.path.join(path, f"{prefix}.vocabulary.json"), encoding="utf-8") as f:
+                vocabulary = {term: term_id for term_id, term in enumerate(json.load(f))}
+
+            fields[field] = _FieldIndex(
+                vocabulary,
+                np.load(os.path.join(path, f"{prefix}.indptr.npy"), mmap_mode=mmap_mode),
+                np.load(os.path.join(path, f"{prefix}.doc_ids.npy"), mmap_mode=mmap_mode),
+                np.load(os.path.join(path, f"{prefix}.tfs.npy"), mmap_mode=mmap_mode),
+                np.load(os.path.join(path, f"{prefix}.lengths.npy"), mmap_mode=mmap_mode),
+                info["docs_with_field"]
+            )
+
+        return cls(
+            meta["index_name"],
+            fields,
+            np.load(os.path.join(path, "sources.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "source_offsets.npy"), mmap_mode=mmap_mode),
+            config,
+            meta["k1"],
+            meta["b"]
+        )
+
+    def _source(self, doc_id: int) -> dict:
+        start, end = self._source_offsets[doc_id], self._source_offsets[doc_id + 1]
+        return json.loads(self._sources[start:end].tobytes())
+
+    def _top_k(self, query: str, size: int, config: QueryConfig):
+        """Ids e scores dos size melhores documentos para a consulta já pré-processada."""
+        query_terms = _analyze(query)
+        best = np.zeros(self.num_docs, dtype=np.float32)
+
+        for field in config.fields:
+            index = self.fields.get(field)
+            if index is None or not index.docs_with_field:
+                continue
+            np.maximum(best, index.score(query_terms, self.num_docs, self.k1, self.b), out=best)
+
+        matched = np.flatnonzero(best > 0)
+        if len(matched) > size:
+            matched = matched[np.argpartition(-best[matched], size - 1)[:size]]
+
+        # Maior score primeiro; empates pela ordem de indexação.
+        order = np.lexsort((matched, -best[matched]))
+        return matched[order], best[matched[order]]
+
+    def _results(self, doc_ids, slim: bool) -> list:
+        documents = [self._source(int(doc_id)) for doc_id in doc_ids]
+        if slim:
+            return [QueryConfig.slim_result(document, SLIM_SNIPPET_CHARS) for document in documents]
+        return documents
+
+    def search_documents(self, index_name, query, size=20, slim=False, config: QueryConfig = None):
+        """
+        Mesmo contrato de MySearchEngine.search_documents. Retorna uma lista vazia se
+        index_name não for o índice carregado.
+        """
+        if index_name != self.index_name or size <= 0:
+            return []
+
+        config = config if config else self.config
+        try:
+            doc_ids, _ = self._top_k(config.preprocess(query), size, config)
+            return self._results(doc_ids, slim)
+        except Exception as e:
+            print(f"Erro ao buscar documentos: {e}")
+            return []
+
+    def search_documents_batch(self, index_name, queries, size=20, slim=False, config: QueryConfig = None):
+        """Mesmo contrato de MySearchEngine.search_documents_batch."""
+        config = config if config else self.config
+        sizes = size if isinstance(size, (list, tuple)) else [size] * len(queries)
+        outcomes = []
+
+        for query, query_size in zip(queries, sizes):
+            outcome = {"query": query}
+            if index_name != self.index_name:
+                outcome["error"] = f"Índice '{index_name}' não encontrado."
+            else:
+                try:
+                    doc_ids, _ = self._top_k(config.preprocess(query), query_size, config)
+                    outcome["results"] = self._results(doc_ids, slim)
+                except Exception as e:
+                    outcome["error"] = f"Erro ao buscar documentos: {e}"
+            outcomes.append(outcome)
+
+        return outcomes
+
+    def count_documents(self, index_name):
+        """
+        Return the total number of documents in the index (-1 if index_name is not
+        the loaded index).
+        """
+        if index_name != self.index_name:
+            return -1
+        return self.num_docs
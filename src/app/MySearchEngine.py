@@ -1,7 +1,17 @@
 from elasticsearch import Elasticsearch, exceptions
 from src.app.QueryConfig import QueryConfig
-from src.insertDocs.SearchFieldsModels import TEXT_FUNCTIONS
-from src.textTools import Tools
+from src.app.queryCache import QueryResultCache
+from src.app.queryProfiler import QueryProfiler
+from src.app.hybridSearch import prepare_query, hybrid_searches, fuse_responses
+from src.app.pagination import CursorExpiredError, build_page_body, decode_cursor, next_page_cursor
+from src.telemetry import SEARCH_REQUESTS, SEARCH_ERRORS, error_type, observe_elasticsearch
+from src.lsaEmbedder import embedder_for_mapping
+from src.config import (
+    QUERY_CACHE_ENABLED, QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL, QUERY_CACHE_GENERATION_CHECK,
+    PAGINATION_KEEP_ALIVE, SLIM_SNIPPET_CHARS, DOCUMENT_CACHE_MAX_ENTRIES, DOCUMENT_CACHE_TTL,
+    QUERY_PROFILING_ENABLED, QUERY_PROFILE_SAMPLE_RATE
+)
+import threading
 import time
 
 class MySearchEngine(Elasticsearch):
@@ -27,6 +37,19 @@ class MySearchEngine(Elasticsearch):
         else:
             self.config = QueryConfig()
 
+        # Cache de resultados, invalidado quando o índice é recriado (ver _index_generation).
+        self.result_cache = QueryResultCache(QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL) if QUERY_CACHE_ENABLED else None
+        self._generations = {}
+        self._generations_lock = threading.Lock()
+        # Modelo de embeddings de cada índice, por geração (ver _embedder).
+        self._embedders = {}
+
+        # Cache pequeno para os documentos completos pedidos um a um (get_document).
+        self.document_cache = QueryResultCache(DOCUMENT_CACHE_MAX_ENTRIES, DOCUMENT_CACHE_TTL, name="documents")
+
+        # Perfilamento das buscas (profile API), sob demanda ou por amostragem.
+        self.profiler = QueryProfiler(QUERY_PROFILE_SAMPLE_RATE) if QUERY_PROFILING_ENABLED else None
+
 
         print("Iniciando processo de conexão com o Elasticsearch...")
 
@@ -73,7 +96,7 @@ class MySearchEngine(Elasticsearch):
             print("Tente modificar o arquivo config/elasticsearch.yml mudando xpack.security.enabled para false e reinicie o Elasticsearch.")
             exit(1)
 
-    def search_documents(self, index_name, query, size=20):
+    def search_documents(self, index_name, query, size=20, slim=False, config: QueryConfig = None, timings: dict = None, profile: bool = False):
         """
         Busca por documentos no índice especificado usando a consulta (query) fornecida.
         Retorna uma lista de documentos correspondentes.
@@ -82,46 +105,369 @@ class MySearchEngine(Elasticsearch):
             index_name (str): O nome do índice para buscar.
             query (str): O termo ou a string de busca.
             size (int, optional): O número máximo de documentos a serem retornados. Padrão é 20.
+            slim (bool, optional): Retorna apenas id, título, data, tribunal e um trecho
+                do highlight de cada documento (ver QueryConfig.slim_result). Padrão é False.
+            config (QueryConfig, optional): Configuração usada apenas nesta busca, no
+                lugar de self.config. Permite avaliar várias configurações com um só cliente.
+            timings (dict, optional): Se fornecido, recebe os segundos gastos em cada
+                etapa ('preprocess', 'expansion', 'elasticsearch' e 'es_took', o tempo
+                informado pelo próprio Elasticsearch), 'cache_hit' e, em caso de
+                falha, 'error'. Em uma busca perfilada, recebe também 'profile',
+                o relatório de QueryProfiler só desta busca. Na busca híbrida,
+                recebe também 'embedding' e o tempo do Elasticsearch é o do _msearch.
+            profile (bool, optional): Perfila esta busca com a profile API do
+                Elasticsearch. Só tem efeito com o perfilador ativo
+                (QUERY_PROFILING_ENABLED), que também perfila uma fração
+                QUERY_PROFILE_SAMPLE_RATE das demais buscas. Buscas perfiladas não
+                leem o cache de resultados. Na busca híbrida, só a parte léxica é perfilada.
+
+        Com config.hybrid e um modelo de embeddings no índice, a consulta é enviada
+        em um só _msearch como busca léxica e kNN, e os resultados são fundidos por
+        RRF (ver src/app/hybridSearch.py).
 
         Returns:
             list: Uma lista dos dicionários '_source' dos documentos encontrados.
                   Retorna uma lista vazia se nenhum documento for encontrado ou em caso de erro.
         """
         #print(f"\nBuscando por: {query}")
+        config = config if config else self.config
+        SEARCH_REQUESTS.inc(operation="search")
+        profile = self.profiler is not None and self.profiler.should_profile(profile)
+
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self._cache_key(index_name, query, size, slim, config)
+            cached = None if profile else self.result_cache.get(cache_key)
+            if cached is not None:
+                if timings is not None:
+                    timings["cache_hit"] = True
+                return cached
 
-        for technique in self.config.text_techniques:
-            if technique not in TEXT_FUNCTIONS:
-                raise ValueError(f"Técnica de texto desconhecida: {technique}. Verifique a configuração.")
-            
-            query = TEXT_FUNCTIONS[technique](query)
-            
-        if self.config.ai_global_expansion:
-            query += Tools.expand_query(query)
+        embedder = self._embedder(index_name) if config.hybrid else None
+        query, vector = prepare_query(config, embedder, query, timings)
 
         try:
-            request_body = {
-                "_source": {
-                    "excludes": ["search_fields"]
-                },
-                "size": size,
-                "query": {
-                    "multi_match": {
-                        "query": query,
-                        "fields": self.config.fields
-                    }
-                }
-            }
-
-            response = self.search(index=index_name, body=request_body)
-
-            documents = [hit["_source"] for hit in response["hits"]["hits"]]
+            if vector is None:
+                request_body = config.build_request_body(query, size, slim)
+                if profile:
+                    request_body["profile"] = True
+
+                start = time.perf_counter()
+                response = self.search(index=index_name, body=request_body)
+                responses = [response]
+            else:
+                searches = hybrid_searches(config, index_name, query, vector, size, slim)
+                if profile:
+                    searches[1]["profile"] = True
+
+                start = time.perf_counter()
+                response = self.msearch(searches=searches)
+                responses = response["responses"]
+                for part in responses:
+                    if "error" in part:
+                        raise RuntimeError(f"Erro na busca híbrida: {part['error']}")
+            elapsed = time.perf_counter() - start
+
+            observe_elasticsearch("search" if vector is None else "hybrid", elapsed, response)
+            if timings is not None:
+                timings["elasticsearch"] = elapsed
+                timings["es_took"] = response.get("took", 0) / 1000
+
+            if profile and "profile" in responses[0]:
+                report = self.profiler.record(responses[0]["profile"])
+                if timings is not None:
+                    timings["profile"] = report
+
+            hits = responses[0]["hits"]["hits"] if vector is None else fuse_responses(responses, size)
+            documents = self._documents_from_hits(hits, slim)
             #print(f"Encontrados {len(documents)} documentos em '{index_name}'.")
+
+            if cache_key is not None:
+                self.result_cache.set(cache_key, documents)
+
             return documents
 
         except Exception as e:
             print(f"Erro ao buscar documentos: {e}")
+            SEARCH_ERRORS.inc(operation="search", error=error_type(e))
+            if timings is not None:
+                timings["error"] = str(e)
             return []
-        
+
+    def search_documents_page(self, index_name, query=None, size=20, cursor=None, slim=False):
+        """
+        Busca uma página de resultados com point-in-time e search_after, para
+        paginar conjuntos grandes sem o custo crescente de from/size.
+
+        A primeira página abre um point-in-time no índice; as seguintes são pedidas
+        apenas com o cursor retornado pela anterior (a consulta e o tamanho da página
+        vêm do cursor). O point-in-time expira após PAGINATION_KEEP_ALIVE sem uso e é
+        fechado assim que a última página é entregue. Os resultados paginados não
+        passam pelo cache.
+
+        Args:
+            index_name (str): O nome do índice para buscar.
+            query (str, optional): A consulta. Obrigatória na primeira página.
+            size (int, optional): O tamanho da página. Padrão é 20. Com um cursor,
+                é o maior tamanho aceito: um cursor com páginas maiores é recusado.
+            cursor (str, optional): O cursor da página anterior.
+            slim (bool, optional): Resultados resumidos, como em search_documents.
+                Nas páginas seguintes, vale o modo da primeira página.
+
+        Returns:
+            tuple[list, str | None]: Os '_source' da página e o cursor da próxima
+                página, ou None se não houver mais resultados.
+
+        Raises:
+            CursorError: Se o cursor for inválido.
+            CursorExpiredError: Se o point-in-time do cursor já expirou.
+        """
+        SEARCH_REQUESTS.inc(operation="page")
+
+        if cursor is None:
+            query = self.config.preprocess(query)
+            pit_id = self.open_point_in_time(index=index_name, keep_alive=PAGINATION_KEEP_ALIVE)["id"]
+            search_after = None
+        else:
+            state = decode_cursor(cursor, max_size=size)
+            pit_id, search_after, query, size = state["pit"], state["after"], state["q"], state["size"]
+            slim = state.get("slim", False)
+
+        try:
+            request_body = build_page_body(self.config, query, size, pit_id, PAGINATION_KEEP_ALIVE, search_after, slim)
+            start = time.perf_counter()
+            response = self.search(body=request_body)
+            observe_elasticsearch("page", time.perf_counter() - start, response)
+        except exceptions.NotFoundError as e:
+            SEARCH_ERRORS.inc(operation="page", error="CursorExpiredError")
+            raise CursorExpiredError("O cursor de paginação expirou. Refaça a busca.") from e
+        except Exception as e:
+            SEARCH_ERRORS.inc(operation="page", error=error_type(e))
+            if cursor is None:
+                self._close_point_in_time(pit_id)
+            raise
+
+        documents = self._documents_from_hits(response["hits"]["hits"], slim)
+        next_cursor = next_page_cursor(response, pit_id, query, size, slim)
+
+        if next_cursor is None:
+            self._close_point_in_time(response.get("pit_id", pit_id))
+
+        return documents, next_cursor
+
+    def close_cursor(self, cursor):
+        """Fecha o point-in-time de um cursor que não será mais usado."""
+        self._close_point_in_time(decode_cursor(cursor)["pit"])
+
+    def _close_point_in_time(self, pit_id):
+        try:
+            self.close_point_in_time(id=pit_id)
+        except Exception as e:
+            # O point-in-time expira sozinho após o keep_alive.
+            print(f"Erro ao fechar o point-in-time: {e}")
+
+    def search_documents_batch(self, index_name, queries, size=20, slim=False, config: QueryConfig = None):
+        """
+        Busca várias consultas de uma vez, em uma única requisição _msearch.
+
+        Cada consulta é pré-processada separadamente e os erros são isolados: uma
+        consulta que falhe (no pré-processamento ou no Elasticsearch) não afeta as
+        demais. Consultas presentes no cache de resultados não são reenviadas.
+
+        Args:
+            index_name (str): O nome do índice para buscar.
+            queries (list[str]): As consultas.
+            size (int | list[int], optional): O número máximo de documentos por
+                consulta, único para todas ou um por consulta. Padrão é 20.
+            slim (bool, optional): Resultados resumidos, como em search_documents.
+            config (QueryConfig, optional): Configuração usada apenas nestas buscas.
+
+        Returns:
+            list[dict]: Um item por consulta, na mesma ordem, no formato
+                {"query": consulta, "results": [...]} ou {"query": consulta, "error": "..."}.
+        """
+        config = config if config else self.config
+        sizes = size if isinstance(size, (list, tuple)) else [size] * len(queries)
+        outcomes = [{"query": query} for query in queries]
+        SEARCH_REQUESTS.inc(len(queries), operation="batch")
+
+        embedder = self._embedder(index_name) if config.hybrid else None
+        searches = []
+        pending = []  # (posição da consulta, chave de cache, tamanho, se é híbrida)
+
+        for i, (query, query_size) in enumerate(zip(queries, sizes)):
+            cache_key = None
+            if self.result_cache is not None:
+                cache_key = self._cache_key(index_name, query, query_size, slim, config)
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    outcomes[i]["results"] = cached
+                    continue
+
+            try:
+                processed, vector = prepare_query(config, embedder, query)
+            except Exception as e:
+                outcomes[i]["error"] = f"Erro ao pré-processar a consulta: {e}"
+                SEARCH_ERRORS.inc(operation="batch", error=error_type(e))
+                continue
+
+            if vector is None:
+                searches.append({"index": index_name})
+                searches.append(config.build_request_body(processed, query_size, slim))
+            else:
+                searches.extend(hybrid_searches(config, index_name, processed, vector, query_size, slim))
+            pending.append((i, cache_key, query_size, vector is not None))
+
+        if not pending:
+            return outcomes
+
+        try:
+            start = time.perf_counter()
+            response = self.msearch(searches=searches)
+            observe_elasticsearch("msearch", time.perf_counter() - start, response)
+            responses = response["responses"]
+        except Exception as e:
+            print(f"Erro ao buscar documentos em lote: {e}")
+            SEARCH_ERRORS.inc(len(pending), operation="batch", error=error_type(e))
+            for i, *_ in pending:
+                outcomes[i]["error"] = f"Erro ao buscar documentos: {e}"
+            return outcomes
+
+        responses = iter(responses)
+        for i, cache_key, query_size, hybrid in pending:
+            parts = [next(responses) for _ in range(2 if hybrid else 1)]
+            error = next((part["error"] for part in parts if "error" in part), None)
+            if error is not None:
+                outcomes[i]["error"] = f"Erro ao buscar documentos: {error}"
+                SEARCH_ERRORS.inc(operation="batch", error=error_type(error))
+                continue
+
+            hits = fuse_responses(parts, query_size) if hybrid else parts[0]["hits"]["hits"]
+            documents = self._documents_from_hits(hits, slim)
+            outcomes[i]["results"] = documents
+
+            if cache_key is not None:
+                self.result_cache.set(cache_key, documents)
+
+        return outcomes
+
+    def get_document(self, index_name, doc_id):
+        """
+        Busca o documento completo (sem os campos de busca) pelo id, passando pelo
+        cache de documentos.
+
+        Returns:
+            dict | None: O '_source' do documento, ou None se ele não existir.
+        """
+        cache_key = (index_name, self._index_generation(index_name), str(doc_id))
+        document = self.document_cache.get(cache_key)
+        if document is not None:
+            return document
+
+        try:
+            start = time.perf_counter()
+            response = self.get(index=index_name, id=str(doc_id), source_excludes=["search_fields", "embedding"])
+            observe_elasticsearch("get", time.perf_counter() - start)
+        except exceptions.NotFoundError:
+            return None
+
+        document = response["_source"]
+        self.document_cache.set(cache_key, document)
+        return document
+
+    @staticmethod
+    def _documents_from_hits(hits, slim=False):
+        if slim:
+            return [QueryConfig.slim_result(hit["_source"], SLIM_SNIPPET_CHARS) for hit in hits]
+        return [hit["_source"] for hit in hits]
+
+    def _cache_key(self, index_name, query, size, slim=False, config: QueryConfig = None):
+        """
+        Chave do cache de resultados: consulta normalizada, configuração da busca,
+        índice, tamanho, modo resumido e a geração atual do índice.
+        """
+        return (
+            index_name,
+            self._index_generation(index_name),
+            " ".join(query.split()),
+            (config if config else self.config).signature(),
+            size,
+            slim
+        )
+
+    def _index_generation(self, index_name):
+        """
+        Identifica a geração atual do índice pelo UUID do(s) índice(s) físico(s) por
+        trás do nome (que pode ser um alias). A consulta ao Elasticsearch é feita no
+        máximo a cada QUERY_CACHE_GENERATION_CHECK segundos. Quando a geração muda,
+        as entradas do índice são removidas do cache.
+        """
+        now = time.monotonic()
+
+        with self._generations_lock:
+            generation, checked_at = self._generations.get(index_name, (None, None))
+            if checked_at is not None and now - checked_at < QUERY_CACHE_GENERATION_CHECK:
+                return generation
+
+        try:
+            response = self.indices.get_settings(index=index_name, name="index.uuid")
+            new_generation = tuple(sorted(
+                settings["settings"]["index"]["uuid"] for settings in response.values()
+            ))
+        except Exception:
+            new_generation = None
+
+        with self._generations_lock:
+            self._generations[index_name] = (new_generation, now)
+
+        if checked_at is not None and new_generation != generation:
+            self.invalidate_cache(index_name)
+
+        return new_generation
+
+    def _embedder(self, index_name):
+        """
+        Modelo de embeddings da geração atual do índice (registrado no _meta do
+        mapping na ingestão), ou None se ele não tiver um. É consultado de novo
+        apenas quando a geração muda (ver _index_generation).
+        """
+        generation = self._index_generation(index_name)
+
+        with self._generations_lock:
+            cached = self._embedders.get(index_name)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+
+        try:
+            embedder = embedder_for_mapping(self.indices.get_mapping(index=index_name))
+        except Exception as e:
+            # Não guarda a falha: a próxima busca tenta de novo.
+            print(f"Erro ao ler o modelo de embeddings de '{index_name}': {e}")
+            return None
+
+        with self._generations_lock:
+            self._embedders[index_name] = (generation, embedder)
+        return embedder
+
+    def invalidate_cache(self, index_name=None):
+        """Remove do cache os resultados e documentos de um índice (ou de todos, sem index_name)."""
+        match = None if index_name is None else (lambda key: key[0] == index_name)
+
+        self.document_cache.invalidate(match)
+        if self.result_cache is not None:
+            self.result_cache.invalidate(match)
+
+    def profile_report(self, top=None):
+        """Retorna o relatório agregado do perfilador (ou None se desativado)."""
+        if self.profiler is None:
+            return None
+        return self.profiler.report(top)
+
+    def cache_stats(self):
+        """Retorna os contadores do cache de resultados (ou None se desativado)."""
+        if self.result_cache is None:
+            return None
+        return self.result_cache.stats()
 
     def count_documents(self, index_name):
         """
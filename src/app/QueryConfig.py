@@ -1,4 +1,7 @@
 from src.insertDocs.utils import SearchFieldsConfig
+from src.textTools import Tools
+from src.telemetry import REGISTRY, PREPROCESS_SECONDS
+import time
 
 class QueryConfig:
     combined_techniques = SearchFieldsConfig.COMMON_TECHNIQUES + SearchFieldsConfig.EXCLUSIVE_OPTIONAL_TECHNIQUES
@@ -7,7 +10,10 @@ class QueryConfig:
     )
     ALL_VALID_TECHNIQUES = set(flattened_techniques)
 
-    def __init__(self, text_techniques_list: list[str] = None, ai_text: bool = False, ai_global_expansion: bool = False):
+    # Campos trazidos do Elasticsearch no modo de resultados resumidos (slim).
+    SLIM_SOURCE_INCLUDES = ["id", "document.title", "document.date", "document.highlight", "metadata.court"]
+
+    def __init__(self, text_techniques_list: list[str] = None, ai_text: bool = False, ai_global_expansion: bool = False, hybrid: bool = False):
         """
         Inicializa a configuração da consulta.
 
@@ -18,6 +24,9 @@ class QueryConfig:
             ai_text (bool, optional): Flag para habilitar IA na busca de texto. Defaults to False.
             ai_global_expansion (bool, optional): Flag para habilitar expansão global
                 de IA. Defaults to False.
+            hybrid (bool, optional): Flag para a busca híbrida: BM25 mais kNN sobre o
+                campo 'embedding', fundidos por RRF. Sem modelo de embeddings no
+                índice, a busca continua só léxica. Defaults to False.
 
         Raises:
             ValueError: Se uma combinação inválida de técnicas for fornecida ou
@@ -27,6 +36,7 @@ class QueryConfig:
         self.fields = []
         self.ai_text = ai_text
         self.ai_global_expansion = ai_global_expansion
+        self.hybrid = hybrid
 
         if text_techniques_list:
             self._validate_and_generate_fields(text_techniques_list)
@@ -36,6 +46,96 @@ class QueryConfig:
         if self.ai_text:
             self.fields.append('search_fields.ai_text')
 
+        # Normalizador compilado uma única vez; é o mesmo objeto usado na ingestão
+        # para gerar os campos de busca com estas técnicas.
+        self.normalizer = Tools.compile_normalizer(self.text_techniques)
+
+    def preprocess(self, query: str, timings: dict = None) -> str:
+        """
+        Aplica as técnicas de texto à consulta e, se ativada, a expansão por IA.
+        Com timings, registra nele os segundos gastos em 'preprocess' e 'expansion'.
+        O tempo de cada etapa também vai para a métrica query_preprocess_seconds.
+        """
+        observe = PREPROCESS_SECONDS.observe if REGISTRY.enabled else None
+
+        start = time.perf_counter()
+        query = self.normalizer.normalize(query, observe)
+
+        if timings is not None:
+            timings["preprocess"] = time.perf_counter() - start
+
+        if self.ai_global_expansion:
+            start = time.perf_counter()
+            query += Tools.expand_query(query)
+            elapsed = time.perf_counter() - start
+
+            PREPROCESS_SECONDS.observe(elapsed, technique="ai_global_expansion")
+            if timings is not None:
+                timings["expansion"] = elapsed
+
+        return query
+
+    def build_request_body(self, query: str, size: int, slim: bool = False) -> dict:
+        """
+        Monta o corpo da requisição de busca para uma consulta já pré-processada.
+        Com slim, o Elasticsearch devolve apenas os campos de SLIM_SOURCE_INCLUDES.
+        """
+        return {
+            "_source": self._source_filter(slim),
+            "size": size,
+            "query": {
+                "multi_match": {
+                    "query": query,
+                    "fields": self.fields
+                }
+            }
+        }
+
+    def build_knn_body(self, vector: list[float], size: int, slim: bool = False, num_candidates: int = 100) -> dict:
+        """
+        Monta o corpo da busca kNN aproximada (HNSW) sobre o campo 'embedding', com o
+        vetor da consulta. num_candidates é o número de candidatos avaliados por shard.
+        """
+        return {
+            "_source": self._source_filter(slim),
+            "size": size,
+            "knn": {
+                "field": "embedding",
+                "query_vector": vector,
+                "k": size,
+                "num_candidates": max(num_candidates, size)
+            }
+        }
+
+    def _source_filter(self, slim: bool) -> dict:
+        return {"includes": self.SLIM_SOURCE_INCLUDES} if slim else {"excludes": ["search_fields", "embedding"]}
+
+    @staticmethod
+    def slim_result(source: dict, snippet_chars: int = 300) -> dict:
+        """
+        Converte o '_source' de um resultado resumido no formato devolvido pela API:
+        id, título, data, tribunal e um trecho do highlight com no máximo
+        snippet_chars caracteres (cortado no último espaço).
+        """
+        document = source.get("document") or {}
+        snippet = document.get("highlight") or ""
+
+        if len(snippet) > snippet_chars:
+            cut = snippet.rfind(" ", 0, snippet_chars)
+            snippet = snippet[:cut if cut > 0 else snippet_chars].rstrip() + "…"
+
+        return {
+            "id": source.get("id"),
+            "title": document.get("title"),
+            "date": document.get("date"),
+            "court": (source.get("metadata") or {}).get("court"),
+            "snippet": snippet
+        }
+
+    def signature(self) -> tuple:
+        """Identifica a configuração (usado nas chaves de cache)."""
+        return (tuple(self.text_techniques), self.ai_text, self.ai_global_expansion, self.hybrid)
+
     def _validate_and_generate_fields(self, techniques: list[str]):
         """
         Valida a lista de técnicas e gera os nomes dos campos para a busca.
@@ -0,0 +1,315 @@
+from aiohttp import web
+from functools import partial
+import multiprocessing
+import time
+from src.app.AsyncSearchEngine import AsyncSearchEngine
+from src.app.pagination import CursorError, CursorExpiredError
+from src.insertDocs.indexBuildStatus import IndexBuildStatus
+from src.config import (
+    MAIN_INDEX_NAME, ELASTIC_SEARCH_ADDRESS, BEST_QUERY_CONFIG, MAX_BATCH_QUERIES, MAX_BATCH_SIZE,
+    ASYNC_SERVER_PROCESSES, ASYNC_METRICS_PORT, ASYNC_ES_CONNECTIONS_PER_NODE, INDEX_BUILD_STATUS_PATH,
+    METRICS_ENABLED, TEXT_TOOLS_WARMUP
+)
+from src.textTools import Tools
+from src.telemetry import REGISTRY, HTTP_REQUEST_SECONDS, CONTENT_TYPE, render_metrics
+
+SEARCH_ENGINE_KEY = web.AppKey("search_engine", AsyncSearchEngine)
+METRICS_RUNNER_KEY = web.AppKey("metrics_runner", web.AppRunner)
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    if request.method == "OPTIONS":
+        response = web.Response()
+    else:
+        response = await handler(request)
+
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    response.headers["Access-Control-Allow-Headers"] = "*"
+    response.headers["Access-Control-Allow-Methods"] = "GET, POST, DELETE, OPTIONS"
+    response.headers["Access-Control-Expose-Headers"] = "X-Next-Cursor"
+    return response
+
+
+@web.middleware
+async def metrics_middleware(request, handler):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        # A rota é o padrão registrado (ex: /api/document/{doc_id}), não a URL.
+        resource = request.match_info.route.resource
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            route=resource.canonical if resource is not None else "unmatched",
+            method=request.method,
+            status=status
+        )
+
+
+async def rota_de_busca(request):
+    es = request.app[SEARCH_ENGINE_KEY]
+    if es is None:
+        return web.json_response({"erro": "Não foi possível conectar ao servidor Elasticsearch."}, status=500)
+
+    termo_de_busca = request.query.get('q')
+    cursor = request.query.get('cursor')
+    if not termo_de_busca and not cursor:
+        return web.json_response({"erro": "O parâmetro de busca 'q' é obrigatório."}, status=400)
+
+    try:
+        slim = request.query.get('slim') in ('1', 'true')
+
+        if cursor or request.query.get('paginate') in ('1', 'true'):
+            resultados, proximo_cursor = await es.search_documents_page(
+                MAIN_INDEX_NAME, termo_de_busca, size=20, cursor=cursor, slim=slim
+            )
+            resposta = web.json_response(resultados)
+            if proximo_cursor:
+                resposta.headers['X-Next-Cursor'] = proximo_cursor
+            return resposta
+
+        if request.query.get('profile') in ('1', 'true') and es.profiler is not None:
+            medicoes = {}
+            resultados = await es.search_documents(
+                MAIN_INDEX_NAME, termo_de_busca, size=20, slim=slim, timings=medicoes, profile=True
+            )
+            return web.json_response({"results": resultados, "profile": medicoes.get("profile")})
+
+        resultados = await es.search_documents(MAIN_INDEX_NAME, termo_de_busca, size=20, slim=slim)
+        return web.json_response(resultados)
+    except CursorExpiredError as e:
+        return web.json_response({"erro": str(e)}, status=410)
+    except CursorError as e:
+        return web.json_response({"erro": str(e)}, status=400)
+    except Exception as e:
+        print(f"Erro durante a busca: {e}")
+        return web.json_response({"erro": f"Ocorreu um erro durante a busca: {e}"}, status=500)
+
+
+async def rota_fechar_cursor(request):
+    es = request.app[SEARCH_ENGINE_KEY]
+    if es is None:
+        return web.json_response({"erro": "Não foi possível conectar ao servidor Elasticsearch."}, status=500)
+
+    cursor = request.query.get('cursor')
+    if not cursor:
+        return web.json_response({"erro": "O parâmetro 'cursor' é obrigatório."}, status=400)
+
+    try:
+        await es.close_cursor(cursor)
+        return web.Response(status=204)
+    except CursorError as e:
+        return web.json_response({"erro": str(e)}, status=400)
+
+
+async def rota_de_busca_em_lote(request):
+    es = request.app[SEARCH_ENGINE_KEY]
+    if es is None:
+        return web.json_response({"erro": "Não foi possível conectar ao servidor Elasticsearch."}, status=500)
+
+    try:
+        corpo = await request.json()
+    except ValueError:
+        corpo = {}
+    if not isinstance(corpo, dict):
+        corpo = {}
+
+    consultas = corpo.get('queries')
+    if not isinstance(consultas, list) or not consultas or not all(isinstance(c, str) and c for c in consultas):
+        return web.json_response({"erro": "O campo 'queries' deve ser uma lista não vazia de strings."}, status=400)
+    if len(consultas) > MAX_BATCH_QUERIES:
+        return web.json_response({"erro": f"No máximo {MAX_BATCH_QUERIES} consultas por requisição."}, status=400)
+
+    tamanho = corpo.get('size', 20)
+    if isinstance(tamanho, bool) or not isinstance(tamanho, int) or not 1 <= tamanho <= MAX_BATCH_SIZE:
+        return web.json_response({"erro": f"O campo 'size' deve ser um inteiro entre 1 e {MAX_BATCH_SIZE}."}, status=400)
+
+    try:
+        resultados = await es.search_documents_batch(
+            MAIN_INDEX_NAME, consultas, size=tamanho, slim=bool(corpo.get('slim', False))
+        )
+        return web.json_response(resultados)
+    except Exception as e:
+        print(f"Erro durante a busca em lote: {e}")
+        return web.json_response({"erro": f"Ocorreu um erro durante a busca em lote: {e}"}, status=500)
+
+
+async def rota_documento(request):
+    es = request.app[SEARCH_ENGINE_KEY]
+    if es is None:
+        return web.json_response({"erro": "Não foi possível conectar ao servidor Elasticsearch."}, status=500)
+
+    doc_id = request.match_info['doc_id']
+    try:
+        documento = await es.get_document(MAIN_INDEX_NAME, doc_id)
+    except Exception as e:
+        print(f"Erro ao buscar o documento: {e}")
+        return web.json_response({"erro": f"Ocorreu um erro ao buscar o documento: {e}"}, status=500)
+
+    if documento is None:
+        return web.json_response({"erro": f"Documento '{doc_id}' não encontrado."}, status=404)
+    return web.json_response(documento)
+
+
+async def rota_prontidao(request):
+    es = request.app[SEARCH_ENGINE_KEY]
+
+    documentos = -1
+    if es is not None:
+        try:
+            documentos = await es.count_documents(MAIN_INDEX_NAME)
+        except Exception as e:
+            print(f"Erro ao verificar o índice: {e}")
+
+    pronto = documentos > 0
+    return web.json_response({
+        "ready": pronto,
+        "documents": documentos,
+        "build": IndexBuildStatus.read(INDEX_BUILD_STATUS_PATH)
+    }, status=200 if pronto else 503)
+
+
+async def rota_relatorio_perfil(request):
+    es = request.app[SEARCH_ENGINE_KEY]
+    if es is None:
+        return web.json_response({"erro": "Não foi possível conectar ao servidor Elasticsearch."}, status=500)
+    if es.profiler is None:
+        return web.json_response({"enabled": False})
+
+    if request.method == "DELETE":
+        es.profiler.reset()
+        return web.Response(status=204)
+
+    top = request.query.get('top')
+    return web.json_response(es.profile_report(int(top) if top and top.isdigit() else None))
+
+
+async def rota_cache_stats(request):
+    es = request.app[SEARCH_ENGINE_KEY]
+    if es is None:
+        return web.json_response({"erro": "Não foi possível conectar ao servidor Elasticsearch."}, status=500)
+
+    return web.json_response(es.cache_stats() or {"enabled": False})
+
+
+async def rota_metricas(request):
+    return web.Response(body=render_metrics().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+
+async def _start_search_engine(app):
+    es = AsyncSearchEngine(
+        hosts=ELASTIC_SEARCH_ADDRESS,
+        config=BEST_QUERY_CONFIG,
+        connections_per_node=ASYNC_ES_CONNECTIONS_PER_NODE
+    )
+
+    if await es.wait_until_ready():
+        app[SEARCH_ENGINE_KEY] = es
+    else:
+        await es.close()
+        app[SEARCH_ENGINE_KEY] = None
+
+
+async def _close_search_engine(app):
+    es = app.get(SEARCH_ENGINE_KEY)
+    if es is not None:
+        await es.close()
+
+
+def create_app(metrics_port: int = None) -> web.Application:
+    """
+    Cria a aplicação aiohttp com a mesma API do servidor Flask de main.py, servida
+    por um único AsyncSearchEngine (e pool de conexões) por processo.
+
+    Com metrics_port, a rota /metrics é servida só nessa porta, exclusiva do
+    processo, em vez de na porta compartilhada da API (ver run_async_server).
+    """
+    REGISTRY.enabled = METRICS_ENABLED
+    middlewares = [metrics_middleware, cors_middleware] if METRICS_ENABLED else [cors_middleware]
+
+    app = web.Application(middlewares=middlewares)
+    app.on_startup.append(_start_search_engine)
+    app.on_cleanup.append(_close_search_engine)
+
+    app.router.add_get('/api/search', rota_de_busca)
+    app.router.add_post('/api/search/batch', rota_de_busca_em_lote)
+    app.router.add_delete('/api/search/cursor', rota_fechar_cursor)
+    app.router.add_get('/api/document/{doc_id}', rota_documento)
+    app.router.add_get('/api/ready', rota_prontidao)
+    app.router.add_get('/api/search/cache', rota_cache_stats)
+    app.router.add_get('/api/search/profile', rota_relatorio_perfil)
+    app.router.add_delete('/api/search/profile', rota_relatorio_perfil)
+    if METRICS_ENABLED and metrics_port is None:
+        app.router.add_get('/metrics', rota_metricas)
+    elif METRICS_ENABLED:
+        app.on_startup.append(partial(_start_metrics_site, port=metrics_port))
+        app.on_cleanup.append(_stop_metrics_site)
+
+    return app
+
+
+async def _start_metrics_site(app, port: int):
+    metrics_app = web.Application()
+    metrics_app.router.add_get('/metrics', rota_metricas)
+
+    runner = web.AppRunner(metrics_app)
+    await runner.setup()
+    await web.TCPSite(runner, port=port).start()
+    app[METRICS_RUNNER_KEY] = runner
+
+
+async def _stop_metrics_site(app):
+    runner = app.get(METRICS_RUNNER_KEY)
+    if runner is not None:
+        await runner.cleanup()
+
+
+def _serve(host: str, port: int, reuse_port: bool, metrics_port: int = None, warmup: bool = False):
+    if warmup:
+        Tools.warmup(BEST_QUERY_CONFIG.text_techniques, llm=BEST_QUERY_CONFIG.ai_global_expansion)
+    web.run_app(create_app(metrics_port), host=host, port=port, reuse_port=reuse_port, print=None)
+
+
+def run_async_server(host: str = '0.0.0.0', port: int = 5000, processes: int = ASYNC_SERVER_PROCESSES):
+    """
+    Inicia o servidor assíncrono. Com processes > 1, cada processo roda o seu
+    próprio event loop na mesma porta (SO_REUSEPORT) e o kernel distribui as
+    conexões entre eles. Como as métricas ficam na memória de cada processo, o
+    processo i as expõe em ASYNC_METRICS_PORT + i, e cada porta deve ser coletada
+    como um alvo separado do Prometheus.
+    """
+    print(f"🚀 Iniciando o servidor assíncrono em {host}:{port} com {processes} processo(s)...")
+
+    if processes <= 1:
+        _serve(host, port, reuse_port=False)
+        return
+
+    # Os processos são criados com spawn, não com fork: o processo pai pode já ter
+    # threads (a construção do índice em segundo plano, o cliente do Elasticsearch),
+    # e um fork copiaria os locks delas no estado em que estivessem. Como nada é
+    # herdado, cada processo carrega as suas ferramentas de texto.
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(
+            target=_serve, args=(host, port, True, ASYNC_METRICS_PORT + i, TEXT_TOOLS_WARMUP), daemon=False
+        )
+        for i in range(processes)
+    ]
+    if METRICS_ENABLED:
+        print(f"📈 Métricas de cada processo nas portas {ASYNC_METRICS_PORT} a {ASYNC_METRICS_PORT + processes - 1}.")
+    for worker in workers:
+        worker.start()
+
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
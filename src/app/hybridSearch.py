@@ -0,0 +1,73 @@
+import time
+from src.app.QueryConfig import QueryConfig
+from src.lsaEmbedder import LSAEmbedder
+from src.telemetry import PREPROCESS_SECONDS
+from src.config import HYBRID_RANK_WINDOW, HYBRID_NUM_CANDIDATES, HYBRID_RRF_K
+
+
+def reciprocal_rank_fusion(hit_lists: list[list[dict]], size: int, rank_constant: int = HYBRID_RRF_K) -> list[dict]:
+    """
+    Funde listas de resultados pelo Reciprocal Rank Fusion: cada documento soma
+    1 / (rank_constant + posição) em cada lista em que aparece. Só as posições
+    contam, então os scores do BM25 e da similaridade de cosseno, que estão em
+    escalas diferentes, não precisam ser normalizados. Os documentos são
+    identificados pelo '_id'; empates mantêm a ordem da primeira lista.
+
+    Returns:
+        list[dict]: Os size primeiros hits (o da primeira lista em que apareceram).
+    """
+    scores = {}
+    hits = {}
+
+    for hit_list in hit_lists:
+        for rank, hit in enumerate(hit_list, start=1):
+            key = hit["_id"]
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rank_constant + rank)
+            hits.setdefault(key, hit)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:size]
+    return [hits[key] for key in ranked]
+
+
+def prepare_query(config: QueryConfig, embedder: LSAEmbedder, query: str, timings: dict = None) -> tuple:
+    """
+    Pré-processa a consulta (QueryConfig.preprocess) e, com um modelo, calcula o
+    seu embedding sobre o texto original, como o dos documentos. O tempo do
+    embedding vai para timings['embedding'] e para a métrica query_preprocess_seconds.
+
+    Returns:
+        tuple[str, list[float] | None]: A consulta pré-processada e o vetor, ou
+            None sem modelo ou se a consulta não tiver termos do vocabulário.
+    """
+    processed = config.preprocess(query, timings)
+    if embedder is None:
+        return processed, None
+
+    start = time.perf_counter()
+    vector = embedder.transform([query])[0]
+    elapsed = time.perf_counter() - start
+
+    PREPROCESS_SECONDS.observe(elapsed, technique="embedding")
+    if timings is not None:
+        timings["embedding"] = elapsed
+
+    return processed, (vector.tolist() if vector.any() else None)
+
+
+def hybrid_searches(config: QueryConfig, index_name: str, query: str, vector: list[float], size: int, slim: bool = False) -> list[dict]:
+    """
+    Cabeçalhos e corpos do _msearch de uma busca híbrida: a busca léxica e a kNN,
+    cada uma com HYBRID_RANK_WINDOW resultados (ao menos size) para a fusão.
+    """
+    window = max(size, HYBRID_RANK_WINDOW)
+    return [
+        {"index": index_name},
+        config.build_request_body(query, window, slim),
+        {"index": index_name},
+        config.build_knn_body(vector, window, slim, HYBRID_NUM_CANDIDATES)
+    ]
+
+
+def fuse_responses(responses: list[dict], size: int) -> list[dict]:
+    """Funde as respostas da busca léxica e da kNN (na ordem de hybrid_searches)."""
+    return reciprocal_rank_fusion([response["hits"]["hits"] for response in responses], size)
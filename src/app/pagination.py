@@ -0,0 +1,98 @@
+import base64
+import hashlib
+import hmac
+import json
+from src.app.QueryConfig import QueryConfig
+from src.config import PAGINATION_CURSOR_SECRET
+
+# Ordenação determinística para o search_after: relevância e, em caso de empate,
+# a posição do documento no shard (disponível apenas com point-in-time).
+PAGE_SORT = [{"_score": {"order": "desc"}}, {"_shard_doc": {"order": "asc"}}]
+
+
+class CursorError(ValueError):
+    """Cursor de paginação inválido."""
+
+
+class CursorExpiredError(CursorError):
+    """O point-in-time do cursor expirou (ou já foi fechado) no Elasticsearch."""
+
+
+def encode_cursor(pit_id: str, search_after: list, query: str, size: int, slim: bool = False) -> str:
+    """
+    Gera o cursor opaco devolvido ao cliente. Ele carrega o point-in-time, a
+    posição da última página e a consulta já pré-processada, para que as páginas
+    seguintes não repitam o pré-processamento. O conteúdo é assinado com
+    PAGINATION_CURSOR_SECRET, então o cliente não consegue alterá-lo.
+    """
+    data = json.dumps(
+        {"pit": pit_id, "after": search_after, "q": query, "size": size, "slim": slim}, separators=(",", ":")
+    ).encode("utf-8")
+    return f"{base64.urlsafe_b64encode(data).decode('ascii')}.{_signature(data)}"
+
+
+def _signature(data: bytes) -> str:
+    digest = hmac.new(PAGINATION_CURSOR_SECRET.encode("utf-8"), data, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, max_size: int = None) -> dict:
+    """
+    Valida a assinatura e o conteúdo do cursor.
+
+    Args:
+        max_size: Maior tamanho de página aceito (o da rota que recebeu o cursor).
+
+    Raises:
+        CursorError: Se o cursor foi alterado, não foi gerado por este servidor
+            ou tem campos inválidos.
+    """
+    try:
+        payload, signature = cursor.split(".", 1)
+        data = base64.urlsafe_b64decode(payload.encode("ascii"))
+        if not hmac.compare_digest(signature, _signature(data)):
+            raise ValueError
+
+        state = json.loads(data)
+        if not isinstance(state, dict) or not {"pit", "after", "q", "size"} <= state.keys():
+            raise ValueError
+    except (ValueError, UnicodeError) as e:
+        raise CursorError("Cursor de paginação inválido.") from e
+
+    size = state["size"]
+    if (
+        not isinstance(state["pit"], str)
+        or not isinstance(state["after"], list)
+        or not isinstance(state["q"], str)
+        or isinstance(size, bool) or not isinstance(size, int) or size < 1
+        or (max_size is not None and size > max_size)
+        or not isinstance(state.get("slim", False), bool)
+    ):
+        raise CursorError("Cursor de paginação inválido.")
+
+    return state
+
+
+def build_page_body(
+    config: QueryConfig, query: str, size: int, pit_id: str, keep_alive: str, search_after: list = None, slim: bool = False
+) -> dict:
+    """Corpo da busca de uma página: o da busca normal mais o point-in-time e a ordenação."""
+    body = config.build_request_body(query, size, slim)
+    body["pit"] = {"id": pit_id, "keep_alive": keep_alive}
+    body["sort"] = PAGE_SORT
+    if search_after is not None:
+        body["search_after"] = search_after
+    return body
+
+
+def next_page_cursor(response: dict, pit_id: str, query: str, size: int, slim: bool = False):
+    """
+    Retorna o cursor da próxima página, ou None se esta for a última (menos
+    resultados que o tamanho da página).
+    """
+    hits = response["hits"]["hits"]
+    if len(hits) < size:
+        return None
+
+    # O Elasticsearch pode devolver um novo id para o point-in-time a cada busca.
+    return encode_cursor(response.get("pit_id", pit_id), hits[-1]["sort"], query, size, slim)
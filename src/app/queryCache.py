@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from src.telemetry import CACHE_REQUESTS
+
+
+class QueryResultCache:
+    """
+    Cache em memória (LRU com TTL) para resultados de busca.
+
+    Quando o cache passa de max_entries, a entrada usada há mais tempo é removida.
+    Entradas mais velhas que ttl segundos são descartadas ao serem lidas. Os
+    contadores de acerto, falha, remoção e invalidação ficam disponíveis em stats().
+    Acertos e falhas também são contados na métrica cache_requests_total, com o
+    rótulo cache=name. É seguro para uso por várias threads.
+
+    Os valores precisam ser serializáveis em JSON: cada entrada guarda o JSON do
+    valor e cada leitura devolve uma cópia nova, então alterar o resultado
+    recebido não altera o que os próximos chamadores recebem.
+    """
+    def __init__(self, max_entries: int = 10000, ttl: float = 300, name: str = "results"):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.name = name
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retorna o valor guardado para a chave, ou None se não houver ou tiver expirado."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache=self.name, result="miss")
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache=self.name, result="miss")
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            CACHE_REQUESTS.inc(cache=self.name, result="hit")
+
+        return json.loads(value)
+
+    def set(self, key, value) -> None:
+        snapshot = json.dumps(value)
+        with self._lock:
+            self._entries[key] = (snapshot, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, match=None) -> None:
+        """
+        Remove as entradas do cache. Com match, remove apenas as chaves para as
+        quais match(chave) é verdadeiro.
+        """
+        with self._lock:
+            if match is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if match(key)]:
+                    del self._entries[key]
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
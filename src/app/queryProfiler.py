@@ -0,0 +1,158 @@
+import random
+import re
+import threading
+
+# Nomes de campo nas descrições das consultas Lucene (ex: "document.body:casa").
+_FIELD_PATTERN = re.compile(r"([A-Za-z_][\w.]*):")
+
+
+def _add(totals: dict, key, time_ns: int, breakdown: dict = None) -> None:
+    entry = totals.setdefault(key, {"time_ns": 0, "breakdown": {}})
+    entry["time_ns"] += time_ns
+    for name, value in (breakdown or {}).items():
+        if not name.endswith("_count"):
+            entry["breakdown"][name] = entry["breakdown"].get(name, 0) + value
+
+
+class QueryProfiler:
+    """
+    Agrega os resultados da profile API do Elasticsearch ("profile": true) de
+    várias buscas e ordena os campos e as cláusulas mais caros.
+
+    O tempo de um campo é o tempo do nó mais alto da árvore de consulta que só
+    referencia aquele campo (na multi_match, a consulta de cada campo dentro do
+    DisjunctionMaxQuery). O tempo de uma cláusula é o tempo exclusivo dos nós
+    daquele tipo (sem o dos filhos). Os tempos são somados entre os shards, então
+    medem o custo total da consulta no cluster, não a latência percebida.
+
+    As buscas são perfiladas quando pedido explicitamente (parâmetro de depuração)
+    ou por amostragem, com probabilidade sample_rate. É seguro para uso por várias
+    threads.
+    """
+    def __init__(self, sample_rate: float = 0.0):
+        self.sample_rate = sample_rate
+        self.requests = 0
+        self._fields = {}
+        self._clauses = {}
+        self._field_requests = {}
+        self._rewrite_ns = 0
+        self._collector_ns = 0
+        self._lock = threading.Lock()
+
+    def should_profile(self, requested: bool = False) -> bool:
+        """Decide se a busca será perfilada: sempre quando requested, senão por amostragem."""
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    @staticmethod
+    def summarize(profile: dict) -> dict:
+        """
+        Resume o campo 'profile' de uma resposta de busca.
+
+        Returns:
+            dict: {'fields': {campo: {'time_ns', 'breakdown'}}, 'clauses': {tipo: {...}},
+                'rewrite_ns': int, 'collector_ns': int}
+        """
+        fields = {}
+        clauses = {}
+        rewrite_ns = 0
+        collector_ns = 0
+
+        def walk(node: dict, field_found: bool) -> None:
+            time_ns = node.get("time_in_nanos", 0)
+            children = node.get("children") or []
+
+            exclusive = time_ns - sum(child.get("time_in_nanos", 0) for child in children)
+            _add(clauses, node.get("type", "unknown"), max(exclusive, 0))
+
+            if not field_found:
+                node_fields = set(_FIELD_PATTERN.findall(node.get("description", "")))
+                if len(node_fields) == 1:
+                    _add(fields, node_fields.pop(), time_ns, node.get("breakdown"))
+                    field_found = True
+
+            for child in children:
+                walk(child, field_found)
+
+        for shard in profile.get("shards", []):
+            for search in shard.get("searches", []):
+                for query in search.get("query", []):
+                    walk(query, False)
+                rewrite_ns += search.get("rewrite_time", 0)
+                collector_ns += sum(collector.get("time_in_nanos", 0) for collector in search.get("collector", []))
+
+        return {"fields": fields, "clauses": clauses, "rewrite_ns": rewrite_ns, "collector_ns": collector_ns}
+
+    def record(self, profile: dict) -> dict:
+        """
+        Soma o profile de uma busca aos totais e retorna o relatório só dela, no
+        mesmo formato de report.
+        """
+        summary = self.summarize(profile)
+
+        with self._lock:
+            self.requests += 1
+            self._rewrite_ns += summary["rewrite_ns"]
+            self._collector_ns += summary["collector_ns"]
+
+            for field, entry in summary["fields"].items():
+                _add(self._fields, field, entry["time_ns"], entry["breakdown"])
+                self._field_requests[field] = self._field_requests.get(field, 0) + 1
+            for clause, entry in summary["clauses"].items():
+                _add(self._clauses, clause, entry["time_ns"])
+
+        return {
+            "fields": self._ranking(summary["fields"]),
+            "clauses": self._ranking(summary["clauses"]),
+            "rewrite_ms": round(summary["rewrite_ns"] / 1e6, 3),
+            "collector_ms": round(summary["collector_ns"] / 1e6, 3)
+        }
+
+    @staticmethod
+    def _ranking(totals: dict, requests: dict = None, top: int = None) -> list[dict]:
+        overall = sum(entry["time_ns"] for entry in totals.values())
+        ranking = []
+
+        for key, entry in sorted(totals.items(), key=lambda item: item[1]["time_ns"], reverse=True)[:top]:
+            count = requests.get(key, 0) if requests is not None else None
+            item = {
+                "name": key,
+                "total_ms": round(entry["time_ns"] / 1e6, 3),
+                "share": round(entry["time_ns"] / overall, 4) if overall else 0.0
+            }
+            if count is not None:
+                item["requests"] = count
+                item["mean_ms"] = round(entry["time_ns"] / 1e6 / count, 3) if count else 0.0
+            if entry["breakdown"]:
+                item["breakdown_ms"] = {
+                    name: round(value / 1e6, 3)
+                    for name, value in sorted(entry["breakdown"].items(), key=lambda pair: pair[1], reverse=True)
+                    if value
+                }
+            ranking.append(item)
+
+        return ranking
+
+    def report(self, top: int = None) -> dict:
+        """
+        Relatório agregado: campos e cláusulas ordenados pelo tempo total, com a
+        fração do total, a média por busca perfilada e o detalhamento do Lucene
+        (build_scorer, next_doc, score, ...) de cada campo.
+        """
+        with self._lock:
+            return {
+                "profiled_requests": self.requests,
+                "sample_rate": self.sample_rate,
+                "fields": self._ranking(self._fields, self._field_requests, top),
+                "clauses": self._ranking(self._clauses, top=top),
+                "rewrite_ms": round(self._rewrite_ns / 1e6, 3),
+                "collector_ms": round(self._collector_ns / 1e6, 3)
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self._fields.clear()
+            self._clauses.clear()
+            self._field_requests.clear()
+            self._rewrite_ns = 0
+            self._collector_ns = 0
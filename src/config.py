@@ -1,9 +1,100 @@
 import os
+import secrets
 from src.app.QueryConfig import QueryConfig
 
 DATABASE_PATH = os.getenv('DATABASE_PATH', 'data/baseDocumentos')
 IDEAL_QUERY_PATH = os.getenv('IDEAL_QUERY_PATH', 'data/query_eval')
 ELASTIC_SEARCH_ADDRESS = os.getenv('ELASTICSEARCH_HOSTS', 'http://localhost:9200')
 MAIN_INDEX_NAME = os.getenv('MAIN_INDEX_NAME', 'test_index')
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 256))
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', os.cpu_count() or 1))
+INGEST_CHECKPOINT_PATH = os.getenv('INGEST_CHECKPOINT_PATH', 'data/.ingest_checkpoint.json')
+LEMMATIZATION_BATCH_SIZE = int(os.getenv('LEMMATIZATION_BATCH_SIZE', 64))
 
-BEST_QUERY_CONFIG = QueryConfig(text_techniques_list=['lowercase_text', 'remove_stopwords'])
\ No newline at end of file
+# MAIN_INDEX_NAME é um alias para o índice físico da geração atual ({MAIN_INDEX_NAME}-v{data e hora}).
+INDEX_REBUILD_ON_START = os.getenv('INDEX_REBUILD_ON_START', 'false').lower() == 'true'
+INDEX_GENERATIONS_TO_KEEP = int(os.getenv('INDEX_GENERATIONS_TO_KEEP', 2))
+INDEX_BUILD_STATUS_PATH = os.getenv('INDEX_BUILD_STATUS_PATH', 'data/.index_build_status.json')
+# Fração máxima de documentos recusados pelo Elasticsearch para que uma nova geração
+# ainda assuma o alias. Acima dela, a geração é descartada e as anteriores são mantidas.
+INDEX_BUILD_MAX_ERROR_RATE = float(os.getenv('INDEX_BUILD_MAX_ERROR_RATE', 0.0))
+
+# Diretório do índice do LocalSearchEngine (busca BM25 em memória, sem Elasticsearch).
+LOCAL_INDEX_PATH = os.getenv('LOCAL_INDEX_PATH', 'data/local_index')
+
+QUERY_CACHE_ENABLED = os.getenv('QUERY_CACHE_ENABLED', 'true').lower() == 'true'
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv('QUERY_CACHE_MAX_ENTRIES', 10000))
+QUERY_CACHE_TTL = float(os.getenv('QUERY_CACHE_TTL', 300))
+QUERY_CACHE_GENERATION_CHECK = float(os.getenv('QUERY_CACHE_GENERATION_CHECK', 5))
+
+MAX_BATCH_QUERIES = int(os.getenv('MAX_BATCH_QUERIES', 100))
+# Maior 'size' (resultados por consulta) aceito em /api/search/batch.
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 100))
+
+# Avaliação (src/test/compareEngines.py): configurações avaliadas ao mesmo tempo e
+# consultas por requisição _msearch.
+EVAL_CONCURRENCY = int(os.getenv('EVAL_CONCURRENCY', 4))
+EVAL_BATCH_SIZE = int(os.getenv('EVAL_BATCH_SIZE', 100))
+
+PAGINATION_KEEP_ALIVE = os.getenv('PAGINATION_KEEP_ALIVE', '2m')
+# Chave HMAC dos cursores de paginação. Sem ela, uma chave aleatória é gerada e
+# exportada no ambiente, para que os processos filhos do servidor a herdem; com
+# várias instâncias do servidor, defina a mesma chave em todas.
+PAGINATION_CURSOR_SECRET = os.getenv('PAGINATION_CURSOR_SECRET') or secrets.token_hex(32)
+os.environ['PAGINATION_CURSOR_SECRET'] = PAGINATION_CURSOR_SECRET
+
+SLIM_SNIPPET_CHARS = int(os.getenv('SLIM_SNIPPET_CHARS', 300))
+DOCUMENT_CACHE_MAX_ENTRIES = int(os.getenv('DOCUMENT_CACHE_MAX_ENTRIES', 1000))
+DOCUMENT_CACHE_TTL = float(os.getenv('DOCUMENT_CACHE_TTL', 300))
+
+# Métricas no formato do Prometheus, expostas em /metrics (ver src/telemetry.py).
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+# Perfilamento das buscas com a profile API do Elasticsearch (ver src/app/queryProfiler.py).
+# Com ele ativado, profile=1 em /api/search perfila a busca e QUERY_PROFILE_SAMPLE_RATE
+# é a fração das demais buscas perfiladas por amostragem.
+QUERY_PROFILING_ENABLED = os.getenv('QUERY_PROFILING_ENABLED', 'false').lower() == 'true'
+QUERY_PROFILE_SAMPLE_RATE = float(os.getenv('QUERY_PROFILE_SAMPLE_RATE', 0.0))
+
+# Busca híbrida: BM25 + kNN sobre embeddings LSA (ver src/lsaEmbedder.py), fundidos por
+# RRF. Com DENSE_RETRIEVAL_ENABLED, cada nova geração do índice ajusta um modelo sobre
+# EMBEDDING_FIT_SAMPLE documentos (salvo em EMBEDDING_MODEL_PATH/{índice}) e indexa o
+# campo 'embedding'; a configuração padrão da busca passa a ser híbrida.
+DENSE_RETRIEVAL_ENABLED = os.getenv('DENSE_RETRIEVAL_ENABLED', 'false').lower() == 'true'
+EMBEDDING_MODEL_PATH = os.getenv('EMBEDDING_MODEL_PATH', 'data/embedding_models')
+EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', 256))
+EMBEDDING_FIT_SAMPLE = int(os.getenv('EMBEDDING_FIT_SAMPLE', 10000))
+HYBRID_RANK_WINDOW = int(os.getenv('HYBRID_RANK_WINDOW', 50))
+HYBRID_NUM_CANDIDATES = int(os.getenv('HYBRID_NUM_CANDIDATES', 100))
+HYBRID_RRF_K = int(os.getenv('HYBRID_RRF_K', 60))
+
+SERVING_MODE = os.getenv('SERVING_MODE', 'flask')
+ASYNC_SERVER_PROCESSES = int(os.getenv('ASYNC_SERVER_PROCESSES', 1))
+# Com ASYNC_SERVER_PROCESSES > 1, o processo i expõe as suas métricas em ASYNC_METRICS_PORT + i.
+ASYNC_METRICS_PORT = int(os.getenv('ASYNC_METRICS_PORT', 9100))
+ASYNC_MAX_CONCURRENT_SEARCHES = int(os.getenv('ASYNC_MAX_CONCURRENT_SEARCHES', 256))
+ASYNC_PREPROCESS_WORKERS = int(os.getenv('ASYNC_PREPROCESS_WORKERS', 4))
+ASYNC_ES_CONNECTIONS_PER_NODE = int(os.getenv('ASYNC_ES_CONNECTIONS_PER_NODE', 64))
+
+# Carrega os modelos de texto (e o cliente do LLM, se usado) na inicialização da API,
+# em vez de no primeiro uso.
+TEXT_TOOLS_WARMUP = os.getenv('TEXT_TOOLS_WARMUP', 'false').lower() == 'true'
+
+LLM_MODEL = os.getenv('LLM_MODEL', 'llama3')
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', 'data/llm_cache.sqlite')
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 200000))
+AI_TEXT_ASYNC = os.getenv('AI_TEXT_ASYNC', 'true').lower() == 'true'
+AI_TEXT_CONCURRENCY = int(os.getenv('AI_TEXT_CONCURRENCY', 8))
+AI_TEXT_TIMEOUT = float(os.getenv('AI_TEXT_TIMEOUT', 120))
+AI_TEXT_MAX_RETRIES = int(os.getenv('AI_TEXT_MAX_RETRIES', 2))
+
+BULK_THREAD_COUNT = int(os.getenv('BULK_THREAD_COUNT', 4))
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', 500))
+BULK_MAX_CHUNK_BYTES = int(os.getenv('BULK_MAX_CHUNK_BYTES', 10 * 1024 * 1024))
+BULK_QUEUE_SIZE = int(os.getenv('BULK_QUEUE_SIZE', 4))
+BULK_MAX_RETRIES = int(os.getenv('BULK_MAX_RETRIES', 5))
+BULK_INITIAL_BACKOFF = float(os.getenv('BULK_INITIAL_BACKOFF', 2))
+BULK_MAX_BACKOFF = float(os.getenv('BULK_MAX_BACKOFF', 60))
+
+BEST_QUERY_CONFIG = QueryConfig(text_techniques_list=['lowercase_text', 'remove_stopwords'], hybrid=DENSE_RETRIEVAL_ENABLED)
\ No newline at end of file
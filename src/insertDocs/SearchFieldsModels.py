@@ -1,4 +1,4 @@
-from src.textTools import Tools
+from src.textTools import Tools, TextNormalizer
 
 class SearchFieldsConfig:
     COMMON_TECHNIQUES= [
@@ -24,6 +24,38 @@ class SearchField:
         """Retorna uma representação legível do objeto."""
         return f"SearchField(from_field='{self.from_field}', techniques={self.techniques})"
 
+    @property
+    def name(self) -> str:
+        """Nome do campo gerado dentro de 'search_fields'."""
+        return self.from_field + "_" + "_".join(self.techniques)
+
+
+class TechniqueNode:
+    """
+    Nó do DAG de técnicas. Cada nó representa a aplicação de uma técnica
+    sobre o resultado do nó pai, de forma que combinações que compartilham
+    o mesmo prefixo de técnicas reaproveitam o texto intermediário.
+
+    As técnicas restantes de cada combinação (as que operam palavra a palavra)
+    ficam em normalizers, já compiladas em um TextNormalizer de uma só passada.
+    """
+    def __init__(self, technique:str=None):
+        self.technique = technique
+        self.children: dict[str, "TechniqueNode"] = {}
+        self.outputs: list[str] = []
+        self.normalizers: list[tuple[str, TextNormalizer]] = []
+
+    def child(self, technique:str) -> "TechniqueNode":
+        if technique not in self.children:
+            self.children[technique] = TechniqueNode(technique)
+        return self.children[technique]
+
+    def __repr__(self):
+        return (
+            f"TechniqueNode(technique='{self.technique}', outputs={self.outputs}, "
+            f"normalizers={self.normalizers}, children={list(self.children.values())})"
+        )
+
 TEXT_FUNCTIONS = {
     "remove_stopwords": Tools.remove_stopwords,
     "lowercase_text": Tools.lowercase_text,
@@ -31,3 +63,7 @@ TEXT_FUNCTIONS = {
     "stemming": Tools.apply_stemming
 }
 
+# Versões em lote das técnicas que se beneficiam de processar vários textos de uma vez.
+BATCH_TEXT_FUNCTIONS = {
+    "lemmatization": Tools.apply_lemmatization_batch
+}
@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from src.config import LLM_MODEL, AI_TEXT_CONCURRENCY, AI_TEXT_TIMEOUT, AI_TEXT_MAX_RETRIES
+from src.llmCache import LLMCache
+from src.telemetry import LLM_REQUEST_SECONDS, LLM_ERRORS
+from src.textTools import Tools, get_llm_cache, get_ollama
+
+
+class AITextEnricher:
+    """
+    Gera o campo ai_text de vários documentos de forma assíncrona.
+
+    Um event loop próprio roda em uma thread separada e mantém até 'concurrency'
+    requisições ao Ollama em andamento ao mesmo tempo. Assim a geração acontece em
+    paralelo ao processamento de texto (CPU) da ingestão. Cada requisição tem
+    timeout e novas tentativas. Se todas falharem, o resultado é None, para que o
+    chamador distinga a falha de um texto vazio, e o contador failures é incrementado.
+
+    Usa os mesmos prompts e o mesmo cache persistente de Tools.ai_text. O endereço
+    do servidor pode ser trocado por um Ollama falso (ver src/test/fakeServices.py)
+    com o argumento host ou com a variável OLLAMA_HOST.
+
+    Exemplo:
+        with AITextEnricher() as enricher:
+            future = enricher.submit(highlights)
+            ...  # processamento que não depende do ai_text
+            ai_texts = future.result()
+    """
+    def __init__(
+        self,
+        concurrency: int = AI_TEXT_CONCURRENCY,
+        timeout: float = AI_TEXT_TIMEOUT,
+        max_retries: int = AI_TEXT_MAX_RETRIES,
+        host: str = None,
+    ):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.host = host
+        self.failures = 0
+
+        self._cache = get_llm_cache()
+        self._client = None
+        self._semaphore = None
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="ai-text-enricher", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, texts: list[str]) -> Future:
+        """
+        Agenda a geração do ai_text de cada texto e retorna imediatamente um Future
+        que resolve para a lista de resultados, na mesma ordem de texts. Textos
+        vazios ou None resultam em string vazia, sem chamar o LLM; falhas do LLM
+        resultam em None.
+        """
+        return asyncio.run_coroutine_threadsafe(self._enrich_all(texts), self._loop)
+
+    def enrich(self, texts: list[str]) -> list[str | None]:
+        return self.submit(texts).result()
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+
+        if self._client is not None:
+            # O AsyncClient do ollama não expõe um método para fechar o httpx.AsyncClient interno.
+            asyncio.run_coroutine_threadsafe(self._client._client.aclose(), self._loop).result()
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _enrich_all(self, texts: list[str]) -> list[str | None]:
+        # O cliente e o semáforo precisam ser criados dentro do event loop que os usa.
+        if self._client is None:
+            self._client = get_ollama().AsyncClient(host=self.host)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        return await asyncio.gather(*(self._enrich(text) for text in texts))
+
+    async def _enrich(self, text: str) -> str | None:
+        if text is None or text == "":
+            return ""
+
+        system_prompt, user_prompt, options = Tools.ai_text_prompts(text)
+
+        key = None
+        if self._cache is not None:
+            key = LLMCache.make_key(LLM_MODEL, system_prompt, user_prompt, options)
+            cached = await asyncio.to_thread(self._cache.get, key)
+            if cached is not None:
+                return cached
+
+        for attempt in range(self.max_retries + 1):
+            # O semáforo limita só as requisições em andamento; a espera entre as
+            # tentativas acontece fora dele para não bloquear os outros textos.
+            async with self._semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await asyncio.wait_for(
+                        self._client.chat(
+                            model=LLM_MODEL,
+                            messages=[
+                                {'role': 'system', 'content': system_prompt},
+                                {'role': 'user', 'content': user_prompt},
+                            ],
+                            options=options
+                        ),
+                        timeout=self.timeout
+                    )
+                    content = response['message']['content']
+                    LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, operation="ai_text")
+                    break
+                except Exception as e:
+                    LLM_ERRORS.inc(operation="ai_text")
+                    error = e
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(2 ** attempt)
+        else:
+            print(f"\nFalha ao gerar ai_text após {self.max_retries + 1} tentativas: {error!r}")
+            self.failures += 1
+            return None
+
+        if key is not None:
+            await asyncio.to_thread(self._cache.set, key, LLM_MODEL, content)
+
+        return content
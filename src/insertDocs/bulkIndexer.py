@@ -0,0 +1,230 @@
+from elasticsearch import Elasticsearch, exceptions
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+import threading
+import time
+from src.config import (
+    BULK_THREAD_COUNT, BULK_CHUNK_SIZE, BULK_MAX_CHUNK_BYTES, BULK_QUEUE_SIZE,
+    BULK_MAX_RETRIES, BULK_INITIAL_BACKOFF, BULK_MAX_BACKOFF
+)
+from src.telemetry import BULK_CHUNK_SECONDS, BULK_ITEMS, BULK_REJECTED_ITEMS
+
+# Status HTTP que indicam que o Elasticsearch está sobrecarregado e que o item
+# pode ser reenviado mais tarde.
+RETRYABLE_STATUS = {429}
+
+
+class ChunkStats:
+    """Estatísticas do envio de um único lote (chunk) para a API _bulk."""
+    def __init__(self, chunk_number: int, docs: int, size_bytes: int):
+        self.chunk_number = chunk_number
+        self.docs = docs
+        self.size_bytes = size_bytes
+        self.success = 0
+        self.failed = 0
+        self.retries = 0
+        self.es_took_ms = 0
+        self.duration = 0.0
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.docs / self.duration if self.duration > 0 else 0.0
+
+    def __repr__(self):
+        return (
+            f"ChunkStats(chunk={self.chunk_number}, docs={self.docs}, bytes={self.size_bytes}, "
+            f"success={self.success}, failed={self.failed}, retries={self.retries}, "
+            f"took={self.es_took_ms}ms, duration={self.duration:.2f}s, docs/s={self.docs_per_second:.1f})"
+        )
+
+
+class BulkIndexer:
+    """
+    Envia documentos para a API _bulk do Elasticsearch com várias requisições
+    simultâneas.
+
+    - Os lotes são limitados tanto pelo número de documentos quanto pelo tamanho em bytes.
+    - Itens rejeitados com 429 são reenviados sozinhos, com backoff exponencial,
+      sem reenviar o lote inteiro.
+    - No máximo thread_count + queue_size lotes ficam pendentes ao mesmo tempo. Quando
+      o Elasticsearch demora a responder, o produtor dos documentos fica bloqueado
+      até que um lote termine.
+    - As estatísticas de cada lote ficam disponíveis em chunk_stats.
+    """
+    def __init__(
+        self,
+        client: Elasticsearch,
+        index_name: str,
+        thread_count: int = BULK_THREAD_COUNT,
+        chunk_size: int = BULK_CHUNK_SIZE,
+        max_chunk_bytes: int = BULK_MAX_CHUNK_BYTES,
+        queue_size: int = BULK_QUEUE_SIZE,
+        max_retries: int = BULK_MAX_RETRIES,
+        initial_backoff: float = BULK_INITIAL_BACKOFF,
+        max_backoff: float = BULK_MAX_BACKOFF,
+    ):
+        self.client = client
+        self.index_name = index_name
+        self.thread_count = thread_count
+        self.chunk_size = chunk_size
+        self.max_chunk_bytes = max_chunk_bytes
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        self.chunk_stats: list[ChunkStats] = []
+        self.success = 0
+        self.errors: list = []
+        self._lock = threading.Lock()
+
+    def _serialize(self, data: dict) -> bytes:
+        return self.client.transport.serializers.dumps(data, mimetype="application/json")
+
+    def _iter_chunks(self, docs: Iterable[dict]):
+        """
+        Agrupa os documentos em lotes de pares (linha de ação, linha de documento) já
+        serializados, respeitando chunk_size e max_chunk_bytes.
+        """
+        chunk = []
+        chunk_bytes = 0
+
+        for doc in docs:
+            action = {"index": {"_index": self.index_name}}
+            if doc.get("id") is not None:
+                action["index"]["_id"] = doc["id"]
+
+            pair = (self._serialize(action), self._serialize(doc))
+            pair_bytes = len(pair[0]) + len(pair[1]) + 2
+
+            if chunk and (len(chunk) >= self.chunk_size or chunk_bytes + pair_bytes > self.max_chunk_bytes):
+                yield chunk
+                chunk = []
+                chunk_bytes = 0
+
+            chunk.append(pair)
+            chunk_bytes += pair_bytes
+
+        if chunk:
+            yield chunk
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.max_backoff, self.initial_backoff * (2 ** attempt))
+
+    def _send_chunk(self, chunk_number: int, chunk: list[tuple[bytes, bytes]]) -> ChunkStats:
+        stats = ChunkStats(chunk_number, len(chunk), sum(len(a) + len(d) + 2 for a, d in chunk))
+        start_time = time.time()
+        pending = chunk
+        errors = []
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                stats.retries += 1
+                time.sleep(self._backoff(attempt - 1))
+
+            try:
+                response = self.client.bulk(operations=[line for pair in pending for line in pair])
+            except exceptions.ApiError as e:
+                # O lote inteiro foi rejeitado (ex: 429 na fila de escrita do nó).
+                if e.status_code in RETRYABLE_STATUS:
+                    BULK_REJECTED_ITEMS.inc(len(pending))
+                    if attempt < self.max_retries:
+                        continue
+                errors.extend({"index": {"status": e.status_code, "error": str(e)}} for _ in pending)
+                pending = []
+                break
+            except (exceptions.ConnectionError, exceptions.ConnectionTimeout) as e:
+                if attempt < self.max_retries:
+                    continue
+                errors.extend({"index": {"status": None, "error": str(e)}} for _ in pending)
+                pending = []
+                break
+
+            stats.es_took_ms += response.get("took", 0)
+
+            retry = []
+            for pair, item in zip(pending, response["items"]):
+                result = next(iter(item.values()))
+                status = result.get("status", 500)
+                if status < 300:
+                    stats.success += 1
+                    continue
+
+                if status in RETRYABLE_STATUS:
+                    BULK_REJECTED_ITEMS.inc()
+                if status in RETRYABLE_STATUS and attempt < self.max_retries:
+                    retry.append(pair)
+                else:
+                    errors.append(item)
+
+            pending = retry
+            if not pending:
+                break
+
+        stats.failed = len(errors)
+        stats.duration = time.time() - start_time
+
+        BULK_CHUNK_SECONDS.observe(stats.duration)
+        BULK_ITEMS.inc(stats.success, result="indexed")
+        if errors:
+            BULK_ITEMS.inc(len(errors), result="failed")
+
+        with self._lock:
+            self.success += stats.success
+            self.errors.extend(errors)
+            self.chunk_stats.append(stats)
+
+        return stats
+
+    def index(self, docs: Iterable[dict]) -> tuple[int, list]:
+        """
+        Indexa os documentos e retorna (número de documentos inseridos, lista de erros).
+        O iterável é consumido sob demanda, então pode ser um gerador.
+        """
+        # Limita o número de lotes pendentes: o produtor bloqueia aqui quando todas
+        # as threads estão ocupadas e a fila está cheia.
+        slots = threading.BoundedSemaphore(self.thread_count + self.queue_size)
+
+        def release(_future):
+            slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.thread_count) as executor:
+            futures = []
+            for chunk_number, chunk in enumerate(self._iter_chunks(docs), start=1):
+                slots.acquire()
+                future = executor.submit(self._send_chunk, chunk_number, chunk)
+                future.add_done_callback(release)
+                futures.append(future)
+
+                if chunk_number % self.thread_count == 0:
+                    print(f"Lotes enviados: {chunk_number} | documentos inseridos: {self.success}", end="\r")
+
+                # Descarta os futures já concluídos (propagando exceções inesperadas)
+                # para não acumular referências aos lotes.
+                running = []
+                for f in futures:
+                    if f.done():
+                        f.result()
+                    else:
+                        running.append(f)
+                futures = running
+
+            for future in futures:
+                future.result()
+
+        print()
+        return self.success, self.errors
+
+    def print_summary(self):
+        if not self.chunk_stats:
+            return
+
+        total_docs = sum(s.docs for s in self.chunk_stats)
+        total_bytes = sum(s.size_bytes for s in self.chunk_stats)
+        total_retries = sum(s.retries for s in self.chunk_stats)
+        slowest = max(self.chunk_stats, key=lambda s: s.duration)
+        mean_rate = sum(s.docs_per_second for s in self.chunk_stats) / len(self.chunk_stats)
+
+        print(f"Lotes enviados: {len(self.chunk_stats)} | documentos: {total_docs} | {total_bytes / 1024 / 1024:.1f} MB")
+        print(f"Reenvios por rejeição: {total_retries} | média por lote: {mean_rate:.1f} docs/s")
+        print(f"Lote mais lento: {slowest}")
@@ -0,0 +1,54 @@
+import json
+import os
+
+
+class IngestCheckpoint:
+    """
+    Guarda em um arquivo local até qual lote do parquet a ingestão já foi indexada,
+    para que uma execução interrompida continue de onde parou.
+
+    O checkpoint só é reaproveitado se o índice, o arquivo de origem e o tamanho
+    dos lotes forem os mesmos da execução anterior.
+    """
+    def __init__(self, path: str, index_name: str, source_path: str, batch_size: int):
+        self.path = path
+        self.key = {
+            "index": index_name,
+            "source": os.path.abspath(source_path),
+            "batch_size": batch_size
+        }
+
+    def load(self) -> int:
+        """Retorna o número do próximo lote a ser processado (0 se não houver checkpoint)."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            print(f"Aviso: checkpoint '{self.path}' ignorado ({e}).")
+            return 0
+
+        if data.get("key") != self.key:
+            print(f"Aviso: checkpoint '{self.path}' pertence a outra ingestão e será ignorado.")
+            return 0
+
+        return data.get("next_batch", 0)
+
+    def save(self, next_batch: int) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Escreve em um arquivo temporário e renomeia, para que uma interrupção
+        # durante a escrita nunca deixe um checkpoint corrompido.
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": self.key, "next_batch": next_batch}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,71 @@
+import json
+import os
+import time
+
+
+class IndexBuildStatus:
+    """
+    Progresso da construção de uma nova geração do índice, gravado em um arquivo
+    local para que a rota de prontidão o leia de qualquer processo do servidor.
+
+    state é 'building', 'ready' ou 'failed'. O progresso é gravado no máximo a cada
+    write_interval segundos; as mudanças de estado são gravadas sempre.
+    """
+    def __init__(self, path: str, write_interval: float = 1.0):
+        self.path = path
+        self.write_interval = write_interval
+        self.data = {}
+        self._last_write = 0.0
+
+    def start(self, index_name: str, total_documents: int) -> None:
+        self.data = {
+            "state": "building",
+            "index": index_name,
+            "processed": 0,
+            "total": total_documents,
+            "started_at": time.time(),
+            "finished_at": None,
+            "indexed": None,
+            "failed": None,
+            "error": None
+        }
+        self._write()
+
+    def progress(self, processed: int) -> None:
+        self.data["processed"] = processed
+        if time.monotonic() - self._last_write >= self.write_interval:
+            self._write()
+
+    def indexed(self, success: int, failed: int) -> None:
+        """Registra quantos documentos foram aceitos e recusados pelo Elasticsearch."""
+        self.data.update(indexed=success, failed=failed)
+        self._write()
+
+    def finish(self) -> None:
+        self.data.update(state="ready", finished_at=time.time())
+        self._write()
+
+    def fail(self, error: str) -> None:
+        self.data.update(state="failed", finished_at=time.time(), error=error)
+        self._write()
+
+    def _write(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Mesmo esquema do IngestCheckpoint: escreve em um temporário e renomeia.
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.path)
+        self._last_write = time.monotonic()
+
+    @staticmethod
+    def read(path: str):
+        """Retorna o último status gravado, ou None se nenhuma construção foi iniciada."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
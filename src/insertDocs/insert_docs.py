@@ -1,16 +1,227 @@
 from src.insertDocs.searchEngine import MyElasticsearch
 from src.insertDocs.pipelineReader import PipelineReader
-from src.config import DATABASE_PATH, ELASTIC_SEARCH_ADDRESS, MAIN_INDEX_NAME
+from src.insertDocs.bulkIndexer import BulkIndexer
+from src.insertDocs.checkpoint import IngestCheckpoint
+from src.insertDocs.indexBuildStatus import IndexBuildStatus
+from src.config import (
+    DATABASE_PATH, ELASTIC_SEARCH_ADDRESS, MAIN_INDEX_NAME, INGEST_BATCH_SIZE, INGEST_CHECKPOINT_PATH,
+    INDEX_GENERATIONS_TO_KEEP, INDEX_BUILD_STATUS_PATH, INDEX_BUILD_MAX_ERROR_RATE, LOCAL_INDEX_PATH,
+    DENSE_RETRIEVAL_ENABLED, EMBEDDING_MODEL_PATH, EMBEDDING_DIMENSIONS, EMBEDDING_FIT_SAMPLE
+)
+from src.lsaEmbedder import LSAEmbedder, embedder_for_mapping
+from collections import deque
+import argparse
+import os
+import shutil
+import threading
+import time
 from src.insertDocs.SearchFieldsModels import SearchFieldsConfig
-from src.insertDocs.utils import generate_search_field_combinations
+from src.insertDocs.utils import generate_index_mapping
 
-def insert_docs_without_processing():
-    reader = PipelineReader(DATABASE_PATH)
+def fit_embedding_model(reader: PipelineReader, path: str, sample_size: int = EMBEDDING_FIT_SAMPLE) -> LSAEmbedder:
+    """
+    Ajusta o modelo de embeddings (LSA) sobre uma amostra aleatória da base e o
+    salva em path.
+    """
+    print(f"Ajustando o modelo de embeddings sobre até {sample_size} documentos...")
+    start_time = time.time()
+
+    texts = [
+        LSAEmbedder.document_text(reader._create_document_from_row(row)["document"])
+        for row in reader.sample_rows(sample_size)
+    ]
+    embedder = LSAEmbedder.fit(texts, dimensions=EMBEDDING_DIMENSIONS)
+    embedder.save(path)
+
+    print(f"Modelo de embeddings ajustado em {time.time() - start_time:.2f} segundos.")
+    return embedder
+
+def delete_unused_embedding_models(se: MyElasticsearch):
+    """Remove os modelos de embeddings das gerações do índice que já foram apagadas."""
+    if not os.path.isdir(EMBEDDING_MODEL_PATH):
+        return
+
+    generations = set(se.indices.get(index=f"{MAIN_INDEX_NAME}-v*", expand_wildcards="open,closed").keys())
+    for name in os.listdir(EMBEDDING_MODEL_PATH):
+        if name.startswith(f"{MAIN_INDEX_NAME}-v") and name not in generations:
+            shutil.rmtree(os.path.join(EMBEDDING_MODEL_PATH, name), ignore_errors=True)
+            print(f"Modelo de embeddings '{name}' removido.")
+
+def insert_docs_without_processing(status: IndexBuildStatus = None) -> str:
+    """
+    Constrói uma nova geração do índice e troca o alias MAIN_INDEX_NAME para ela.
+
+    Os documentos são indexados em um índice físico novo ({MAIN_INDEX_NAME}-v{data e
+    hora}) enquanto a geração anterior continua atendendo às buscas. Ao final, o
+    alias é trocado atomicamente e as gerações mais antigas que
+    INDEX_GENERATIONS_TO_KEEP são removidas. Se a construção falhar, ou se mais
+    de INDEX_BUILD_MAX_ERROR_RATE dos documentos forem recusados, o índice parcial
+    é apagado e nem o alias nem as gerações anteriores são alterados.
+
+    Com DENSE_RETRIEVAL_ENABLED, cada geração tem o seu modelo de embeddings,
+    ajustado antes da indexação e registrado no _meta do mapping, de onde as buscas
+    híbridas o leem.
+
+    Returns:
+        str: O nome do índice físico criado.
+    """
+    reader = PipelineReader(DATABASE_PATH, load=False)
+    se = MyElasticsearch(hosts=ELASTIC_SEARCH_ADDRESS)
+    status = status if status else IndexBuildStatus(INDEX_BUILD_STATUS_PATH)
+
+    index_name = f"{MAIN_INDEX_NAME}-v{time.strftime('%Y%m%d%H%M%S')}"
+    status.start(index_name, reader.count_rows())
+
+    def tracked_documents():
+        for processed, doc in enumerate(reader.iter_documents(), start=1):
+            status.progress(processed)
+            yield doc
+
+    model_path = None
+
+    try:
+        mapping = generate_index_mapping(SearchFieldsConfig)
+        if DENSE_RETRIEVAL_ENABLED:
+            model_path = os.path.join(EMBEDDING_MODEL_PATH, index_name)
+            reader.embedder = fit_embedding_model(reader, model_path)
+            mapping = generate_index_mapping(SearchFieldsConfig, reader.embedder.dimensions)
+            mapping["_meta"] = {"embedding_model": model_path}
+
+        se.create_index(index_name, mapping=mapping)
+
+        with se.bulk_load_mode(index_name):
+            success, errors = se.bulk_insert_documents(index_name, tracked_documents())
+
+        status.indexed(success, len(errors))
+        if success == 0:
+            raise RuntimeError(f"Nenhum documento foi indexado ({len(errors)} erros).")
+        if len(errors) > INDEX_BUILD_MAX_ERROR_RATE * (success + len(errors)):
+            raise RuntimeError(
+                f"{len(errors)} de {success + len(errors)} documentos foram recusados "
+                f"(máximo permitido: {INDEX_BUILD_MAX_ERROR_RATE:.2%}). Primeiro erro: {errors[0]}"
+            )
+
+        se.optimize_index(index_name)
+        se.swap_alias(MAIN_INDEX_NAME, index_name)
+    except Exception as e:
+        status.fail(str(e))
+        se.delete_index(index_name)
+        if model_path is not None:
+            shutil.rmtree(model_path, ignore_errors=True)
+        raise
+
+    status.finish()
+    se.delete_old_generations(MAIN_INDEX_NAME, keep=INDEX_GENERATIONS_TO_KEEP)
+    delete_unused_embedding_models(se)
+    return index_name
+
+def start_background_index_build() -> threading.Thread:
+    """
+    Executa insert_docs_without_processing em uma thread, para que o servidor possa
+    começar a atender (com a geração anterior, se houver) durante a construção.
+    """
+    def build():
+        try:
+            index_name = insert_docs_without_processing()
+            print(f"✅ Nova geração do índice '{MAIN_INDEX_NAME}' pronta: '{index_name}'.")
+        except Exception as e:
+            print(f"❌ Falha ao construir a nova geração do índice '{MAIN_INDEX_NAME}': {e}")
+
+    thread = threading.Thread(target=build, name="index-build", daemon=True)
+    thread.start()
+    return thread
+
+def build_local_index(path: str = LOCAL_INDEX_PATH):
+    """
+    Processa a base como na ingestão do Elasticsearch e salva o índice do
+    LocalSearchEngine em path, para buscas e avaliações sem um Elasticsearch.
+    """
+    # Importado aqui para não carregar o app de busca nas rotinas de ingestão.
+    from src.app.LocalSearchEngine import LocalSearchEngine
+
+    reader = PipelineReader(DATABASE_PATH, load=False)
+
+    engine = LocalSearchEngine.build(MAIN_INDEX_NAME, reader.iter_documents())
+    engine.save(path)
+    return engine
+
+def insert_docs_incremental(batch_size: int = INGEST_BATCH_SIZE):
+    """
+    Indexa apenas os documentos novos ou alterados desde a última ingestão.
+
+    Para cada lote do parquet, os hashes de conteúdo já indexados são buscados com
+    um único _mget e somente as linhas novas ou alteradas são processadas e enviadas.
+    Ao fim de cada lote indexado sem erros, um checkpoint local é salvo, então uma
+    execução interrompida continua a partir do último lote concluído.
+
+    Com DENSE_RETRIEVAL_ENABLED, os embeddings usam o modelo da geração atual do
+    índice (se ela tiver um; um modelo novo só é ajustado em uma nova geração).
+
+    Raises:
+        RuntimeError: Se o alias MAIN_INDEX_NAME ainda não existir.
+    """
+    reader = PipelineReader(DATABASE_PATH, load=False)
     se = MyElasticsearch(hosts=ELASTIC_SEARCH_ADDRESS)
 
-    se.create_index(MAIN_INDEX_NAME)
-    all_docs = reader.documents_to_index_format()
-    se.bulk_insert_documents(MAIN_INDEX_NAME, all_docs)
+    # Os documentos vão para a geração atual, pelo alias. Sem ela não há o que
+    # atualizar: criar o índice aqui deixaria um índice comum no nome do alias.
+    if not se.get_alias_indices(MAIN_INDEX_NAME):
+        raise RuntimeError(
+            f"O alias '{MAIN_INDEX_NAME}' não existe. Construa a primeira geração do índice com "
+            "'python -m src.insertDocs.insert_docs full' antes da ingestão incremental."
+        )
+
+    if DENSE_RETRIEVAL_ENABLED:
+        reader.embedder = embedder_for_mapping(se.indices.get_mapping(index=MAIN_INDEX_NAME))
+        if reader.embedder is None:
+            print(f"O índice '{MAIN_INDEX_NAME}' não tem modelo de embeddings; os documentos serão indexados sem o campo 'embedding'.")
+
+    checkpoint = IngestCheckpoint(INGEST_CHECKPOINT_PATH, MAIN_INDEX_NAME, DATABASE_PATH, batch_size)
+    start_batch = checkpoint.load()
+    if start_batch > 0:
+        print(f"Retomando a ingestão a partir do lote {start_batch + 1}.")
+
+    total_rows = reader.count_rows()
+    batch_numbers = deque()
+    stats = {"checked": 0, "changed": 0}
+
+    def changed_batches():
+        for batch_number, rows in enumerate(reader.iter_record_batches(batch_size)):
+            if batch_number < start_batch:
+                continue
+
+            existing = se.get_source_hashes(MAIN_INDEX_NAME, [row.get("id") for row in rows])
+            changed = reader.filter_changed_rows(rows, existing)
+
+            stats["checked"] += len(rows)
+            stats["changed"] += len(changed)
+            batch_numbers.append(batch_number)
+            yield changed
+
+    all_indexed = True
+
+    for docs in reader._iter_processed_chunks(changed_batches()):
+        batch_number = batch_numbers.popleft()
+
+        if docs:
+            success, errors = BulkIndexer(se, MAIN_INDEX_NAME).index(docs)
+            if errors:
+                all_indexed = False
+                print(f"Lote {batch_number + 1}: {len(errors)} documentos não foram indexados. O checkpoint não avançará.")
+
+        if all_indexed:
+            checkpoint.save(batch_number + 1)
+
+        print(f"Verificados: {stats['checked']}/{total_rows} | novos ou alterados: {stats['changed']}", end="\r")
+
+    print()
+    reader._report_ai_text_failures()
+
+    if all_indexed:
+        checkpoint.clear()
+        print(f"Ingestão incremental concluída: {stats['changed']} documentos indexados.")
+    else:
+        print("Ingestão incremental concluída com erros. Execute novamente para reprocessar os lotes com falha.")
 
 def insert_docs_one_by_one():
     reader = PipelineReader(DATABASE_PATH)
@@ -18,7 +229,7 @@ def insert_docs_one_by_one():
 
     index_name = "test_index"
 
-    se.create_index(index_name)
+    se.create_index(index_name, mapping=generate_index_mapping(SearchFieldsConfig))
 
     total_docs = len(reader.df.index)
         
@@ -46,7 +257,28 @@ def insert_docs_one_by_one():
 
 
         doc = reader._create_document_from_row(row)
-        doc = reader._insert_search_fields(doc, generate_search_field_combinations(SearchFieldsConfig))
+        doc = reader._insert_search_fields(doc)
         doc = reader._insert_ai_text_search_field(doc)
 
         se.insert_document(index_name, doc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestão da base no Elasticsearch ou no índice local.")
+    parser.add_argument(
+        "mode", choices=["full", "incremental", "local"],
+        help="full: constrói uma nova geração do índice e troca o alias; incremental: indexa na geração "
+             "atual só os documentos novos ou alterados; local: salva o índice do LocalSearchEngine."
+    )
+    args = parser.parse_args()
+
+    if args.mode == "full":
+        insert_docs_without_processing()
+    elif args.mode == "incremental":
+        insert_docs_incremental()
+    else:
+        build_local_index()
+
+
+if __name__ == "__main__":
+    main()
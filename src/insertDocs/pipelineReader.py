@@ -1,16 +1,64 @@
 import pandas as pd
+import pyarrow.dataset as ds
+import hashlib
+import json
 import time
 import numpy as np
-from src.config import DATABASE_PATH
-from src.insertDocs.SearchFieldsModels import SearchField, TEXT_FUNCTIONS, SearchFieldsConfig
-from src.insertDocs.utils import generate_search_field_combinations
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from src.config import DATABASE_PATH, INGEST_BATCH_SIZE, INGEST_WORKERS, LEMMATIZATION_BATCH_SIZE, AI_TEXT_ASYNC
+from src.insertDocs.aiEnrichment import AITextEnricher
+from src.insertDocs.SearchFieldsModels import TechniqueNode, TEXT_FUNCTIONS, BATCH_TEXT_FUNCTIONS, SearchFieldsConfig
+from src.insertDocs.utils import generate_search_field_combinations, compile_search_field_dag
+from src.lsaEmbedder import LSAEmbedder, get_embedder
 from src.textTools import Tools
 
+def _json_default(value):
+    # Arrays do numpy (ex: citações lidas pelo pandas) viram listas, para que o
+    # hash não dependa da forma como a linha foi lida.
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+# Leitor usado pelos processos do pool de ingestão. É criado uma única vez por
+# processo em _init_worker, que também carrega, antes do primeiro lote, os recursos
+# das técnicas usadas nos campos de busca (e o modelo de embeddings, se houver).
+_worker_reader = None
+
+def _init_worker(embedder_path: str = None):
+    global _worker_reader
+    embedder = get_embedder(embedder_path) if embedder_path else None
+    _worker_reader = PipelineReader(None, load=False, embedder=embedder)
+    Tools.warmup(_worker_reader.text_techniques())
+
+def _process_rows_in_worker(rows: list[dict], ai_text: bool = True) -> list[dict]:
+    return _worker_reader._process_rows(rows, ai_text)
+
+
 class PipelineReader:
-    def __init__(self, filepath: str):
+    # Colunas do parquet lidas por _create_document_from_row.
+    SOURCE_COLUMNS = ["id", "document", "metadata", "phrasal_terms"]
+
+    def __init__(self, filepath: str, load: bool = True, embedder: LSAEmbedder = None):
+        """
+        Args:
+            embedder: Modelo usado para gerar o campo 'embedding' de cada documento
+                (ver _insert_embeddings). Com workers > 1, precisa ter sido salvo
+                (embedder.path), pois cada processo o carrega do disco.
+        """
         self.filepath = filepath
         self.df = None
-        self.load_file()
+        self.embedder = embedder
+        # Documentos cujo ai_text não pôde ser gerado pelo AITextEnricher.
+        self.ai_text_failures = 0
+        # As combinações de técnicas são as mesmas para todas as linhas, então são
+        # compiladas uma única vez em um DAG de prefixos compartilhados.
+        self.search_fields_dag = compile_search_field_dag(generate_search_field_combinations(SearchFieldsConfig))
+        self.pipeline_signature = ",".join(sorted(
+            name for root in self.search_fields_dag.values() for name in self._dag_outputs(root)
+        ))
+        if load:
+            self.load_file()
     
     def load_file(self) -> None:
         print(f"Lendo arquivo parquet {self.filepath}...")
@@ -29,6 +77,40 @@ class PipelineReader:
         print(f"DataFrame carregado com sucesso com {len(df)} linhas e {len(df.columns)} colunas.")
         print(f"Tempo gasto para ler o arquivo: {time.time() - start_time:.2f} segundos")
     
+    def _open_dataset(self) -> ds.Dataset:
+        return ds.dataset(self.filepath, format="parquet")
+
+    def count_rows(self) -> int:
+        """Retorna o número de linhas do parquet lendo apenas os metadados do arquivo."""
+        return self._open_dataset().count_rows()
+
+    def iter_record_batches(self, batch_size: int = INGEST_BATCH_SIZE):
+        """
+        Lê o parquet em lotes de até batch_size linhas, sem carregar o arquivo inteiro
+        em memória. Apenas as colunas usadas por _create_document_from_row são lidas.
+
+        Yields:
+            list[dict]: As linhas de cada lote, no mesmo formato de df.to_dict('records').
+        """
+        dataset = self._open_dataset()
+        columns = [column for column in self.SOURCE_COLUMNS if column in dataset.schema.names]
+
+        for batch in dataset.to_batches(columns=columns, batch_size=batch_size, batch_readahead=2, fragment_readahead=1):
+            yield batch.to_pylist()
+
+    def sample_rows(self, sample_size: int, seed: int = 42) -> list[dict]:
+        """
+        Retorna uma amostra aleatória (sem reposição) de até sample_size linhas, no
+        mesmo formato de iter_record_batches, lendo apenas as linhas sorteadas.
+        """
+        dataset = self._open_dataset()
+        columns = [column for column in self.SOURCE_COLUMNS if column in dataset.schema.names]
+        total = dataset.count_rows()
+
+        rng = np.random.default_rng(seed)
+        indices = np.sort(rng.choice(total, size=min(sample_size, total), replace=False))
+        return dataset.take(indices, columns=columns).to_pylist()
+
     def _create_document_from_row(self, row: dict):
         """Cria um único dicionário de documento a partir de uma linha (em formato de dict)."""
 
@@ -78,23 +160,43 @@ class PipelineReader:
         }
         return doc
 
-    def _insert_search_fields(self, doc:dict, searchFields:list[SearchField]):
+    def _source_hash(self, doc: dict) -> str:
+        """
+        Calcula o hash do conteúdo de origem de um documento (a saída de
+        _create_document_from_row) junto com os nomes dos campos de busca gerados,
+        para que uma mudança nas técnicas também invalide os documentos existentes.
+        """
+        content = json.dumps(doc, sort_keys=True, ensure_ascii=False, default=_json_default)
+        return hashlib.sha256((self.pipeline_signature + "\n" + content).encode("utf-8")).hexdigest()
+
+    def _insert_search_fields(self, doc:dict, search_fields_dag:dict[str, TechniqueNode]=None, precomputed:dict[str, dict[str, str]]=None):
+        """
+        Gera os campos de busca percorrendo o DAG de técnicas de cada campo de origem.
+        Cada resultado intermediário (ex: o body lematizado) é calculado uma única vez
+        e reaproveitado por todas as combinações que partem dele.
+
+        Args:
+            precomputed: Resultados já calculados para as técnicas aplicadas diretamente
+                sobre o texto original, no formato {campo de origem: {técnica: texto}}.
+                Usado pelo processamento em lote (ver _insert_search_fields_batch).
+        """
+        if search_fields_dag is None:
+            search_fields_dag = self.search_fields_dag
 
         search_fields = {}
 
         try:
 
-            for field in searchFields:
-                
-                field_text = doc["document"][field.from_field]
+            for from_field, root in search_fields_dag.items():
+
+                field_text = doc["document"][from_field]
                 if field_text == None or field_text == "":
-                    search_fields[field.from_field + "_" + "_".join(field.techniques)] = ""
+                    for name in self._dag_outputs(root):
+                        search_fields[name] = ""
                     continue
 
-                for technique_name in field.techniques:
-                    field_text = TEXT_FUNCTIONS[technique_name](field_text)
-
-                search_fields[field.from_field + "_" + "_".join(field.techniques)] = field_text
+                field_precomputed = precomputed.get(from_field) if precomputed else None
+                self._apply_technique_dag(root, field_text, search_fields, field_precomputed)
 
         except Exception as e:
             print("Error transformando texto")
@@ -110,6 +212,74 @@ class PipelineReader:
 
         return doc
 
+    def _apply_technique_dag(self, node:TechniqueNode, text:str, search_fields:dict, precomputed:dict[str, str]=None):
+        for name, normalizer in node.normalizers:
+            search_fields[name] = normalizer.normalize(text)
+
+        for child in node.children.values():
+            if precomputed and child.technique in precomputed:
+                child_text = precomputed[child.technique]
+            else:
+                child_text = TEXT_FUNCTIONS[child.technique](text)
+
+            for name in child.outputs:
+                search_fields[name] = child_text
+
+            self._apply_technique_dag(child, child_text, search_fields)
+
+    def _insert_search_fields_batch(self, docs:list[dict], search_fields_dag:dict[str, TechniqueNode]=None):
+        """
+        Gera os campos de busca de um lote de documentos. As técnicas que possuem
+        versão em lote (BATCH_TEXT_FUNCTIONS, ex: lematização) são aplicadas de uma
+        só vez sobre os textos de todo o lote antes de percorrer o DAG de cada documento.
+        """
+        if search_fields_dag is None:
+            search_fields_dag = self.search_fields_dag
+
+        precomputed = [{} for _ in docs]
+
+        for technique, batch_function in BATCH_TEXT_FUNCTIONS.items():
+            targets = []
+            texts = []
+            for from_field, root in search_fields_dag.items():
+                if technique not in root.children:
+                    continue
+                for i, doc in enumerate(docs):
+                    field_text = doc["document"][from_field]
+                    if field_text:
+                        targets.append((i, from_field))
+                        texts.append(field_text)
+
+            if not texts:
+                continue
+
+            results = batch_function(texts, batch_size=LEMMATIZATION_BATCH_SIZE)
+            for (i, from_field), result in zip(targets, results):
+                precomputed[i].setdefault(from_field, {})[technique] = result
+
+        return [
+            self._insert_search_fields(doc, search_fields_dag, precomputed[i])
+            for i, doc in enumerate(docs)
+        ]
+
+    def _dag_outputs(self, node:TechniqueNode) -> list[str]:
+        outputs = list(node.outputs) + [name for name, _ in node.normalizers]
+        for child in node.children.values():
+            outputs.extend(self._dag_outputs(child))
+        return outputs
+
+    def text_techniques(self) -> list[str]:
+        """Técnicas de texto usadas por algum campo de busca do DAG."""
+        techniques = set()
+        nodes = list(self.search_fields_dag.values())
+        while nodes:
+            node = nodes.pop()
+            if node.technique is not None:
+                techniques.add(node.technique)
+            techniques.update(technique for _, normalizer in node.normalizers for technique in normalizer.techniques)
+            nodes.extend(node.children.values())
+        return sorted(techniques)
+
     def _insert_ai_text_search_field(self, doc):
 
         if doc["document"]["highlight"] is None or doc["document"]["highlight"] == "":
@@ -119,8 +289,112 @@ class PipelineReader:
 
         return doc
 
-    def documents_to_index_format(self):
+    def _insert_embeddings(self, docs: list[dict]) -> list[dict]:
+        """
+        Gera o campo 'embedding' de um lote de documentos com self.embedder.
+        Documentos sem nenhum termo do vocabulário ficam sem o campo: o vetor nulo
+        não é aceito pelo dense_vector com similaridade de cosseno.
+        """
+        vectors = self.embedder.transform([LSAEmbedder.document_text(doc["document"]) for doc in docs])
+        for doc, vector in zip(docs, vectors):
+            if vector.any():
+                doc["embedding"] = vector.tolist()
+        return docs
+
+    def _process_rows(self, rows: list[dict], ai_text: bool = True) -> list[dict]:
+        """
+        Transforma um lote de linhas em documentos prontos para indexação. Com
+        ai_text=False o campo search_fields.ai_text não é gerado aqui (ele vem do
+        AITextEnricher, ver _iter_processed_chunks).
+        """
+        docs = [self._create_document_from_row(row) for row in rows]
+        for doc in docs:
+            doc["source_hash"] = self._source_hash(doc)
+        docs = self._insert_search_fields_batch(docs)
+        if self.embedder is not None:
+            docs = self._insert_embeddings(docs)
+        if ai_text:
+            docs = [self._insert_ai_text_search_field(doc) for doc in docs]
+        return docs
+
+    def _finish_chunk(self, processing, ai_future: Future = None) -> list[dict]:
+        if isinstance(processing, Future):
+            docs = processing.result()
+        else:
+            docs = self._process_rows(processing, ai_text=ai_future is None)
+
+        if ai_future is not None:
+            for doc, text in zip(docs, ai_future.result()):
+                if text is None:
+                    # Sem hash, a próxima ingestão incremental trata o documento como
+                    # alterado e tenta gerar o ai_text de novo.
+                    text = ""
+                    doc["source_hash"] = None
+                    self.ai_text_failures += 1
+                doc["search_fields"]["ai_text"] = text
+
+        return docs
+
+    def _iter_processed_chunks(self, chunks, workers: int = INGEST_WORKERS, async_ai_text: bool = AI_TEXT_ASYNC):
+        """
+        Processa os lotes de linhas e devolve os documentos de cada lote, na mesma
+        ordem de entrada.
+
+        Com workers > 1 os lotes são distribuídos entre um pool de processos. No
+        máximo 2 * workers lotes ficam em processamento ao mesmo tempo, para que
+        os resultados não se acumulem em memória mais rápido do que são consumidos.
+
+        Com async_ai_text o ai_text de cada lote é pedido ao AITextEnricher assim
+        que o lote é lido, e as chamadas ao LLM correm em paralelo às técnicas de
+        texto, em vez de serializar a ingestão a cada documento. Os documentos cujo
+        ai_text falhou ficam com ai_text vazio e sem source_hash, e são contados em
+        self.ai_text_failures.
+        """
+        window = 2 * max(workers, 1)
+        executor = None
+        if workers > 1:
+            embedder_path = self.embedder.path if self.embedder is not None else None
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(embedder_path,))
+        enricher = AITextEnricher() if async_ai_text else None
+
+        try:
+            pending = deque()
+            for rows in chunks:
+                ai_future = None
+                if enricher is not None:
+                    ai_future = enricher.submit([(row.get("document") or {}).get("highlight") for row in rows])
+
+                if executor is not None:
+                    processing = executor.submit(_process_rows_in_worker, rows, enricher is None)
+                else:
+                    # Sem pool, o lote é processado quando sair da fila, enquanto o
+                    # ai_text dos lotes seguintes já está sendo gerado.
+                    processing = rows
+
+                pending.append((processing, ai_future))
+                if len(pending) >= window:
+                    yield self._finish_chunk(*pending.popleft())
+
+            while pending:
+                yield self._finish_chunk(*pending.popleft())
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            if enricher is not None:
+                enricher.close()
+
+    def _report_ai_text_failures(self) -> None:
+        if self.ai_text_failures:
+            print(f"{self.ai_text_failures} documentos ficaram sem ai_text por falha do LLM; "
+                  "serão reprocessados na próxima ingestão incremental.")
+
+    def documents_to_index_format(self, workers: int = INGEST_WORKERS, chunk_size: int = INGEST_BATCH_SIZE):
         """Converte o DataFrame para uma lista de dicionários no formato para indexação.
+
+        Args:
+            workers (int, optional): Número de processos usados no processamento.
+                Com 1 o processamento é feito no processo atual.
+            chunk_size (int, optional): Número de linhas enviadas por vez a cada processo.
         """
         if self.df is None:
             print("DataFrame está vazio. Por favor, carregue o arquivo primeiro.")
@@ -129,18 +403,48 @@ class PipelineReader:
         documents = []
 
         total_docs = len(self.df.index)
-        
-        for i, row in enumerate(self.df.to_dict('records')):
+        records = self.df.to_dict('records')
+        chunks = (records[start:start + chunk_size] for start in range(0, total_docs, chunk_size))
 
-            print(f"Processando documento: {i + 1}/{total_docs}", end="\r")
+        print(f"Processando {total_docs} documentos com {workers} processo(s)...")
 
-            doc = self._create_document_from_row(row)
-            doc = self._insert_search_fields(doc, generate_search_field_combinations(SearchFieldsConfig))
-            doc = self._insert_ai_text_search_field(doc)
-
-            documents.append(doc)
+        for batch in self._iter_processed_chunks(chunks, workers):
+            documents.extend(batch)
+            print(f"Processando documento: {len(documents)}/{total_docs}", end="\r")
 
         print() 
         print("Processamento concluído!")
+        self._report_ai_text_failures()
         
         return documents
+
+    def iter_documents(self, workers: int = INGEST_WORKERS, chunk_size: int = INGEST_BATCH_SIZE):
+        """
+        Gera os documentos no formato para indexação à medida que são processados,
+        lendo o parquet em lotes (ver iter_record_batches). Ao contrário de
+        documents_to_index_format, nunca mantém o arquivo ou a lista completa de
+        documentos em memória, então pode alimentar diretamente o bulk do Elasticsearch.
+        """
+        total_docs = self.count_rows()
+        processed = 0
+
+        print(f"Processando {total_docs} documentos com {workers} processo(s)...")
+
+        for batch in self._iter_processed_chunks(self.iter_record_batches(chunk_size), workers):
+            yield from batch
+            processed += len(batch)
+            print(f"Processando documento: {processed}/{total_docs}", end="\r")
+
+        print()
+        print("Processamento concluído!")
+        self._report_ai_text_failures()
+
+    def filter_changed_rows(self, rows: list[dict], existing_hashes: dict[str, str]) -> list[dict]:
+        """
+        Retorna apenas as linhas novas ou cujo conteúdo mudou em relação ao hash
+        já indexado (existing_hashes, no formato {id: source_hash}).
+        """
+        return [
+            row for row in rows
+            if existing_hashes.get(str(row.get("id"))) != self._source_hash(self._create_document_from_row(row))
+        ]
@@ -1,4 +1,7 @@
-from elasticsearch import Elasticsearch, exceptions, helpers
+from elasticsearch import Elasticsearch, exceptions
+from src.insertDocs.bulkIndexer import BulkIndexer
+from contextlib import contextmanager
+from typing import Iterable
 import time
 
 class MyElasticsearch(Elasticsearch):
@@ -57,19 +60,97 @@ class MyElasticsearch(Elasticsearch):
             print("Tente modificar o arquivo config/elasticsearch.yml mudando xpack.security.enabled para false e reinicie o Elasticsearch.")
             exit(1)
 
-    def create_index(self, index_name, mapping=None):
+    def create_index(self, index_name, mapping=None, settings=None):
         """
         Create an index in Elasticsearch if it does not already exist.
         """
         if not self.indices.exists(index=index_name):
-            if mapping:
-                self.indices.create(index=index_name, mappings=mapping)
-            else:
-                self.indices.create(index=index_name)
+            self.indices.create(index=index_name, mappings=mapping, settings=settings)
             print(f"Index '{index_name}' created.")
         else:
             print(f"Index '{index_name}' already exists.")
 
+    @contextmanager
+    def bulk_load_mode(self, index_name):
+        """
+        Prepara o índice para uma carga grande de documentos.
+
+        Durante o bloco 'with' o refresh e as réplicas ficam desligados. Ao final,
+        mesmo se a carga falhar, as configurações originais são restauradas. O
+        refresh e o force merge ficam a cargo do chamador (ver optimize_index),
+        para que não sejam feitos em um índice que será descartado.
+
+        Exemplo:
+            with se.bulk_load_mode(index_name):
+                se.bulk_insert_documents(index_name, docs)
+            se.optimize_index(index_name)
+        """
+        names = ["index.refresh_interval", "index.number_of_replicas"]
+        response = self.indices.get_settings(index=index_name, name=names, flat_settings=True, include_defaults=True)
+        index_settings = next(iter(response.values()))
+        original = {
+            name: index_settings.get("settings", {}).get(name, index_settings.get("defaults", {}).get(name))
+            for name in names
+        }
+
+        print(f"Desativando refresh e réplicas do índice '{index_name}' durante a carga...")
+        self.indices.put_settings(index=index_name, settings={"index.refresh_interval": "-1", "index.number_of_replicas": 0})
+
+        try:
+            yield
+        finally:
+            print(f"Restaurando configurações do índice '{index_name}': {original}")
+            self.indices.put_settings(index=index_name, settings=original)
+
+    def optimize_index(self, index_name, max_num_segments=1):
+        """Faz o refresh do índice e une os seus segmentos com force merge."""
+        self.indices.refresh(index=index_name)
+
+        print(f"Executando force merge em '{index_name}' (max_num_segments={max_num_segments})...")
+        start_time = time.time()
+        self.options(request_timeout=3600).indices.forcemerge(index=index_name, max_num_segments=max_num_segments)
+        print(f"Force merge concluído em {time.time() - start_time:.2f} segundos.")
+
+    def get_alias_indices(self, alias):
+        """Retorna os índices físicos apontados pelo alias (lista vazia se ele não existir)."""
+        try:
+            return sorted(self.indices.get_alias(name=alias).keys())
+        except exceptions.NotFoundError:
+            return []
+
+    def swap_alias(self, alias, new_index):
+        """
+        Aponta o alias para new_index em uma única operação atômica: as buscas passam
+        do índice antigo para o novo sem nenhum intervalo sem resultados. Se existir um
+        índice comum com o nome do alias (instalações anteriores ao uso de alias), ele
+        é removido na mesma operação.
+
+        Returns:
+            list[str]: Os índices para os quais o alias apontava antes.
+        """
+        previous = self.get_alias_indices(alias)
+
+        actions = [{"remove": {"index": index, "alias": alias}} for index in previous]
+        if not previous and self.indices.exists(index=alias):
+            actions.append({"remove_index": {"index": alias}})
+        actions.append({"add": {"index": new_index, "alias": alias}})
+
+        self.indices.update_aliases(actions=actions)
+        print(f"Alias '{alias}' agora aponta para '{new_index}' (antes: {previous or 'nenhum'}).")
+        return previous
+
+    def delete_old_generations(self, alias, keep):
+        """
+        Remove as gerações ({alias}-v*) mais antigas, mantendo as keep mais recentes
+        e qualquer uma que ainda esteja no alias.
+        """
+        generations = sorted(self.indices.get(index=f"{alias}-v*", expand_wildcards="open,closed").keys())
+        in_use = set(self.get_alias_indices(alias))
+
+        for index in generations[:-keep] if keep > 0 else generations:
+            if index not in in_use:
+                self.delete_index(index)
+
     def delete_index(self, index_name):
         """
         Delete an index in Elasticsearch if it exists.
@@ -170,63 +251,78 @@ class MyElasticsearch(Elasticsearch):
             print(f"Error counting documents: {e}")
             raise Exception
 
-    def bulk_insert_documents(self, index_name: str, docs: list[dict]):
+    def get_source_hashes(self, index_name: str, ids: list[str]) -> dict[str, str]:
+        """
+        Busca, em uma única requisição (_mget), o source_hash dos documentos já
+        indexados. Documentos inexistentes não aparecem no dicionário retornado.
+
+        Returns:
+            dict[str, str]: {id do documento: source_hash}
+        """
+        if not ids:
+            return {}
+
+        response = self.mget(index=index_name, ids=[str(doc_id) for doc_id in ids], source_includes=["source_hash"])
+
+        return {
+            doc["_id"]: doc.get("_source", {}).get("source_hash")
+            for doc in response["docs"]
+            if doc.get("found")
+        }
+
+    def bulk_insert_documents(self, index_name: str, docs: Iterable[dict], **indexer_options):
         """
-        Insere uma lista de documentos em lote (bulk) no índice especificado.
+        Insere documentos em lote (bulk) no índice especificado.
 
-        Este método é altamente otimizado para inserir um grande volume de
-        documentos de uma só vez, sendo muito mais performático do que
-        inserir um por um.
+        Os documentos são enviados por um BulkIndexer, com várias requisições
+        simultâneas, lotes limitados por quantidade e por bytes e reenvio com
+        backoff exponencial apenas dos itens rejeitados pelo Elasticsearch (429).
 
         Args:
             index_name (str): O nome do índice onde os documentos serão inseridos.
-            docs (list[dict]): Uma lista de dicionários, onde cada dicionário
-                               é um documento a ser indexado. É recomendado que
-                               cada dicionário tenha uma chave 'id' para usar como
-                               o _id do documento no Elasticsearch.
+            docs (Iterable[dict]): Uma lista ou gerador de dicionários, onde cada
+                               dicionário é um documento a ser indexado. Geradores
+                               são consumidos sob demanda, e o consumo desacelera
+                               quando o Elasticsearch não dá conta do volume. É
+                               recomendado que cada dicionário tenha uma chave 'id'
+                               para usar como o _id do documento no Elasticsearch.
+            **indexer_options: Parâmetros repassados ao BulkIndexer (thread_count,
+                               chunk_size, max_chunk_bytes, queue_size, max_retries...).
 
         Returns:
             tuple[int, list]: Uma tupla contendo:
                 - O número de documentos inseridos com sucesso.
                 - Uma lista de erros, se houver. Cada erro é um dicionário
-                  detalhando a falha.
+                  detalhando a falha de um item.
         """
-        if not docs:
+        if isinstance(docs, list) and not docs:
             print("A lista de documentos está vazia. Nenhuma ação foi tomada.")
             return 0, []
 
-        actions = (
-            {
-                "_index": index_name,
-                "_id": doc.get("id"),  # Usa o 'id' do doc como _id. Se não houver, o ES gera um.
-                "_source": doc
-            }
-            for doc in docs
-        )
+        indexer = BulkIndexer(self, index_name, **indexer_options)
 
-        print(f"Usando helper com NOVA CONEXÃO. Iniciando a inserção em lote de {len(docs)} documentos no índice '{index_name}'...")
+        total = f"{len(docs)} " if isinstance(docs, list) else ""
+        print(f"Iniciando a inserção em lote de {total}documentos no índice '{index_name}' com {indexer.thread_count} requisições simultâneas...")
         start_time = time.time()
-        
+
         try:
-            success, errors = helpers.bulk(client=self, actions=actions)
-            
-            duration = time.time() - start_time
-            print(f"Inserção em lote finalizada em {duration:.2f} segundos.")
-            print(f"Documentos inseridos com sucesso: {success}")
-
-            if errors:
-                print(f"Ocorreram {len(errors)} erros durante a inserção:")
-                # Imprime os primeiros 5 erros para não poluir o console
-                for i, error in enumerate(errors[:5]):
-                    print(f"  Erro {i+1}: {error}")
-                if len(errors) > 5:
-                    print(f"  ... e mais {len(errors) - 5} erros.")
-
-            return success, errors
-
-        except exceptions.ConnectionError as e:
-            print(f"Erro de conexão durante a operação em lote: {e}")
-            return 0, [str(e)]
+            success, errors = indexer.index(docs)
         except Exception as e:
             print(f"Ocorreu um erro inesperado durante a operação em lote: {e}")
-            return 0, [str(e)]
\ No newline at end of file
+            # Os lotes já confirmados continuam indexados; apenas o restante é perdido.
+            success, errors = indexer.success, indexer.errors + [str(e)]
+
+        duration = time.time() - start_time
+        print(f"Inserção em lote finalizada em {duration:.2f} segundos.")
+        print(f"Documentos inseridos com sucesso: {success}")
+        indexer.print_summary()
+
+        if errors:
+            print(f"Ocorreram {len(errors)} erros durante a inserção:")
+            # Imprime os primeiros 5 erros para não poluir o console
+            for i, error in enumerate(errors[:5]):
+                print(f"  Erro {i+1}: {error}")
+            if len(errors) > 5:
+                print(f"  ... e mais {len(errors) - 5} erros.")
+
+        return success, errors
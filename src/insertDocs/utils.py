@@ -1,4 +1,5 @@
-from src.insertDocs.SearchFieldsModels import SearchFieldsConfig, SearchField
+from src.insertDocs.SearchFieldsModels import SearchFieldsConfig, SearchField, TechniqueNode
+from src.textTools import Tools, TextNormalizer
 from itertools import chain, combinations as iter_combinations, product
 
 def generate_search_field_combinations(config: SearchFieldsConfig) -> list[SearchField]:
@@ -49,4 +50,116 @@ def generate_search_field_combinations(config: SearchFieldsConfig) -> list[Searc
         for tech_set_tuple in sorted(list(valid_technique_sets)): # Ordena para um resultado previsível
             all_combinations.append(SearchField(techniques=list(tech_set_tuple), from_field=field))
 
-    return all_combinations
\ No newline at end of file
+    return all_combinations
+
+def compile_search_field_dag(search_fields: list[SearchField]) -> dict[str, TechniqueNode]:
+    """
+    Compila as combinações de técnicas em um DAG de prefixos compartilhados,
+    um por campo de origem.
+
+    As técnicas de cada SearchField são aplicadas na ordem em que aparecem. As que
+    operam sobre o texto inteiro (TextNormalizer.TEXT_TECHNIQUES, ex: lematização)
+    viram nós compartilhados: ['lemmatization', 'lowercase_text'] e
+    ['lemmatization', 'remove_stopwords'] partem do mesmo nó 'lemmatization',
+    calculado uma única vez por campo. As técnicas restantes de cada combinação
+    são compiladas com Tools.compile_normalizer e aplicadas em uma só passada,
+    com o mesmo normalizador usado nas consultas.
+
+    Args:
+        search_fields: Lista de SearchField, normalmente gerada por
+            generate_search_field_combinations.
+
+    Returns:
+        Um dicionário {campo de origem: nó raiz (sem técnica) do DAG}.
+    """
+    roots = {}
+    for field in search_fields:
+        node = roots.setdefault(field.from_field, TechniqueNode())
+
+        techniques = list(field.techniques)
+        while techniques and techniques[0] in TextNormalizer.TEXT_TECHNIQUES:
+            node = node.child(techniques.pop(0))
+
+        if techniques:
+            node.normalizers.append((field.name, Tools.compile_normalizer(techniques)))
+        else:
+            node.outputs.append(field.name)
+
+    return roots
+
+
+def generate_index_mapping(config: SearchFieldsConfig, embedding_dimensions: int = None) -> dict:
+    """
+    Gera o mapping explícito do índice a partir da configuração de campos de busca.
+
+    Os textos longos (campos do documento e todos os search_fields) são mapeados
+    apenas como 'text', sem o subcampo '.keyword' que o mapeamento dinâmico cria,
+    e os metadados como 'keyword'/'date'. Campos não listados aqui continuam no
+    _source, mas não são indexados.
+
+    Args:
+        config: Uma instância da classe de configuração SearchFieldsConfig.
+        embedding_dimensions: Se fornecido, mapeia o campo 'embedding' como
+            dense_vector com essas dimensões, indexado (HNSW) para a busca kNN.
+
+    Returns:
+        O dicionário de mappings aceito por indices.create.
+    """
+    keyword = {"type": "keyword", "ignore_above": 1024}
+
+    search_fields = {field.name: {"type": "text"} for field in generate_search_field_combinations(config)}
+    search_fields["ai_text"] = {"type": "text"}
+
+    mapping = {
+        "dynamic": False,
+        "properties": {
+            "id": {"type": "keyword"},
+            "source_hash": {"type": "keyword", "index": False},
+            "document": {
+                "properties": {
+                    "title": {"type": "text"},
+                    "body": {"type": "text"},
+                    "highlight": {"type": "text"},
+                    "date": {"type": "date", "ignore_malformed": True}
+                }
+            },
+            "metadata": {
+                "properties": {
+                    "author": {
+                        "properties": {
+                            "name": keyword,
+                            "username": keyword
+                        }
+                    },
+                    "court": keyword,
+                    "jurisprudence_type": keyword,
+                    "degree": keyword,
+                    "rapporteur_name": keyword,
+                    "judging_organ": keyword,
+                    "related_judges": keyword,
+                    "document_citations": {
+                        "properties": {
+                            "id": keyword,
+                            "kind": keyword,
+                            "count": {"type": "integer"}
+                        }
+                    },
+                    "addons": {"type": "text"}
+                }
+            },
+            # Objeto aninhado (entity_type, title/body com matches, aliases e offsets),
+            # mantido apenas no _source.
+            "phrasal_terms": {"type": "object", "enabled": False},
+            "search_fields": {"properties": search_fields}
+        }
+    }
+
+    if embedding_dimensions:
+        mapping["properties"]["embedding"] = {
+            "type": "dense_vector",
+            "dims": embedding_dimensions,
+            "index": True,
+            "similarity": "cosine"
+        }
+
+    return mapping
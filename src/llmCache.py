@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class LLMCache:
+    """
+    Cache persistente (SQLite) das respostas do LLM, endereçado pelo conteúdo.
+
+    A chave é o hash do modelo, dos prompts e das opções da chamada, então entradas
+    idênticas nunca são geradas duas vezes, mesmo entre execuções diferentes. Quando
+    o número de entradas passa de max_entries, as menos usadas recentemente são
+    removidas.
+
+    A conexão é aberta sob demanda e reaberta se o processo mudar, para que o
+    cache possa ser usado pelos processos do pool de ingestão.
+
+    Leituras não escrevem no banco: o horário de cada acerto fica em memória e
+    os last_access são gravados em lote antes de cada verificação de remoção ou
+    quando ACCESS_FLUSH_SIZE chaves estiverem pendentes. Acessos ainda não
+    gravados quando o processo termina só deixam a ordem de remoção menos precisa.
+    """
+    # A remoção de entradas antigas é verificada a cada EVICTION_INTERVAL inserções.
+    EVICTION_INTERVAL = 100
+    ACCESS_FLUSH_SIZE = 1000
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._inserts = 0
+        self._accessed = {}
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, user_prompt: str, options: dict = None) -> str:
+        content = json.dumps(
+            {"model": model, "system": system_prompt, "user": user_prompt, "options": options or {}},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Com WAL, NORMAL só sincroniza o disco nos checkpoints; uma queda de energia
+            # pode perder as últimas respostas, que são geradas de novo.
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, created_at REAL, last_access REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)")
+            connection.commit()
+
+            self._connection = connection
+            self._pid = os.getpid()
+
+        return self._connection
+
+    def get(self, key: str):
+        """Retorna a resposta guardada para a chave, ou None se não houver."""
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT response FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= self.ACCESS_FLUSH_SIZE:
+                self._flush_accesses(connection)
+                connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, model: str, response: str) -> None:
+        with self._lock:
+            connection = self._connect()
+            now = time.time()
+            connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+
+            self._inserts += 1
+            if self._inserts % self.EVICTION_INTERVAL == 0:
+                self._flush_accesses(connection)
+                self._evict(connection)
+
+            connection.commit()
+
+    def _flush_accesses(self, connection: sqlite3.Connection) -> None:
+        if self._accessed:
+            connection.executemany(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._accessed.items()]
+            )
+            self._accessed.clear()
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        (count,) = connection.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            connection.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                (excess,)
+            )
+
+    def get_or_generate(self, model: str, system_prompt: str, user_prompt: str, options: dict, generate) -> str:
+        """
+        Retorna a resposta em cache ou chama generate() e guarda o resultado.
+        generate é qualquer função sem argumentos que retorna o texto gerado.
+        """
+        key = self.make_key(model, system_prompt, user_prompt, options)
+
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        response = generate()
+        self.set(key, model, response)
+        return response
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
@@ -0,0 +1,250 @@
+import json
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+import numpy as np
+
+# Palavras com ao menos duas letras (números e pontuação não entram no vocabulário).
+_TOKEN_PATTERN = re.compile(r"[^\W\d_]{2,}")
+
+def _tokens(text) -> list[str]:
+    if not text:
+        return []
+    return _TOKEN_PATTERN.findall(str(text).lower())
+
+def _compressed(keys, other, data, size: int):
+    """Ordena as coordenadas por keys e devolve (indptr, other, data) no formato CSR."""
+    order = np.argsort(keys, kind="stable")
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=indptr[1:])
+    return indptr, other[order], data[order]
+
+def _sparse_product(indptr, indices, data, dense, chunk_elements: int = 1 << 24):
+    """
+    Produto de uma matriz esparsa em CSR (indptr, indices, data) por uma matriz
+    densa. As linhas são processadas em blocos para limitar a memória
+    intermediária a cerca de chunk_elements valores.
+    """
+    num_rows = len(indptr) - 1
+    out = np.zeros((num_rows, dense.shape[1]), dtype=dense.dtype)
+    chunk = max(1, chunk_elements // dense.shape[1])
+
+    row = 0
+    while row < num_rows:
+        # Maior bloco de linhas com no máximo chunk valores (ao menos uma linha).
+        end_row = int(np.searchsorted(indptr, indptr[row] + chunk, side="right")) - 1
+        end_row = min(max(end_row, row + 1), num_rows)
+
+        start, end = indptr[row], indptr[end_row]
+        if end > start:
+            nonempty = np.diff(indptr[row:end_row + 1]) > 0
+            products = data[start:end, None] * dense[indices[start:end]]
+            out[row:end_row][nonempty] = np.add.reduceat(products, (indptr[row:end_row] - start)[nonempty], axis=0)
+        row = end_row
+
+    return out
+
+
+class LSAEmbedder:
+    """
+    Embeddings densos por LSA: TF-IDF dos documentos projetado nas
+    dimensions direções principais de uma SVD truncada, calculada só com NumPy
+    (SVD aleatorizada, sem scipy ou scikit-learn).
+
+    O modelo é ajustado uma vez por geração do índice, sobre uma amostra da base,
+    e usado tanto na ingestão (campo 'embedding', um dense_vector) quanto na busca
+    híbrida (vetor da consulta para o kNN). Os vetores são normalizados, então a
+    similaridade de cosseno é o produto escalar. Textos sem nenhuma palavra do
+    vocabulário resultam no vetor nulo.
+
+    Exemplo:
+        embedder = LSAEmbedder.fit(texts, dimensions=256)
+        embedder.save(path)
+        ...
+        vectors = get_embedder(path).transform(["recurso especial"])
+    """
+    # Campos do documento concatenados no texto de cada embedding.
+    TEXT_FIELDS = ("title", "highlight", "body")
+
+    def __init__(self, vocabulary: dict, idf, components, path: str = None):
+        """
+        Args:
+            vocabulary: {termo: id}.
+            idf: IDF de cada termo (por id).
+            components: Matriz (termos × dimensões) com a projeção de cada termo.
+            path: Diretório de onde o modelo foi carregado (ou onde foi salvo).
+        """
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.components = components
+        self.path = path
+
+    @property
+    def dimensions(self) -> int:
+        return int(self.components.shape[1])
+
+    @classmethod
+    def document_text(cls, document: dict) -> str:
+        """Texto usado no embedding de um documento (o campo 'document' do índice)."""
+        return "\n".join(str(document.get(field) or "") for field in cls.TEXT_FIELDS)
+
+    @classmethod
+    def fit(
+        cls,
+        texts: list[str],
+        dimensions: int = 256,
+        max_features: int = 50000,
+        min_df: int = 2,
+        max_df: float = 0.5,
+        oversampling: int = 10,
+        power_iterations: int = 2,
+        seed: int = 42
+    ) -> "LSAEmbedder":
+        """
+        Ajusta o modelo sobre os textos.
+
+        O vocabulário são os max_features termos mais frequentes presentes em pelo
+        menos min_df textos e em no máximo max_df (fração) deles. Os pesos são
+        (1 + log tf) * idf, normalizados por texto, e a projeção vem da SVD
+        aleatorizada (Halko et al.) com power_iterations iterações de potência.
+        """
+        counts = [Counter(_tokens(text)) for text in texts]
+        num_texts = len(counts)
+
+        document_frequency = Counter()
+        for text_counts in counts:
+            document_frequency.update(text_counts.keys())
+
+        max_count = max_df * num_texts
+        candidates = [(term, df) for term, df in document_frequency.items() if min_df <= df <= max_count]
+        candidates.sort(key=lambda item: (-item[1], item[0]))
+        candidates = candidates[:max_features]
+
+        if not candidates:
+            raise ValueError("Nenhum termo atende a min_df/max_df: amostra pequena demais para ajustar o LSA.")
+
+        vocabulary = {term: term_id for term_id, (term, _) in enumerate(candidates)}
+        df = np.array([frequency for _, frequency in candidates], dtype=np.float64)
+        idf = (np.log((1 + num_texts) / (1 + df)) + 1).astype(np.float32)
+
+        # Matriz TF-IDF (textos × termos) em coordenadas.
+        rows, cols, values = [], [], []
+        for row, text_counts in enumerate(counts):
+            ids = [vocabulary[term] for term in text_counts if term in vocabulary]
+            if not ids:
+                continue
+            tfs = np.array([text_counts[term] for term in text_counts if term in vocabulary], dtype=np.float32)
+            weights = (1 + np.log(tfs)) * idf[ids]
+            weights /= np.linalg.norm(weights)
+
+            rows.extend([row] * len(ids))
+            cols.extend(ids)
+            values.append(weights)
+
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        values = np.concatenate(values).astype(np.float32)
+        num_terms = len(vocabulary)
+
+        by_text = _compressed(rows, cols, values, num_texts)
+        by_term = _compressed(cols, rows, values, num_terms)
+
+        def times(dense):             # X @ dense
+            return _sparse_product(*by_text, dense)
+
+        def transposed_times(dense):  # X.T @ dense
+            return _sparse_product(*by_term, dense)
+
+        dimensions = min(dimensions, num_terms, num_texts)
+        rng = np.random.default_rng(seed)
+        sketch = rng.standard_normal((num_terms, min(dimensions + oversampling, num_terms))).astype(np.float32)
+
+        basis, _ = np.linalg.qr(times(sketch))
+        for _ in range(power_iterations):
+            basis, _ = np.linalg.qr(transposed_times(basis))
+            basis, _ = np.linalg.qr(times(basis))
+
+        # B = Q.T @ X é pequena (l × termos); a SVD dela dá as direções principais de X.
+        _, _, vt = np.linalg.svd(transposed_times(basis).T, full_matrices=False)
+        components = np.ascontiguousarray(vt[:dimensions].T, dtype=np.float32)
+
+        return cls(vocabulary, idf, components)
+
+    def transform(self, texts: list[str]):
+        """
+        Calcula os embeddings dos textos.
+
+        Returns:
+            np.ndarray: Matriz float32 (textos × dimensões) com vetores unitários
+                (ou nulos, para textos sem termos do vocabulário).
+        """
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+
+        for i, text in enumerate(texts):
+            counts = Counter(term for term in _tokens(text) if term in self.vocabulary)
+            if not counts:
+                continue
+
+            ids = np.fromiter((self.vocabulary[term] for term in counts), dtype=np.int64, count=len(counts))
+            tfs = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            weights = (1 + np.log(tfs)) * self.idf[ids]
+            vectors[i] = weights @ self.components[ids]
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+
+        np.save(os.path.join(path, "idf.npy"), self.idf)
+        np.save(os.path.join(path, "components.npy"), self.components)
+        with open(os.path.join(path, "vocabulary.json"), "w", encoding="utf-8") as f:
+            # Lista de termos na ordem dos ids.
+            json.dump(list(self.vocabulary), f, ensure_ascii=False)
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"dimensions": self.dimensions, "terms": len(self.vocabulary)}, f)
+
+        self.path = path
+        print(f"Modelo LSA salvo em '{path}' ({len(self.vocabulary)} termos, {self.dimensions} dimensões).")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "LSAEmbedder":
+        """Carrega um modelo salvo com save. Com mmap, a projeção é lida do disco sob demanda."""
+        with open(os.path.join(path, "vocabulary.json"), encoding="utf-8") as f:
+            vocabulary = {term: term_id for term_id, term in enumerate(json.load(f))}
+
+        return cls(
+            vocabulary,
+            np.load(os.path.join(path, "idf.npy")),
+            np.load(os.path.join(path, "components.npy"), mmap_mode="r" if mmap else None),
+            path
+        )
+
+
+@lru_cache(maxsize=4)
+def get_embedder(path: str) -> LSAEmbedder:
+    """Modelo carregado de path, compartilhado entre as chamadas (um por geração do índice)."""
+    return LSAEmbedder.load(path)
+
+def embedder_for_mapping(mapping_response) -> LSAEmbedder:
+    """
+    Modelo registrado em _meta.embedding_model no mapping do índice (a resposta de
+    indices.get_mapping; com um alias, vale a geração mais recente). Retorna None
+    se o índice não tiver modelo ou se ele não puder ser carregado deste servidor.
+    """
+    path = None
+    for _, data in sorted(mapping_response.items(), key=lambda item: item[0], reverse=True):
+        path = ((data.get("mappings") or {}).get("_meta") or {}).get("embedding_model")
+        if path:
+            break
+
+    if not path:
+        return None
+
+    try:
+        return get_embedder(path)
+    except (OSError, ValueError) as e:
+        print(f"Modelo de embeddings '{path}' indisponível, a busca será só léxica: {e}")
+        return None
@@ -0,0 +1,221 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Content-Type do formato de texto do Prometheus (exposition format 0.0.4).
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Limites (em segundos) dos histogramas de latência: de 1 ms a 30 s.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    TYPE = None
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, labelnames: tuple = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+
+
+class Counter(_Metric):
+    """Contador monotônico, com uma série por combinação de rótulos."""
+    TYPE = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._series.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            series = sorted(self._series.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in series
+        ]
+
+
+class Histogram(_Metric):
+    """
+    Histograma com limites fixos. Cada observação só incrementa o contador do seu
+    intervalo (encontrado por busca binária); a soma cumulativa exigida pelo
+    formato do Prometheus é feita apenas em render.
+    """
+    TYPE = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [contagem por intervalo (o último é +Inf), soma, total]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Mede o tempo do bloco with e o registra no histograma."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            series = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._series.items())
+
+        lines = self.header()
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Registro das métricas do processo, exportadas no formato de texto do
+    Prometheus por render (rota /metrics dos servidores).
+
+    As métricas vivem na memória de cada processo: com ASYNC_SERVER_PROCESSES > 1,
+    cada processo as expõe em uma porta própria (ver run_async_server). Com
+    enabled=False, inc e observe retornam imediatamente.
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrica já registrada: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Busca
+SEARCH_REQUESTS = REGISTRY.counter(
+    "search_requests_total", "Buscas recebidas pelos mecanismos de busca.", ("operation",)
+)
+SEARCH_ERRORS = REGISTRY.counter(
+    "search_errors_total", "Buscas (ou consultas de um lote) que falharam, por tipo de erro.", ("operation", "error")
+)
+PREPROCESS_SECONDS = REGISTRY.histogram(
+    "query_preprocess_seconds", "Tempo de cada etapa do pré-processamento da consulta, por técnica.", ("technique",)
+)
+ES_ROUNDTRIP_SECONDS = REGISTRY.histogram(
+    "elasticsearch_roundtrip_seconds", "Tempo de ida e volta das requisições ao Elasticsearch, medido no cliente.", ("operation",)
+)
+ES_TOOK_SECONDS = REGISTRY.histogram(
+    "elasticsearch_took_seconds", "Tempo de execução informado pelo Elasticsearch (campo took).", ("operation",)
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total", "Consultas aos caches em memória.", ("cache", "result")
+)
+
+# LLM
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "llm_request_seconds", "Latência das chamadas ao LLM (sem as respostas do cache).", ("operation",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+)
+LLM_ERRORS = REGISTRY.counter(
+    "llm_errors_total", "Chamadas ao LLM que falharam.", ("operation",)
+)
+
+# Ingestão
+BULK_CHUNK_SECONDS = REGISTRY.histogram(
+    "bulk_chunk_seconds", "Tempo de envio de cada lote _bulk, incluindo os reenvios."
+)
+BULK_ITEMS = REGISTRY.counter(
+    "bulk_items_total", "Itens enviados em _bulk, pelo resultado final.", ("result",)
+)
+BULK_REJECTED_ITEMS = REGISTRY.counter(
+    "bulk_rejected_items_total", "Itens rejeitados pelo Elasticsearch por sobrecarga (429), antes dos reenvios."
+)
+
+# HTTP
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_seconds", "Latência das requisições HTTP da API, por rota, método e status.", ("route", "method", "status")
+)
+
+
+def observe_elasticsearch(operation: str, roundtrip: float, response=None) -> None:
+    """Registra o tempo de ida e volta de uma requisição e o took da resposta, se houver."""
+    ES_ROUNDTRIP_SECONDS.observe(roundtrip, operation=operation)
+    took = response.get("took") if response is not None else None
+    if took is not None:
+        ES_TOOK_SECONDS.observe(took / 1000, operation=operation)
+
+def error_type(error) -> str:
+    """Valor do rótulo error: o nome da exceção ou o 'type' de um erro do Elasticsearch."""
+    if isinstance(error, BaseException):
+        return type(error).__name__
+    if isinstance(error, dict):
+        return str(error.get("type", "unknown"))
+    return "unknown"
+
+def render_metrics() -> str:
+    return REGISTRY.render()
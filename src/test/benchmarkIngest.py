@@ -0,0 +1,188 @@
+import os
+
+# O benchmark mede a geração do ai_text, não o cache de respostas do LLM.
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+
+import argparse
+import copy
+import json
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from elasticsearch import Elasticsearch
+from src.config import DATABASE_PATH, INGEST_BATCH_SIZE, LEMMATIZATION_BATCH_SIZE
+from src.insertDocs.aiEnrichment import AITextEnricher
+from src.insertDocs.bulkIndexer import BulkIndexer
+from src.insertDocs.pipelineReader import PipelineReader
+from src.insertDocs.SearchFieldsModels import SearchFieldsConfig, TEXT_FUNCTIONS, BATCH_TEXT_FUNCTIONS
+from src.test.fakeServices import FakeElasticsearchServer, FakeOllamaServer
+
+
+def sample_parquet(source: str, sample_size: int, output_path: str, seed: int = 42) -> int:
+    """
+    Grava em output_path uma amostra aleatória (sem reposição) de sample_size linhas
+    do parquet source, apenas com as colunas lidas pelo PipelineReader.
+    Retorna o número de linhas da amostra.
+    """
+    dataset = ds.dataset(source, format="parquet")
+    total = dataset.count_rows()
+    columns = [column for column in PipelineReader.SOURCE_COLUMNS if column in dataset.schema.names]
+
+    rng = np.random.default_rng(seed)
+    indices = np.sort(rng.choice(total, size=min(sample_size, total), replace=False))
+
+    pq.write_table(dataset.take(indices, columns=columns), output_path)
+    return len(indices)
+
+
+class IngestBenchmark:
+    """
+    Mede, separadamente, a vazão (documentos/s) e o pico de memória de cada etapa da
+    ingestão sobre uma amostra da base:
+
+    - leitura do parquet;
+    - _create_document_from_row e o hash de conteúdo;
+    - cada técnica de TEXT_FUNCTIONS (e as versões em lote) em cada campo;
+    - o DAG completo dos campos de busca;
+    - ai_text, gerado por um Ollama falso (FakeOllamaServer) com latência configurável;
+    - o envio em bulk para um Elasticsearch falso (FakeElasticsearchServer).
+
+    Nenhum serviço externo é necessário. A vazão é medida sem o tracemalloc; o pico
+    de memória vem de uma segunda execução da etapa com o tracemalloc ativo (ele só
+    enxerga memória alocada pelo Python, não a de bibliotecas nativas como o spaCy).
+    """
+    def __init__(self, parquet_path: str, batch_size: int = INGEST_BATCH_SIZE, llm_delay: float = 0.05, es_delay: float = 0.0, measure_memory: bool = True):
+        self.parquet_path = parquet_path
+        self.batch_size = batch_size
+        self.llm_delay = llm_delay
+        self.es_delay = es_delay
+        self.measure_memory = measure_memory
+        self.reader = PipelineReader(parquet_path, load=False)
+        self.results = []
+
+    def _measure(self, stage: str, documents: int, function):
+        """Executa function, registra o tempo (e o pico de memória) e retorna o resultado."""
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+
+        peak_mb = None
+        if self.measure_memory:
+            tracemalloc.start()
+            try:
+                function()
+                peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            finally:
+                tracemalloc.stop()
+
+        self.results.append({
+            "stage": stage,
+            "documents": documents,
+            "seconds": round(elapsed, 4),
+            "docs_per_s": round(documents / elapsed, 2) if elapsed > 0 else None,
+            "peak_memory_mb": round(peak_mb, 3) if peak_mb is not None else None
+        })
+        print(f"{stage:<45} {self.results[-1]['docs_per_s']!s:>12} docs/s | pico {self.results[-1]['peak_memory_mb']} MB")
+        return result
+
+    def run(self) -> list[dict]:
+        reader = self.reader
+
+        rows = self._measure(
+            "parquet_read", reader.count_rows(),
+            lambda: [row for batch in reader.iter_record_batches(self.batch_size) for row in batch]
+        )
+        total = len(rows)
+
+        docs = self._measure("create_document", total, lambda: [reader._create_document_from_row(row) for row in rows])
+        self._measure("source_hash", total, lambda: [reader._source_hash(doc) for doc in docs])
+
+        for field in SearchFieldsConfig.FIELDS:
+            texts = [doc["document"][field] for doc in docs if doc["document"][field]]
+
+            for technique, function in TEXT_FUNCTIONS.items():
+                self._measure(f"technique:{technique}:{field}", total, lambda: [function(text) for text in texts])
+
+            for technique, batch_function in BATCH_TEXT_FUNCTIONS.items():
+                self._measure(
+                    f"technique:{technique}_batch:{field}", total,
+                    lambda: batch_function(texts, batch_size=LEMMATIZATION_BATCH_SIZE)
+                )
+
+        docs = self._measure(
+            "search_fields_dag", total,
+            lambda: [
+                doc
+                for start in range(0, total, self.batch_size)
+                for doc in reader._insert_search_fields_batch(copy.deepcopy(docs[start:start + self.batch_size]))
+            ]
+        )
+
+        highlights = [doc["document"]["highlight"] for doc in docs]
+        with FakeOllamaServer(delay=self.llm_delay) as ollama_server:
+            with AITextEnricher(host=ollama_server.url) as enricher:
+                ai_texts = self._measure("ai_text", total, lambda: enricher.enrich(highlights))
+
+        for doc, ai_text in zip(docs, ai_texts):
+            doc["search_fields"]["ai_text"] = ai_text or ""
+
+        with FakeElasticsearchServer(delay=self.es_delay) as es_server:
+            client = Elasticsearch(hosts=es_server.url)
+            self._measure("bulk_send", total, lambda: BulkIndexer(client, "benchmark").index(docs))
+            client.close()
+
+        return self.results
+
+    def report(self) -> dict:
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "batch_size": self.batch_size,
+            "llm_delay_s": self.llm_delay,
+            "es_delay_s": self.es_delay,
+            "stages": self.results
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da ingestão, etapa por etapa, sem serviços externos.")
+    parser.add_argument("--source", default=DATABASE_PATH, help="Parquet (ou diretório) de onde a amostra é tirada.")
+    parser.add_argument("--sample", type=int, default=500, help="Número de documentos da amostra.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--llm-delay", type=float, default=0.05, help="Latência simulada do LLM por requisição, em segundos.")
+    parser.add_argument("--es-delay", type=float, default=0.0, help="Latência simulada de cada requisição _bulk, em segundos.")
+    parser.add_argument("--no-memory", action="store_true", help="Não mede o pico de memória (metade do tempo).")
+    parser.add_argument("--output", default="benchmarks/ingest.json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sample_path = os.path.join(tmp, "sample.parquet")
+        size = sample_parquet(args.source, args.sample, sample_path, args.seed)
+        print(f"Amostra de {size} documentos de '{args.source}'.")
+
+        benchmark = IngestBenchmark(
+            sample_path,
+            batch_size=args.batch_size,
+            llm_delay=args.llm_delay,
+            es_delay=args.es_delay,
+            measure_memory=not args.no_memory
+        )
+        benchmark.run()
+
+    report = benchmark.report()
+    report.update(source=args.source, sample=size, seed=args.seed)
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"Resultados salvos em '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
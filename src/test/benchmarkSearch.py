@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.app.QueryConfig import QueryConfig
+from src.config import ELASTIC_SEARCH_ADDRESS, MAIN_INDEX_NAME, IDEAL_QUERY_PATH, BEST_QUERY_CONFIG
+from src.test.query import load_queries_from_file
+
+# Etapas registradas por MySearchEngine.search_documents (mais a serialização
+# medida aqui) que entram no detalhamento do tempo.
+STAGES = ["preprocess", "expansion", "embedding", "elasticsearch", "es_took", "serialization"]
+
+
+def load_benchmark_queries(path: str) -> list[str]:
+    """
+    Lê as consultas do arquivo de avaliação (formato de IDEAL_QUERY_PATH) ou de um
+    log de consultas com uma consulta por linha.
+    """
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f if line.strip()]
+
+    if any(line.startswith("Query:") for line in lines):
+        return list(load_queries_from_file(path).keys())
+    return lines
+
+
+def _percentiles(values_ms) -> dict:
+    if not len(values_ms):
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+
+    values_ms = np.asarray(values_ms)
+    p50, p95, p99 = np.percentile(values_ms, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(values_ms.mean()), 3),
+        "max": round(float(values_ms.max()), 3)
+    }
+
+
+class SearchBenchmark:
+    """
+    Mede latência e vazão da busca repetindo uma lista de consultas com diferentes
+    níveis de concorrência.
+
+    No modo 'engine', as consultas vão direto para MySearchEngine.search_documents
+    (sem o cache de resultados) e o tempo de cada uma é dividido entre
+    pré-processamento, expansão por LLM, Elasticsearch e serialização do JSON. No
+    modo 'http', as consultas vão para o endpoint /api/search de um servidor já em
+    execução e apenas o tempo total é medido. Esse servidor deve rodar com
+    QUERY_CACHE_ENABLED=false; caso contrário, as consultas repetidas medem o cache.
+    """
+    def __init__(self, queries: list[str], mode: str = "engine", config: QueryConfig = None, url: str = "http://localhost:5000", size: int = 20):
+        self.queries = queries
+        self.mode = mode
+        self.config = config if config else BEST_QUERY_CONFIG
+        self.url = url.rstrip("/")
+        self.size = size
+        self.engine = None
+
+        if mode == "engine":
+            from src.app.MySearchEngine import MySearchEngine
+
+            self.engine = MySearchEngine(hosts=ELASTIC_SEARCH_ADDRESS, config=self.config, connections_per_node=64)
+            # O cache esconderia o custo real de cada consulta repetida.
+            self.engine.result_cache = None
+        elif mode != "http":
+            raise ValueError(f"Modo de benchmark desconhecido: {mode}. Use 'engine' ou 'http'.")
+
+    def _search_engine(self, query: str) -> dict:
+        timings = {}
+        start = time.perf_counter()
+
+        try:
+            results = self.engine.search_documents(MAIN_INDEX_NAME, query, size=self.size, timings=timings)
+
+            serialization_start = time.perf_counter()
+            json.dumps(results, default=str)
+            timings["serialization"] = time.perf_counter() - serialization_start
+        except Exception as e:
+            timings["error"] = str(e)
+
+        timings["total"] = time.perf_counter() - start
+        return timings
+
+    def _search_http(self, query: str) -> dict:
+        timings = {}
+        start = time.perf_counter()
+
+        try:
+            url = f"{self.url}/api/search?{urllib.parse.urlencode({'q': query})}"
+            with urllib.request.urlopen(url, timeout=60) as response:
+                response.read()
+        except Exception as e:
+            timings["error"] = str(e)
+
+        timings["total"] = time.perf_counter() - start
+        return timings
+
+    def run_level(self, concurrency: int, repeat: int = 1) -> dict:
+        """Executa todas as consultas repeat vezes com concurrency requisições simultâneas."""
+        workload = self.queries * repeat
+        search = self._search_engine if self.mode == "engine" else self._search_http
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = list(executor.map(search, workload))
+        elapsed = time.perf_counter() - start
+
+        errors = [sample for sample in samples if "error" in sample]
+        successes = [sample for sample in samples if "error" not in sample]
+
+        result = {
+            "concurrency": concurrency,
+            "requests": len(samples),
+            "errors": len(errors),
+            "error_rate": len(errors) / len(samples) if samples else 0.0,
+            "duration_s": round(elapsed, 3),
+            "qps": round(len(samples) / elapsed, 2) if elapsed > 0 else None,
+            "latency_ms": _percentiles([sample["total"] * 1000 for sample in successes])
+        }
+
+        if self.mode == "engine":
+            result["breakdown_ms"] = {
+                stage: _percentiles([sample[stage] * 1000 for sample in successes if stage in sample])
+                for stage in STAGES
+            }
+
+        if errors:
+            result["sample_error"] = errors[0]["error"]
+
+        return result
+
+    def run(self, concurrency_levels: list[int], repeat: int = 1, warmup: bool = True) -> dict:
+        # No modo http não há aquecimento: a passada preencheria o cache de
+        # resultados do servidor, se ele estiver ativo, com as mesmas consultas.
+        if warmup and self.mode == "engine":
+            # Uma passada sequencial para carregar modelos e abrir conexões.
+            self.run_level(1)
+
+        levels = []
+        for concurrency in concurrency_levels:
+            level = self.run_level(concurrency, repeat)
+            levels.append(level)
+            print(
+                f"concorrência {concurrency:>4} | {level['qps']} consultas/s | "
+                f"p50 {level['latency_ms']['p50']} ms | p95 {level['latency_ms']['p95']} ms | "
+                f"p99 {level['latency_ms']['p99']} ms | erros {level['error_rate']:.2%}"
+            )
+
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "mode": self.mode,
+            "target": self.url if self.mode == "http" else ELASTIC_SEARCH_ADDRESS,
+            "index": MAIN_INDEX_NAME,
+            # No modo http, a configuração e o número de resultados são os do servidor
+            # (a rota /api/search não recebe size), que não são conhecidos daqui.
+            "config": None,
+            "queries": len(self.queries),
+            "size": None,
+            "levels": levels
+        }
+
+        if self.mode == "engine":
+            report["size"] = self.size
+            report["config"] = {
+                "text_techniques": self.config.text_techniques,
+                "ai_text": self.config.ai_text,
+                "ai_global_expansion": self.config.ai_global_expansion,
+                "hybrid": self.config.hybrid
+            }
+        else:
+            report["note"] = "O servidor deve rodar com QUERY_CACHE_ENABLED=false; sem isso, as latências medem o cache de resultados."
+
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de latência e vazão da busca.")
+    parser.add_argument("--mode", choices=["engine", "http"], default="engine")
+    parser.add_argument("--queries", default=IDEAL_QUERY_PATH, help="Arquivo de avaliação ou log com uma consulta por linha.")
+    parser.add_argument("--concurrency", default="1,4,16", help="Níveis de concorrência separados por vírgula.")
+    parser.add_argument("--repeat", type=int, default=1, help="Quantas vezes cada consulta é repetida por nível.")
+    parser.add_argument("--techniques", default=None, help="Técnicas do QueryConfig separadas por vírgula (padrão: BEST_QUERY_CONFIG). Só no modo engine.")
+    parser.add_argument("--ai-text", action="store_true")
+    parser.add_argument("--expansion", action="store_true", help="Ativa a expansão global da consulta por LLM.")
+    parser.add_argument("--hybrid", action="store_true", help="Ativa a busca híbrida (BM25 + kNN com RRF).")
+    parser.add_argument("--url", default="http://localhost:5000", help="Servidor usado no modo http.")
+    parser.add_argument("--size", type=int, default=20, help="Resultados por consulta. Só no modo engine.")
+    parser.add_argument("--output", default="benchmarks/search.json")
+    args = parser.parse_args()
+
+    config = None
+    if args.techniques is not None or args.ai_text or args.expansion or args.hybrid:
+        techniques = [t for t in (args.techniques or "").split(",") if t]
+        config = QueryConfig(techniques or None, ai_text=args.ai_text, ai_global_expansion=args.expansion, hybrid=args.hybrid)
+
+    queries = load_benchmark_queries(args.queries)
+    print(f"{len(queries)} consultas carregadas de '{args.queries}'.")
+
+    benchmark = SearchBenchmark(queries, mode=args.mode, config=config, url=args.url, size=args.size)
+    report = benchmark.run([int(level) for level in args.concurrency.split(",")], repeat=args.repeat)
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"Resultados salvos em '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
-import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from src.test.query import load_queries_from_file, DocumentResult
-from src.config import IDEAL_QUERY_PATH
+from src.test.rankingMetrics import RankingEvaluator
+from src.config import IDEAL_QUERY_PATH, ELASTIC_SEARCH_ADDRESS, MAIN_INDEX_NAME, EVAL_CONCURRENCY, EVAL_BATCH_SIZE
 from src.app.QueryConfig import QueryConfig
 from src.insertDocs.utils import generate_search_field_combinations
 from src.insertDocs.SearchFieldsModels import SearchFieldsConfig
@@ -10,166 +11,146 @@ import pandas as pd
 
 idealQueryResults = load_queries_from_file(IDEAL_QUERY_PATH)
 
-def dcg(results: list) -> float:
-    dcg_value = 0.0
-    for i, doc in enumerate(results):
-        gain = (2 ** doc.relevance - 1)
-        discount = math.log2(i + 2)
-        dcg_value += gain / discount
-    return dcg_value
+def _ids(currentQueryResults: dict[str, list[DocumentResult]]) -> dict[str, list[str]]:
+    return {query: [doc.id for doc in docs] for query, docs in currentQueryResults.items()}
 
 def calculate_NDCG(idealQueryResults: dict[str, list[DocumentResult]], currentQueryResults: dict[str, list[DocumentResult]]) -> float:
-    total_ndcg = 0
-    count = 0
-
-    for query in idealQueryResults:
-        if query not in currentQueryResults:
-            continue
-
-        ideal_docs = idealQueryResults[query]
-        retrieved_docs = currentQueryResults[query]
-
-        rel_dict = {doc.id: doc.relevance for doc in ideal_docs}
-
-        scored_docs = []
-        for doc in retrieved_docs:
-            rel = rel_dict.get(doc.id, 0.0)
-            scored_docs.append(DocumentResult(doc.id, rel))
-
-        dcg_val = dcg(scored_docs)
-        idcg_val = dcg(sorted(ideal_docs, key=lambda d: d.relevance, reverse=True))
-
-        ndcg = dcg_val / idcg_val if idcg_val > 0 else 0.0
-        total_ndcg += ndcg
-        count += 1
-
-    return total_ndcg / count if count > 0 else 0.0
-
-
+    return RankingEvaluator(idealQueryResults).evaluate(_ids(currentQueryResults))["ndcg"]
 
 def calculate_MAP(idealQueryResults: dict[str, list[DocumentResult]],
                   currentQueryResults: dict[str, list[DocumentResult]]) -> float:
-    total_ap = 0
-    query_count = 0
-
-    for query, ideal_docs in idealQueryResults.items():
-        if query not in currentQueryResults:
-            continue
+    return RankingEvaluator(idealQueryResults).evaluate(_ids(currentQueryResults))["map"]
+
+def _run_queries(engine, config: QueryConfig, idealQueryResults: dict[str, list[DocumentResult]], batch_size: int = EVAL_BATCH_SIZE) -> dict[str, list[str]]:
+    """
+    Executa todas as consultas de idealQueryResults com a configuração dada, em
+    lotes de batch_size consultas por requisição (_msearch). Cada consulta pede
+    tantos documentos quantos forem os relevantes conhecidos para ela.
+
+    Returns:
+        dict[str, list[str]]: Os ids recuperados para cada consulta, em ordem.
+    """
+    queries = list(idealQueryResults.keys())
+    currentQueryResults = {}
+    errors = 0
+
+    for start in range(0, len(queries), batch_size):
+        batch = queries[start:start + batch_size]
+        outcomes = engine.search_documents_batch(
+            MAIN_INDEX_NAME,
+            batch,
+            size=[len(idealQueryResults[query]) for query in batch],
+            config=config
+        )
 
-        current_docs = currentQueryResults[query]
-        relevant_ids = {doc.id for doc in ideal_docs}
-        num_relevant = 0
-        sum_precisions = 0
+        for query, outcome in zip(batch, outcomes):
+            if "error" in outcome:
+                errors += 1
+            currentQueryResults[query] = [doc['id'] for doc in outcome.get("results", [])]
 
-        for idx, doc in enumerate(current_docs):
-            if doc.id in relevant_ids:
-                num_relevant += 1
-                precision_at_k = num_relevant / (idx + 1)
-                sum_precisions += precision_at_k
+    if errors:
+        print(f"\nAviso: {errors} consulta(s) falharam com a configuração {config.signature()} e contam como sem resultados.")
 
-        ap = sum_precisions / len(relevant_ids) if relevant_ids else 0.0
-        total_ap += ap
-        query_count += 1
+    return currentQueryResults
 
-    return total_ap / query_count if query_count > 0 else 0.0
+def compare_engines(idealQueryResults: dict[str, list[DocumentResult]], engine=None, concurrency: int = EVAL_CONCURRENCY, batch_size: int = EVAL_BATCH_SIZE, k: int = 10):
+    """
+    Avalia todas as combinações de técnicas, com e sem ai_text, e salva os
+    resultados em results.csv: NDCG e MAP (como sempre foram calculados), MRR,
+    P@k e Recall@k.
 
-def compare_engines(idealQueryResults: dict[str, list[DocumentResult]]):
+    Todas as configurações usam o mesmo cliente (engine; por padrão um
+    MySearchEngine, mas o LocalSearchEngine também serve). Até concurrency
+    configurações são avaliadas ao mesmo tempo, cada uma enviando as consultas em
+    lotes de batch_size.
+    """
     techniques = generate_search_field_combinations(SearchFieldsConfig)
 
-    results_df = pd.DataFrame(columns=["ai_text", "global_expansion", "techniques", "ndcg", "map"])
-
-    
+    configs = [
+        (ai_text, ai_global_expasion, techniques_combination.techniques)
+        for ai_text in [True, False]
+        for ai_global_expasion in [False]
+        for techniques_combination in techniques
+    ]
 
-    num_techniques = len(techniques)
     num_queries = len(idealQueryResults.keys())
     print("Número total de queries:", num_queries)
-    total_consultas = 2 * 1 * num_techniques * num_queries
-    consultas_feitas = 0
-
-    for ai_text in [True, False]:
-        for ai_global_expasion in [False]:
-            for techniques_combination in techniques:
-                config = QueryConfig(
-                    ai_text=ai_text,
-                    ai_global_expansion=ai_global_expasion,
-                    text_techniques_list=techniques_combination.techniques
-                )
+    print(f"Avaliando {len(configs)} configurações com {concurrency} em paralelo ({len(configs) * num_queries} consultas)...")
 
-                print(f"Comparando com configuração: {config}")
-                
-                se = MySearchEngine(hosts='http://localhost:9200',config=config)
+    if engine is None:
+        engine = MySearchEngine(hosts=ELASTIC_SEARCH_ADDRESS, connections_per_node=max(10, concurrency))
 
-                currentQueryResults = {}
+    # Resultados preenchidos por posição, na ordem de configs. As métricas de todas
+    # as configurações são calculadas juntas no final.
+    runs = [None] * len(configs)
 
-                for currentQuery in idealQueryResults.keys():
-                    consultas_feitas += 1
-
-                    status_text = (
-                        f"ai_text: {str(ai_text):<5} | "
-                        f"ai_global_expasion: {str(ai_global_expasion):<5} | "
-                        f"Techniques: {'_'.join(techniques_combination.techniques):<25} | "
-                        f"Consulta: {consultas_feitas}/{total_consultas}"
-                    )
+    def evaluate(position: int):
+        ai_text, ai_global_expasion, techniques_list = configs[position]
+        config = QueryConfig(
+            ai_text=ai_text,
+            ai_global_expansion=ai_global_expasion,
+            text_techniques_list=techniques_list
+        )
 
-                    print(status_text, end='\r', flush=True)
+        runs[position] = _run_queries(engine, config, idealQueryResults, batch_size)
 
-                    
-                    results = se.search_documents(
-                        index_name="test_index",
-                        query=currentQuery,
-                        size=len(idealQueryResults[currentQuery])
-                    )
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(evaluate, position) for position in range(len(configs))]
 
-                    currentQueryResults[currentQuery] = [DocumentResult(doc['id'], 0) for doc in results]
+        for done, future in enumerate(as_completed(futures), start=1):
+            future.result()
+            print(f"Configurações avaliadas: {done}/{len(configs)}", end='\r', flush=True)
 
-                ndcg = calculate_NDCG(idealQueryResults, currentQueryResults)
-                map_score = calculate_MAP(idealQueryResults, currentQueryResults)
+    evaluator = RankingEvaluator(idealQueryResults)
+    metrics = evaluator.evaluate_many(runs)
+    metrics_at_k = evaluator.evaluate_many(runs, k=k)
 
-                results_df = pd.concat([results_df, pd.DataFrame([{"ai_text": ai_text, "global_expansion": ai_global_expasion, "techniques": "_".join(techniques_combination.techniques), "ndcg": ndcg, "map": map_score}])], ignore_index=True)
+    results_df = pd.DataFrame({
+        "ai_text": [ai_text for ai_text, _, _ in configs],
+        "global_expansion": [ai_global_expasion for _, ai_global_expasion, _ in configs],
+        "techniques": ["_".join(techniques_list) for _, _, techniques_list in configs],
+        "ndcg": metrics["ndcg"],
+        "map": metrics["map"],
+        "mrr": metrics["mrr"],
+        f"precision@{k}": metrics_at_k["precision"],
+        f"recall@{k}": metrics_at_k["recall"]
+    })
 
     print("\nComparação concluída.")
     results_df.to_csv('results.csv', index=False)
+    return results_df
 
-def get_baseline(idealQueryResults: dict[str, list[DocumentResult]]):
-
-
-    se = MySearchEngine(hosts='http://localhost:9200')
+def get_baseline(idealQueryResults: dict[str, list[DocumentResult]], engine=None):
 
-    currentQueryResults = {}
-
-    for currentQuery in idealQueryResults.keys():
-        results = se.search_documents(
-            index_name="test_index",
-            query=currentQuery,
-            size=len(idealQueryResults[currentQuery])
-        )
+    if engine is None:
+        engine = MySearchEngine(hosts=ELASTIC_SEARCH_ADDRESS)
 
-        currentQueryResults[currentQuery] = [DocumentResult(doc['id'], 0) for doc in results]
-
-    ndcg = calculate_NDCG(idealQueryResults, currentQueryResults)
-    map_score = calculate_MAP(idealQueryResults, currentQueryResults)
+    metrics = RankingEvaluator(idealQueryResults).evaluate(_run_queries(engine, QueryConfig(), idealQueryResults))
+    ndcg, map_score = metrics["ndcg"], metrics["map"]
 
     print(f"Baseline NDCG: {ndcg}, MAP: {map_score}")
 
-def get_ai_global_expansion(idealQueryResults: dict[str, list[DocumentResult]]):
+def get_ai_global_expansion(idealQueryResults: dict[str, list[DocumentResult]], engine=None):
 
     config = QueryConfig(ai_global_expansion=True, text_techniques_list=['lowercase_text', 'remove_stopwords'])
 
+    if engine is None:
+        engine = MySearchEngine(hosts=ELASTIC_SEARCH_ADDRESS)
 
-    se = MySearchEngine(hosts='http://localhost:9200', config=config)
+    metrics = RankingEvaluator(idealQueryResults).evaluate(_run_queries(engine, config, idealQueryResults))
+    ndcg, map_score = metrics["ndcg"], metrics["map"]
 
-    currentQueryResults = {}
+    print(f"expansão global NDCG: {ndcg}, MAP: {map_score}")
 
-    for currentQuery in idealQueryResults.keys():
-        results = se.search_documents(
-            index_name="test_index",
-            query=currentQuery,
-            size=len(idealQueryResults[currentQuery])
-        )
+def get_hybrid(idealQueryResults: dict[str, list[DocumentResult]], engine=None):
 
-        currentQueryResults[currentQuery] = [DocumentResult(doc['id'], 0) for doc in results]
+    # Mesmas técnicas da expansão global, com a busca kNN no lugar do LLM.
+    config = QueryConfig(hybrid=True, text_techniques_list=['lowercase_text', 'remove_stopwords'])
 
-    ndcg = calculate_NDCG(idealQueryResults, currentQueryResults)
-    map_score = calculate_MAP(idealQueryResults, currentQueryResults)
+    if engine is None:
+        engine = MySearchEngine(hosts=ELASTIC_SEARCH_ADDRESS)
 
-    print(f"expansão global NDCG: {ndcg}, MAP: {map_score}")
+    metrics = RankingEvaluator(idealQueryResults).evaluate(_run_queries(engine, config, idealQueryResults))
+    ndcg, map_score = metrics["ndcg"], metrics["map"]
+
+    print(f"busca híbrida NDCG: {ndcg}, MAP: {map_score}")
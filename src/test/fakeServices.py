@@ -0,0 +1,251 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllamaServer:
+    """
+    Servidor HTTP local que imita o endpoint /api/chat do Ollama, para testar a
+    geração de ai_text e a expansão de consultas sem um LLM de verdade.
+
+    A resposta é o próprio prompt do usuário com o prefixo 'resposta:'. delay simula
+    a latência de geração e fail_every faz cada N-ésima requisição falhar com 500.
+
+    Exemplo:
+        with FakeOllamaServer(delay=0.05) as server:
+            os.environ["OLLAMA_HOST"] = server.url
+            ...
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0, fail_every: int = 0):
+        self.delay = delay
+        self.fail_every = fail_every
+        self.requests = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, body: dict):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+
+                with server._lock:
+                    server.requests += 1
+                    number = server.requests
+                    server._in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server._in_flight)
+
+                try:
+                    if server.delay:
+                        time.sleep(server.delay)
+
+                    if self.path != "/api/chat":
+                        self._send_json(404, {"error": f"endpoint não suportado: {self.path}"})
+                        return
+
+                    if server.fail_every and number % server.fail_every == 0:
+                        self._send_json(500, {"error": "falha simulada"})
+                        return
+
+                    user_messages = [m["content"] for m in request.get("messages", []) if m.get("role") == "user"]
+                    self._send_json(200, {
+                        "model": request.get("model"),
+                        "created_at": "2024-01-01T00:00:00Z",
+                        "message": {"role": "assistant", "content": "resposta: " + " ".join(user_messages)},
+                        "done": True
+                    })
+                finally:
+                    with server._lock:
+                        server._in_flight -= 1
+
+        return Handler
+
+
+class FakeElasticsearchServer:
+    """
+    Servidor HTTP local que imita o suficiente do Elasticsearch para a ingestão:
+    informações do cluster, criação e configurações de índice, refresh, force merge,
+    contagem e a API _bulk. Os documentos recebidos são apenas contados, não
+    guardados.
+
+    delay simula a latência de cada requisição _bulk e reject_every faz cada N-ésimo
+    item do bulk ser rejeitado com 429 (para exercitar os reenvios do BulkIndexer).
+
+    Exemplo:
+        with FakeElasticsearchServer() as server:
+            client = Elasticsearch(hosts=server.url)
+            ...
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0, reject_every: int = 0):
+        self.delay = delay
+        self.reject_every = reject_every
+        self.indices = {}
+        self.bulk_requests = 0
+        self.bulk_bytes = 0
+        self.documents = 0
+        self.rejected = 0
+        self._items = 0
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _bulk(self, body: bytes) -> dict:
+        lines = [line for line in body.split(b"\n") if line.strip()]
+        items = []
+
+        with self._lock:
+            self.bulk_requests += 1
+            self.bulk_bytes += len(body)
+
+            for action_line in lines[::2]:
+                action, meta = next(iter(json.loads(action_line).items()))
+                self._items += 1
+
+                if self.reject_every and self._items % self.reject_every == 0:
+                    self.rejected += 1
+                    items.append({action: {
+                        "_index": meta.get("_index"), "_id": meta.get("_id"), "status": 429,
+                        "error": {"type": "es_rejected_execution_exception", "reason": "rejeição simulada"}
+                    }})
+                    continue
+
+                self.documents += 1
+                index = meta.get("_index")
+                self.indices[index] = self.indices.get(index, 0) + 1
+                items.append({action: {"_index": index, "_id": meta.get("_id"), "status": 201, "result": "created"}})
+
+        return {"took": 1, "errors": any(item[next(iter(item))]["status"] >= 300 for item in items), "items": items}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, body: dict):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("X-Elastic-Product", "Elasticsearch")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(data)
+
+            def _read_body(self) -> bytes:
+                length = int(self.headers.get("Content-Length", 0))
+                return self.rfile.read(length) if length else b""
+
+            def _index(self) -> str:
+                return self.path.split("?")[0].strip("/").split("/")[0]
+
+            def do_HEAD(self):
+                self._send_json(200 if self._index() in server.indices else 404, {})
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                if path == "/":
+                    self._send_json(200, {"version": {"number": "9.0.2"}, "tagline": "You Know, for Search"})
+                elif path.endswith("/_settings"):
+                    index = self._index()
+                    self._send_json(200, {index: {"settings": {
+                        "index.refresh_interval": "1s", "index.number_of_replicas": "1", "index": {"uuid": index}
+                    }}})
+                elif path.endswith("/_count"):
+                    self._send_json(200, {"count": server.indices.get(self._index(), 0)})
+                else:
+                    self._send_json(404, {"error": f"endpoint não suportado: {self.path}"})
+
+            def do_PUT(self):
+                body = self._read_body()
+                path = self.path.split("?")[0]
+                if path.endswith("/_bulk"):
+                    # O cliente do Elasticsearch envia o _bulk como PUT.
+                    self.do_POST(body)
+                elif path.endswith("/_settings"):
+                    self._send_json(200, {"acknowledged": True})
+                else:
+                    server.indices.setdefault(self._index(), 0)
+                    self._send_json(200, {"acknowledged": True, "index": self._index()})
+
+            def do_POST(self, body: bytes = None):
+                if body is None:
+                    body = self._read_body()
+                path = self.path.split("?")[0]
+
+                if path.endswith("/_bulk"):
+                    if server.delay:
+                        time.sleep(server.delay)
+                    self._send_json(200, server._bulk(body))
+                elif path.endswith("/_count"):
+                    self._send_json(200, {"count": server.indices.get(self._index(), 0)})
+                elif path.endswith("/_refresh") or path.endswith("/_forcemerge"):
+                    self._send_json(200, {"_shards": {"total": 1, "successful": 1, "failed": 0}})
+                else:
+                    self._send_json(404, {"error": f"endpoint não suportado: {self.path}"})
+
+        return Handler
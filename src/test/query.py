@@ -1,8 +1,3 @@
-from src.app.MySearchEngine import MySearchEngine
-from src.config import ELASTIC_SEARCH_ADDRESS, MAIN_INDEX_NAME
-
-es = MySearchEngine(hosts=ELASTIC_SEARCH_ADDRESS)
-
 class DocumentResult:
     def __init__(self, doc_id: str, relevance: float):
         self.id: str = doc_id
@@ -0,0 +1,164 @@
+import numpy as np
+
+
+class RankingEvaluator:
+    """
+    Calcula métricas de ranking (NDCG@k, MAP, P@k, Recall@k e MRR) para várias
+    execuções (configurações) de uma só vez, com NumPy.
+
+    Os julgamentos são convertidos uma única vez em matrizes (consultas × posição)
+    e o DCG ideal de cada consulta fica pré-calculado. Cada execução é um dicionário
+    {consulta: [ids recuperados, em ordem]}; execuções são empilhadas em um array
+    (execuções × consultas × posição) e todas as métricas saem de operações sobre ele.
+
+    Como em calculate_NDCG e calculate_MAP (compareEngines), todo documento julgado
+    conta como relevante, o ganho é 2^relevância - 1 e consultas ausentes de uma
+    execução são ignoradas na média dela. Sem k, o NDCG usa todos os resultados
+    recuperados e o DCG ideal de todos os documentos julgados.
+
+    Exemplo:
+        evaluator = RankingEvaluator(idealQueryResults)
+        metrics = evaluator.evaluate_many([run_a, run_b], k=10)
+        metrics["ndcg"]  # array com o NDCG médio de cada execução
+    """
+    def __init__(self, idealQueryResults: dict):
+        """
+        Args:
+            idealQueryResults: {consulta: [DocumentResult]} como retornado por
+                load_queries_from_file, ou {consulta: {id: relevância}}.
+        """
+        self.queries = list(idealQueryResults.keys())
+        self.query_positions = {query: i for i, query in enumerate(self.queries)}
+
+        self.judgments = []
+        for query in self.queries:
+            docs = idealQueryResults[query]
+            if isinstance(docs, dict):
+                self.judgments.append(dict(docs))
+            else:
+                self.judgments.append({doc.id: doc.relevance for doc in docs})
+
+        self.num_relevant = np.array([len(judged) for judged in self.judgments], dtype=np.float64)
+
+        # Ganhos ideais em ordem decrescente (consultas × documentos julgados), com zeros à direita.
+        # A lista ideal inclui repetições de id, como no cálculo original.
+        ideal_gains = [
+            sorted((2.0 ** doc_relevance - 1 for doc_relevance in self._ideal_relevances(idealQueryResults[query])), reverse=True)
+            for query in self.queries
+        ]
+        self.num_ideal = np.array([len(gains) for gains in ideal_gains], dtype=np.int64)
+        depth = int(self.num_ideal.max()) if len(self.queries) else 0
+
+        gains = np.zeros((len(self.queries), max(depth, 1)))
+        for i, row in enumerate(ideal_gains):
+            gains[i, :len(row)] = row
+
+        # DCG ideal acumulado: ideal_dcg[q, i] é o DCG ideal da consulta q até a posição i.
+        self.ideal_dcg = np.cumsum(gains * self._discounts(gains.shape[1]), axis=1)
+
+    @staticmethod
+    def _ideal_relevances(docs) -> list[float]:
+        if isinstance(docs, dict):
+            return list(docs.values())
+        return [doc.relevance for doc in docs]
+
+    @staticmethod
+    def _discounts(depth: int):
+        return 1.0 / np.log2(np.arange(depth) + 2)
+
+    def _ideal_dcg_at(self, k: int = None):
+        """DCG ideal por consulta até k (todos os documentos julgados sem k)."""
+        last = self.num_ideal if k is None else np.minimum(self.num_ideal, k)
+        values = self.ideal_dcg[np.arange(len(self.queries)), np.maximum(last - 1, 0)]
+        return np.where(last > 0, values, 0.0)
+
+    def to_matrices(self, runs: list[dict], depth: int = None):
+        """
+        Converte as execuções em matrizes (execuções × consultas × posição).
+
+        Returns:
+            tuple: (relevâncias, julgado, tamanho recuperado, presente), sendo
+                presente a máscara (execuções × consultas) das consultas respondidas.
+        """
+        if depth is None:
+            depth = max((len(ids) for run in runs for ids in run.values()), default=0)
+        depth = max(depth, 1)
+
+        shape = (len(runs), len(self.queries), depth)
+        relevance = np.zeros(shape)
+        judged = np.zeros(shape, dtype=bool)
+        retrieved = np.zeros(shape[:2], dtype=np.int64)
+        present = np.zeros(shape[:2], dtype=bool)
+
+        for r, run in enumerate(runs):
+            for query, ids in run.items():
+                q = self.query_positions.get(query)
+                if q is None:
+                    continue
+
+                present[r, q] = True
+                retrieved[r, q] = min(len(ids), depth)
+                judgments = self.judgments[q]
+
+                for position, doc_id in enumerate(ids[:depth]):
+                    rel = judgments.get(doc_id)
+                    if rel is not None:
+                        relevance[r, q, position] = rel
+                        judged[r, q, position] = True
+
+        return relevance, judged, retrieved, present
+
+    def evaluate_many(self, runs: list[dict], k: int = None) -> dict:
+        """
+        Calcula as métricas médias de cada execução.
+
+        Args:
+            runs: Lista de execuções {consulta: [ids recuperados]}.
+            k: Corte para NDCG@k, P@k e Recall@k. Sem k, NDCG e Recall usam todos os
+                resultados e P@k não é calculado.
+
+        Returns:
+            dict[str, np.ndarray]: 'ndcg', 'map', 'mrr', 'recall' e, com k,
+                'precision', cada um com um valor por execução.
+        """
+        relevance, judged, _, present = self.to_matrices(runs)
+        depth = relevance.shape[2]
+        cutoff = depth if k is None else min(k, depth)
+
+        hits = judged.astype(np.float64)
+        ranks = np.arange(1, depth + 1)
+
+        # NDCG
+        gains = (2.0 ** relevance - 1) * self._discounts(depth)
+        dcg = gains[:, :, :cutoff].sum(axis=2)
+        idcg = self._ideal_dcg_at(k)
+        ndcg = np.divide(dcg, idcg, out=np.zeros_like(dcg), where=idcg > 0)
+
+        # MAP
+        precision_at_rank = np.cumsum(hits, axis=2) / ranks
+        ap = np.divide(
+            (precision_at_rank * hits).sum(axis=2), self.num_relevant,
+            out=np.zeros(present.shape), where=self.num_relevant > 0
+        )
+
+        # MRR
+        first_hit = np.argmax(judged, axis=2)
+        rr = np.where(judged.any(axis=2), 1.0 / (first_hit + 1), 0.0)
+
+        # Recall@k (e P@k)
+        hits_at_k = hits[:, :, :cutoff].sum(axis=2)
+        recall = np.divide(hits_at_k, self.num_relevant, out=np.zeros(present.shape), where=self.num_relevant > 0)
+
+        metrics = {"ndcg": ndcg, "map": ap, "mrr": rr, "recall": recall}
+        if k is not None:
+            metrics["precision"] = hits_at_k / k
+
+        answered = present.sum(axis=1)
+        return {
+            name: np.divide((values * present).sum(axis=1), answered, out=np.zeros(len(runs)), where=answered > 0)
+            for name, values in metrics.items()
+        }
+
+    def evaluate(self, run: dict, k: int = None) -> dict:
+        """Métricas médias de uma única execução ({nome: valor})."""
+        return {name: float(values[0]) for name, values in self.evaluate_many([run], k).items()}
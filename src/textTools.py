@@ -1,42 +1,166 @@
-print("Loading text tools...", flush=True)
 import re
 import os
-import nltk
-import spacy
-from nltk.corpus import stopwords
-from nltk.stem import RSLPStemmer
-from nltk.tokenize import word_tokenize
-import ollama
-
-try:
-    _stop_words = set(stopwords.words('portuguese'))
-except LookupError:
-    nltk.download('stopwords')
-    _stop_words = set(stopwords.words('portuguese'))
-
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-
-try:
-    nltk.data.find('stemmers/rslp')
-except LookupError:
-    nltk.download('rslp')
-
-try:
-    nlp_pt = spacy.load("pt_core_news_sm")
-    nlp_pt.max_length = 5000000
-except OSError:
-    os.system("python -m spacy download pt_core_news_sm")
-    nlp_pt = spacy.load("pt_core_news_sm")
+import threading
+import time
+from functools import lru_cache
+from src.llmCache import LLMCache
+from src.telemetry import LLM_REQUEST_SECONDS, LLM_ERRORS
+
+# Os modelos e recursos (spaCy, NLTK e o cliente do Ollama) só são carregados no
+# primeiro uso da técnica que precisa deles, ou em Tools.warmup.
+
+class _LazyResource:
+    """Valor carregado uma única vez, na primeira chamada de get(), de forma segura entre threads."""
+    def __init__(self, loader):
+        self._loader = loader
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self._loader()
+                    self._loaded = True
+        return self._value
+
+def _ensure_nltk_resource(path: str, package: str):
+    import nltk
+
+    try:
+        nltk.data.find(path)
+    except LookupError:
+        nltk.download(package)
+
+def _load_stop_words() -> set:
+    from nltk.corpus import stopwords
+
+    _ensure_nltk_resource('corpora/stopwords', 'stopwords')
+    return set(stopwords.words('portuguese'))
+
+def _load_punkt() -> bool:
+    _ensure_nltk_resource('tokenizers/punkt', 'punkt')
+    return True
+
+def _load_stemmer():
+    from nltk.stem import RSLPStemmer
+
+    _ensure_nltk_resource('stemmers/rslp', 'rslp')
+    return RSLPStemmer()
+
+# Apenas token.lemma_ é usado, então o parser e o NER não são carregados.
+_LEMMATIZATION_UNUSED_COMPONENTS = ["parser", "ner"]
+
+def _load_spacy():
+    print("Loading spaCy model pt_core_news_sm...", flush=True)
+    import spacy
+
+    try:
+        nlp = spacy.load("pt_core_news_sm", exclude=_LEMMATIZATION_UNUSED_COMPONENTS)
+    except OSError:
+        os.system("python -m spacy download pt_core_news_sm")
+        nlp = spacy.load("pt_core_news_sm", exclude=_LEMMATIZATION_UNUSED_COMPONENTS)
+
+    nlp.max_length = 5000000
+    return nlp
+
+def _load_ollama():
+    import ollama
+    return ollama
+
+_stop_words = _LazyResource(_load_stop_words)
+_punkt = _LazyResource(_load_punkt)
+# Um único stemmer para todo o processo.
+_stemmer = _LazyResource(_load_stemmer)
+_nlp_pt = _LazyResource(_load_spacy)
+_ollama = _LazyResource(_load_ollama)
+
+# Recursos necessários para cada técnica (usado por Tools.warmup).
+_TECHNIQUE_RESOURCES = {
+    "remove_stopwords": [_stop_words],
+    "stemming": [_stemmer],
+    "lemmatization": [_nlp_pt],
+    "tokenize": [_punkt],
+}
+
+# Os radicais são guardados em cache, já que o vocabulário se repete muito entre
+# documentos e consultas.
+@lru_cache(maxsize=200000)
+def _stem(word: str) -> str:
+    return _stemmer.get().stem(word)
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """Cria o cache de respostas do LLM na primeira chamada (None se desativado)."""
+    global _llm_cache
+
+    # Importado aqui porque src.config importa QueryConfig, que depende deste módulo.
+    from src.config import LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES
+
+    if not LLM_CACHE_ENABLED:
+        return None
+
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMCache(LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES)
+    return _llm_cache
+
+def get_ollama():
+    """Retorna o módulo do cliente do Ollama, importado na primeira chamada."""
+    return _ollama.get()
+
+def _chat(system_prompt: str, user_prompt: str, options: dict, operation: str = "chat") -> str:
+    """
+    Envia os prompts ao Ollama e retorna o texto da resposta, usando o cache
+    persistente quando ativado. O endereço do servidor vem da variável OLLAMA_HOST.
+    A latência das chamadas que chegam ao Ollama é registrada em llm_request_seconds
+    com o rótulo operation.
+    """
+    from src.config import LLM_MODEL
+
+    def generate():
+        start = time.perf_counter()
+        try:
+            response = get_ollama().chat(
+                model=LLM_MODEL,
+                messages=[
+                    {
+                        'role': 'system',
+                        'content': system_prompt,
+                    },
+                    {
+                        'role': 'user',
+                        'content': user_prompt,
+                    },
+                ],
+                options=options
+            )
+        except Exception:
+            LLM_ERRORS.inc(operation=operation)
+            raise
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, operation=operation)
+        return response['message']['content']
+
+    cache = get_llm_cache()
+    if cache is None:
+        return generate()
+
+    return cache.get_or_generate(LLM_MODEL, system_prompt, user_prompt, options, generate)
 
 class Tools:
 
     @staticmethod
     def remove_stopwords(text: str) -> str:
+        stop_words = _stop_words.get()
         words = text.split()
-        filtered = [word for word in words if word.lower() not in _stop_words]
+        filtered = [word for word in words if word.lower() not in stop_words]
         return ' '.join(filtered)
 
     @staticmethod
@@ -49,19 +173,59 @@ class Tools:
 
     @staticmethod
     def apply_lemmatization(text: str) -> str:
-        doc = nlp_pt(text)
+        doc = _nlp_pt.get()(text)
         lemmatized_words = [token.lemma_ for token in doc]
         return ' '.join(lemmatized_words)
+
+    @staticmethod
+    def apply_lemmatization_batch(texts: list[str], batch_size: int = 64) -> list[str]:
+        """
+        Lematiza vários textos de uma vez, processando-os em lotes com nlp.pipe.
+        Retorna os textos lematizados na mesma ordem da entrada.
+        """
+        return [
+            ' '.join(token.lemma_ for token in doc)
+            for doc in _nlp_pt.get().pipe(texts, batch_size=batch_size)
+        ]
     
     @staticmethod
-    def tokenize(text: str) -> list[str]:            
+    def tokenize(text: str) -> list[str]:
+        from nltk.tokenize import word_tokenize
+
+        _punkt.get()
         return word_tokenize(text, language='portuguese')
     
     @staticmethod
     def apply_stemming(text: str) -> str:               
-        stemmer = RSLPStemmer()
         words = text.split()
-        return ' '.join([stemmer.stem(word) for word in words])
+        return ' '.join([_stem(word) for word in words])
+
+    @staticmethod
+    def warmup(techniques: list[str] = None, llm: bool = False) -> None:
+        """
+        Carrega antecipadamente os recursos das técnicas dadas (todas, se None) e,
+        com llm, o cliente do Ollama e o cache de respostas. Para implantações que
+        preferem pagar o carregamento na inicialização e não na primeira requisição.
+        """
+        if techniques is None:
+            techniques = list(_TECHNIQUE_RESOURCES)
+
+        for technique in techniques:
+            for resource in _TECHNIQUE_RESOURCES.get(technique, []):
+                resource.get()
+
+        if llm:
+            get_ollama()
+            get_llm_cache()
+
+    @staticmethod
+    def compile_normalizer(techniques: list[str]) -> "TextNormalizer":
+        """
+        Compila (uma única vez por lista de técnicas) o TextNormalizer que aplica as
+        técnicas na ordem dada. Ingestão e consulta usam o mesmo objeto para a mesma
+        lista, garantindo que os dois lados produzam exatamente os mesmos tokens.
+        """
+        return _compile_normalizer(tuple(techniques))
     
     @staticmethod
     def expand_query(query: str) -> str:
@@ -76,26 +240,11 @@ class Tools:
 
         prompt_usuario = f'Em português. Expanda a seguinte query adicionando apenas 2 a 4 palavras importantes semelhantes para busca em um sistema de busca jurídico: "{query}"'
 
-        response = ollama.chat(
-            model='llama3',
-            messages=[
-                {
-                    'role': 'system',
-                    'content': prompt_sistema.strip(),
-                },
-                {
-                    'role': 'user',
-                    'content': prompt_usuario,
-                },
-            ],
-            options={
-                'temperature': 0.5,
-            }
-        )
-
-        return response['message']['content']
+        return _chat(prompt_sistema.strip(), prompt_usuario, {'temperature': 0.5}, operation="query_expansion")
     
-    def ai_text(text: str) -> str:
+    @staticmethod
+    def ai_text_prompts(text: str) -> tuple[str, str, dict]:
+        """Retorna (prompt de sistema, prompt do usuário, opções) usados por ai_text."""
         prompt_sistema = """
                         Você vai me ajudar a otimizar textos em um contexto de busca por documentos jurídicos.
                         Vou te mandar textos e você vai me retornar termos e possíveis consultas sobre as coisas mais importantes de cada parágrafo do texto.
@@ -107,22 +256,110 @@ class Tools:
         
         prompt_usuario = f'Extraia termos e frases otimizadas para busca jurídica deste texto: "{text}"'
 
-        response = ollama.chat(
-            model='llama3',
-            messages=[
-                {
-                    'role': 'system',
-                    'content': prompt_sistema.strip(),
-                },
-                {
-                    'role': 'user',
-                    'content': prompt_usuario,
-                },
-            ],
-            options={
-                'temperature': 0.5,
-            }
-        )
+        return prompt_sistema.strip(), prompt_usuario, {'temperature': 0.5}
 
+    @staticmethod
+    def ai_text(text: str) -> str:
+        return _chat(*Tools.ai_text_prompts(text), operation="ai_text")
 
-        return response['message']['content']
+
+@lru_cache(maxsize=None)
+def _compile_normalizer(techniques: tuple[str, ...]) -> "TextNormalizer":
+    return TextNormalizer(techniques)
+
+
+class TextNormalizer:
+    """
+    Aplica uma lista de técnicas de texto com o menor número de passadas possível.
+
+    Técnicas que operam sobre o texto inteiro (lematização) são aplicadas como uma
+    etapa própria. Técnicas consecutivas que operam palavra a palavra (lowercase,
+    remoção de stopwords e stemming) são fundidas em uma única etapa: o texto é
+    dividido uma vez e cada palavra passa por todas elas antes da junção.
+
+    O resultado é idêntico ao de aplicar as funções de Tools uma após a outra.
+    Use Tools.compile_normalizer para obter a instância compartilhada.
+    """
+    TEXT_TECHNIQUES = {
+        "lemmatization": Tools.apply_lemmatization
+    }
+    TOKEN_TECHNIQUES = {"lowercase_text", "remove_stopwords", "stemming"}
+
+    def __init__(self, techniques: tuple[str, ...]):
+        self.techniques = techniques
+        self.stages = []
+        # Nome de cada etapa (as técnicas fundidas nela, separadas por '+'), usado nas métricas.
+        self.stage_names = []
+
+        token_techniques = []
+        for i, technique in enumerate(techniques):
+            if technique in self.TEXT_TECHNIQUES:
+                if token_techniques:
+                    self.stages.append(self._compile_token_stage(token_techniques))
+                    self.stage_names.append("+".join(token_techniques))
+                    token_techniques = []
+                self.stages.append(self.TEXT_TECHNIQUES[technique])
+                self.stage_names.append(technique)
+
+                # As etapas seguintes são as do normalizador compartilhado das técnicas
+                # restantes, o mesmo que a ingestão aplica sobre o texto já lematizado.
+                remaining = techniques[i + 1:]
+                if remaining:
+                    self.stages.extend(_compile_normalizer(remaining).stages)
+                    self.stage_names.extend(_compile_normalizer(remaining).stage_names)
+                break
+            elif technique in self.TOKEN_TECHNIQUES:
+                token_techniques.append(technique)
+            else:
+                raise ValueError(f"Técnica de texto desconhecida: {technique}. Verifique a configuração.")
+
+        if token_techniques:
+            self.stages.append(self._compile_token_stage(token_techniques))
+            self.stage_names.append("+".join(token_techniques))
+
+    @staticmethod
+    def _compile_token_stage(techniques: list[str]):
+        # Só lowercase: o texto é mantido como está (inclusive espaços), como em Tools.lowercase_text.
+        if techniques == ["lowercase_text"]:
+            return str.lower
+
+        def token_stage(text: str) -> str:
+            stop_words = _stop_words.get() if "remove_stopwords" in techniques else None
+            tokens = []
+            for word in text.split():
+                lowered = False
+                keep = True
+                for technique in techniques:
+                    if technique == "lowercase_text":
+                        word = word.lower()
+                        lowered = True
+                    elif technique == "remove_stopwords":
+                        if (word if lowered else word.lower()) in stop_words:
+                            keep = False
+                            break
+                    else:
+                        word = _stem(word)
+                if keep:
+                    tokens.append(word)
+            return ' '.join(tokens)
+
+        return token_stage
+
+    def normalize(self, text: str, observe=None) -> str:
+        """
+        Aplica as etapas ao texto. Com observe (ex: Histogram.observe), chama
+        observe(segundos, technique=nome da etapa) após cada etapa.
+        """
+        if observe is None:
+            for stage in self.stages:
+                text = stage(text)
+            return text
+
+        for name, stage in zip(self.stage_names, self.stages):
+            start = time.perf_counter()
+            text = stage(text)
+            observe(time.perf_counter() - start, technique=name)
+        return text
+
+    def __repr__(self):
+        return f"TextNormalizer(techniques={list(self.techniques)})"
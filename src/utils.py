@@ -1,12 +1,19 @@
 from src.app.MySearchEngine import MySearchEngine
-from src.config import ELASTIC_SEARCH_ADDRESS, MAIN_INDEX_NAME
+from src.config import ELASTIC_SEARCH_ADDRESS, MAIN_INDEX_NAME, INDEX_REBUILD_ON_START
 import sys
-from src.insertDocs.insert_docs import insert_docs_without_processing
+from src.insertDocs.insert_docs import start_background_index_build
 
 def check_index_elasticSearch():
     """
     Verifica a conexão com o Elasticsearch e a existência do índice principal.
-    Se o índice não existir ou estiver vazio, chama a função insere_docs para populá-lo.
+
+    Se o índice (alias) não existir, estiver vazio ou INDEX_REBUILD_ON_START estiver
+    ativo, uma nova geração é construída em segundo plano e o servidor começa a
+    atender imediatamente: com a geração anterior, se houver, ou respondendo em
+    /api/ready que ainda não está pronto.
+
+    Returns:
+        threading.Thread | None: A thread da construção, se uma foi iniciada.
     """
     try:
         es = MySearchEngine(hosts=ELASTIC_SEARCH_ADDRESS)
@@ -23,23 +30,15 @@ def check_index_elasticSearch():
 
         if total_docs < 0:
             print(f"⚠️  O índice '{MAIN_INDEX_NAME}' não foi encontrado.")
-            print("Iniciando a criação do índice e inserção de documentos...")
-            try:
-                # A função insere_docs deve ser responsável por criar o índice (se necessário) e inserir os dados.
-                insert_docs_without_processing()
-                print(f"✅ Índice '{MAIN_INDEX_NAME}' criado e populado com sucesso.")
-            except Exception as e_insert:
-                print(f"❌ ERRO CRÍTICO: Falha ao tentar criar e popular o índice.")
-                print(f"Detalhes: {e_insert}")
-                sys.exit(1)
-
-        elif total_docs > 0:
-            print(f"✅ Índice '{MAIN_INDEX_NAME}' encontrado com {total_docs} documentos.")
+        elif total_docs == 0:
+            print(f"⚠️  O índice '{MAIN_INDEX_NAME}' existe, mas está vazio.")
         else:
+            print(f"✅ Índice '{MAIN_INDEX_NAME}' encontrado com {total_docs} documentos.")
+            if not INDEX_REBUILD_ON_START:
+                return None
 
-            print(f"⚠️  O índice '{MAIN_INDEX_NAME}' existe, mas está vazio. Iniciando a inserção de documentos...")
-            insert_docs_without_processing()
-            print(f"✅ Documentos inseridos no índice '{MAIN_INDEX_NAME}' com sucesso.")
+        print("Iniciando a construção de uma nova geração do índice em segundo plano...")
+        return start_background_index_build()
 
     except ConnectionError as e_conn:
 